@@ -1,9 +1,16 @@
 import os
 import re
 import json
-import pdfplumber
+import time
+import argparse
+import threading
+import unicodedata
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-import google.generativeai as genai
+import metrics
+from extraction_cache import ExtractionCache, hash_pdf_file
+from extraction_schema import SCHEMAS, merge_partial_results, parse_and_validate, validate_and_coerce
 
 # Įkeliame kintamuosius iš .env failo
 load_dotenv()
@@ -11,20 +18,47 @@ load_dotenv()
 # Konfiguracija
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-# Patikriname, ar raktas sėkmingai gautas
-if not GOOGLE_API_KEY:
-    print("Klaida: GOOGLE_API_KEY nerastas .env faile arba aplinkos kintamuosiuose. Patikrinkite .env failą.")
-    exit()
+# Modelis, skirtas greitam duomenų ištraukimui.
+# Sukuriamas tik pirmo kvietimo metu (žr. get_ai_model), kad importas būtų greitas.
+AI_MODEL_NAME = 'gemini-2.5-flash'
+AI_MODEL = None
+_AI_MODEL_LOCK = threading.Lock()
 
-# Konfigūruojame Gemini API
-try:
-    genai.configure(api_key=GOOGLE_API_KEY)
-except Exception as e:
-    print(f"Klaida konfigūruojant Gemini API: {e}")
-    exit()
+# Raginimų versija: pakeitus raginimus, padidinkite, kad podėlio įrašai nebebūtų naudojami
+PROMPT_VERSION = "2"
 
-# Modelis, skirtas greitam duomenų ištraukimui
-AI_MODEL = genai.GenerativeModel('gemini-2.5-flash')
+# Gemini struktūrizuota išvestis: atsakymas grąžinamas pagal JSON schemą (extraction_schema.py).
+# Išjunkite ("0") modeliams, kurie nepalaiko `response_schema`.
+GEMINI_STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "1") == "1"
+
+# AI rezultatų podėlis (nustatomas main(); None - podėlis nenaudojamas)
+EXTRACTION_CACHE = None
+
+# Užklausų į Gemini limitas per minutę (0 - neribojama). Naudojama lygiagrečiame režime.
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "0"))
+
+# Kiek sekundžių stabdomi visi Gemini kvietimai, gavus užklausų limito (429) klaidą
+GEMINI_RATE_LIMIT_PAUSE = float(os.getenv("GEMINI_RATE_LIMIT_PAUSE", "30"))
+
+# Kiek pirmųjų PDF puslapių naudojama dokumento klasifikavimui
+CLASSIFICATION_PAGE_LIMIT = int(os.getenv("CLASSIFICATION_PAGE_LIMIT", "1"))
+
+# 'single' - vienas Gemini kvietimas grąžina ir dokumento tipą, ir duomenis;
+# 'two_step' - atskiras klasifikavimo kvietimas, po jo - duomenų ištraukimas (senasis režimas)
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "single")
+
+# Ilgi dokumentai (pvz., 40-80 psl. sutartys) skaidomi į dalis, kurios apdorojamos lygiagrečiai.
+# Dalies dydis - apytiksliai žetonais (~EXTRACTION_CHARS_PER_TOKEN simbolių žetonui); 0 - neskaidyti.
+EXTRACTION_CHUNK_TOKENS = int(os.getenv("EXTRACTION_CHUNK_TOKENS", "6000"))
+EXTRACTION_CHARS_PER_TOKEN = float(os.getenv("EXTRACTION_CHARS_PER_TOKEN", "4"))
+EXTRACTION_CHUNK_CONCURRENCY = int(os.getenv("EXTRACTION_CHUNK_CONCURRENCY", "4"))
+# Kiek kartų iš karto kartojama nepavykusi dalis (kad dėl vienos dalies nežlugtų visas dokumentas)
+EXTRACTION_CHUNK_RETRIES = int(os.getenv("EXTRACTION_CHUNK_RETRIES", "1"))
+
+# Vietinis klasifikatorius pagal raktinius žodžius: užtikrintu atveju Gemini klasifikavimui nekviečiamas
+PRECLASSIFIER_ENABLED = os.getenv("PRECLASSIFIER_ENABLED", "1") == "1"
+# Mažiausias taškų skaičius (ir skirtumas nuo kito tipo), kad vietinė klasifikacija būtų laikoma užtikrinta
+PRECLASSIFIER_MIN_SCORE = int(os.getenv("PRECLASSIFIER_MIN_SCORE", "3"))
 
 # Aplankų nustatymas
 # Dabar visus PDF laikysime viename aplanke "pdf_documents"
@@ -32,91 +66,250 @@ PDF_FOLDER_DOCUMENTS = "pdf_documents"
 JSON_FOLDER_INVOICES = "invoices"
 JSON_FOLDER_CONTRACTS = "contracts"
 
-# Patikriname, ar egzistuoja išvesties aplankai ir juos sukuriame, jei reikia.
-for folder in [JSON_FOLDER_INVOICES, JSON_FOLDER_CONTRACTS, PDF_FOLDER_DOCUMENTS]:
-    if not os.path.exists(folder):
-        print(f"Aplankas '{folder}' nerastas. Sukuriamas aplankas.")
-        os.makedirs(folder)
+
+def ensure_folders():
+    """
+    Patikrina, ar egzistuoja išvesties aplankai ir juos sukuria, jei reikia.
+    """
+    for folder in [JSON_FOLDER_INVOICES, JSON_FOLDER_CONTRACTS, PDF_FOLDER_DOCUMENTS]:
+        if not os.path.exists(folder):
+            print(f"Aplankas '{folder}' nerastas. Sukuriamas aplankas.")
+            os.makedirs(folder)
 
 
-def extract_text_from_pdf(pdf_path):
+def get_ai_model():
     """
-    Ištraukia visą tekstą iš PDF failo.
+    Grąžina Gemini modelį, jį sukonfigūruodama pirmo kvietimo metu.
+    """
+    global AI_MODEL
+    with _AI_MODEL_LOCK:
+        if AI_MODEL is None:
+            # Patikriname, ar raktas sėkmingai gautas
+            if not GOOGLE_API_KEY:
+                print("Klaida: GOOGLE_API_KEY nerastas .env faile arba aplinkos kintamuosiuose. Patikrinkite .env failą.")
+                exit()
+
+            # Importuojame tik čia: google.generativeai importas užtrunka
+            import google.generativeai as genai
+
+            # Konfigūruojame Gemini API
+            try:
+                genai.configure(api_key=GOOGLE_API_KEY)
+            except Exception as e:
+                print(f"Klaida konfigūruojant Gemini API: {e}")
+                exit()
+            AI_MODEL = genai.GenerativeModel(AI_MODEL_NAME)
+    return AI_MODEL
+
+
+def iter_pdf_pages(pdf_path):
+    """
+    Atidaro PDF failą VIENĄ kartą ir po vieną grąžina (yield) kiekvieno puslapio tekstą.
+    Puslapiai analizuojami tik tada, kai jų prireikia.
     """
-    text_content = ""
+    # pdfplumber (pdfminer) importuojamas tik tada, kai iš tikrųjų analizuojamas PDF
+    import pdfplumber
+
     try:
         # Padidintas x_tolerance/y_tolerance gali padėti su prastesnės kokybės PDF
         with pdfplumber.open(pdf_path) as pdf:
-            # Paimame tik pirmąjį puslapį klasifikavimui (greičiau)
-            text_content += pdf.pages[0].extract_text(x_tolerance=2, y_tolerance=2) + "\n"
+            for page in pdf.pages:
+                with metrics.timed("pdf_page"):
+                    text = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
+                yield text
     except Exception as e:
         print(f"Klaida ištraukiant tekstą iš PDF '{pdf_path}': {e}")
-    return text_content.strip()
+
+
+def join_pages(pages):
+    """
+    Sujungia puslapių tekstus į vieną eilutę (be pakartotinio '+=' kopijavimo).
+    """
+    return "\n".join(pages).strip()
+
+
+def extract_text_from_pdf(pdf_path, page_limit=None):
+    """
+    Ištraukia tekstą klasifikavimui: tik pirmuosius `page_limit` puslapius (greičiau).
+    """
+    pages = iter_pdf_pages(pdf_path)
+    try:
+        return join_pages(islice(pages, page_limit or CLASSIFICATION_PAGE_LIMIT))
+    finally:
+        pages.close()
 
 
 def extract_full_text_from_pdf(pdf_path):
     """
     Ištraukia visą tekstą iš PDF failo.
     """
-    text_content = ""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text_content += page.extract_text(x_tolerance=2, y_tolerance=2) + "\n"
-    except Exception as e:
-        print(f"Klaida ištraukiant tekstą iš PDF '{pdf_path}': {e}")
-    return text_content.strip()
+    return join_pages(iter_pdf_pages(pdf_path))
 
 
-## RAGINIMAI (PROMPTS) lieka nepakitę, bet perkelti į pagrindinį kodo lygį dėl aiškumo.
+def extract_texts_for_pipeline(pdf_path):
+    """
+    Ištraukia klasifikavimo ir pilną tekstą, atidarant PDF tik vieną kartą.
+    Vykdoma atskirame procese (CPU darbas).
+    """
+    pages = list(iter_pdf_pages(pdf_path))
+    return join_pages(pages[:CLASSIFICATION_PAGE_LIMIT]), join_pages(pages)
 
-def get_invoice_prompt(pdf_text):
+
+class RateLimiter:
     """
-    Grąžina raginimą sąskaitos faktūros duomenų ištraukimui.
+    Paprastas, gijoms saugus užklausų ribotuvas: užtikrina minimalų intervalą tarp kvietimų.
     """
-    # Naudojamas jūsų originalus raginimas
-    prompt = f"""
-    Jūs esate dirbtinio intelekto asistentas, specializuojasi sąskaitų faktūrų duomenų ištraukime.
-    Išanalizuokite šį sąskaitos faktūros tekstą ir ištraukite visą struktūrizuotą informaciją.
 
-    Atsakymą pateikite TIK JSON formatu, be jokių papildomų paaiškinimų ar teksto.
-    Niekada neįtraukite papildomų žodžių, frazių ar Markdown formatavimo (pvz., ```json) prieš JSON pradžią ar po pabaigos.
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
 
-    Štai JSON struktūra, kurią turite naudoti:
-    {{
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_allowed - now
+            self._next_allowed = max(now, self._next_allowed) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    def pause(self, seconds):
+        """
+        Atideda visus kitus kvietimus bent `seconds` sekundžių (pvz., gavus 429 klaidą).
+        """
+        with self._lock:
+            self._next_allowed = max(self._next_allowed, time.monotonic() + seconds)
+
+
+# Bendras ribotuvas visiems Gemini kvietimams (nustatomas process_folder_pipelined)
+RATE_LIMITER = RateLimiter(0)
+
+
+class AIRequestError(Exception):
+    """
+    Nepavykęs Gemini kvietimas. `kind`: 'rate_limit', 'transient' (verta kartoti) arba 'permanent'.
+    """
+
+    def __init__(self, error, kind=None):
+        super().__init__(str(error))
+        self.kind = kind or error_kind(error)
+
+
+def error_kind(error):
+    """
+    Nustato klaidos rūšį pagal HTTP kodą arba google.api_core išimties pavadinimą (neimportuojant bibliotekos).
+    """
+    code = getattr(error, 'code', None)
+    name = type(error).__name__
+    if code == 429 or name in ("ResourceExhausted", "TooManyRequests"):
+        return "rate_limit"
+    if isinstance(error, (ConnectionError, TimeoutError)) or code in (408, 500, 502, 503, 504) or name in (
+            "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "GatewayTimeout", "Aborted",
+            "RetryError", "ReadTimeout", "ConnectTimeout"):
+        return "transient"
+    return "permanent"
+
+
+def generate_content(prompt, response_schema=None):
+    """
+    Iškviečia Gemini modelį, laikydamasi užklausų limito.
+    Jei nurodyta `response_schema` (ir įjungta GEMINI_STRUCTURED_OUTPUT), atsakymas grąžinamas kaip JSON pagal ją.
+    Gavus 429 klaidą, sustabdomi visi kiti kvietimai GEMINI_RATE_LIMIT_PAUSE sekundžių.
+    """
+    RATE_LIMITER.wait()
+    metrics.record_prompt("gemini", prompt)
+    try:
+        with metrics.timed("gemini"):
+            if response_schema is not None and GEMINI_STRUCTURED_OUTPUT:
+                return get_ai_model().generate_content(prompt, generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": response_schema,
+                })
+            return get_ai_model().generate_content(prompt)
+    except Exception as e:
+        kind = error_kind(e)
+        metrics.increment("errors_total", target="gemini", kind=kind)
+        metrics.log_event("error", target="gemini", kind=kind, error=str(e))
+        if kind == "rate_limit":
+            RATE_LIMITER.pause(GEMINI_RATE_LIMIT_PAUSE)
+        raise
+
+
+## RAGINIMAI (PROMPTS) lieka nepakitę, bet perkelti į pagrindinį kodo lygį dėl aiškumo.
+# JSON struktūros naudojamos ir atskiruose, ir bendrame (tipas + duomenys) raginimuose.
+
+INVOICE_JSON_STRUCTURE = """{
       "dokumento_tipas": "PVM sąskaita faktūra",
       "numeris": "Sąskaitos numeris",
       "data": "Sąskaitos data (YYYY-MM-DD formatu)",
-      "pardavejas": {{
+      "pardavejas": {
         "pavadinimas": "Pardavėjo pavadinimas",
         "imones_kodas": "Įmonės kodas",
         "pvm_kodas": "PVM kodas",
         "adresas": "Adresas",
         "bankas": "Bankas",
         "saskaitos_numeris": "Sąskaitos numeris"
-      }},
-      "gavejas": {{
+      },
+      "gavejas": {
         "pavadinimas": "Gavėjo pavadinimas",
         "imones_kodas": "Įmonės kodas",
         "pvm_kodas": "PVM kodas",
         "adresas": "Adresas"
-      }},
+      },
       "prekes": [
-        {{
+        {
           "pavadinimas": "Prekės pavadinimas",
           "vezimas": "Važtaraščio numeris (jei nurodytas)",
           "kiekis_t": "Kiekis tonomis (skaičius, naudokite tašką kaip dešimtainį skirtuką)",
           "vieneto_kaina_eur": "Vieneto kaina eurais (skaičius, naudokite tašką kaip dešimtainį skirtuką)",
           "viso_eur": "Bendra kaina eurais (skaičius, naudokite tašką kaip dešimtainį skirtuką)"
-        }}
+        }
       ],
-      "sumos": {{
+      "sumos": {
         "viso_be_pvm_eur": "Bendra suma be PVM (skaičius, naudokite tašką kaip dešimtainį skirtuką)",
         "pvm_suma_eur": "PVM suma (skaičius, naudokite tašką kaip dešimtainį skirtuką)",
         "viso_su_pvm_eur": "Bendra suma su PVM (skaičius, naudokite tašką kaip dešimtainį skirtuką)"
-      }},
+      },
       "apmoketi_iki": "Apmokėjimo terminas (YYYY-MM-DD formatu)"
-    }}
+    }"""
+
+CONTRACT_JSON_STRUCTURE = """{
+      "dokumento_tipas": "Sutartis",
+      "numeris": "Sutarties numeris (jei nurodytas)",
+      "sudarymo_data": "Sutarties sudarymo data (YYYY-MM-DD formatu)",
+      "sutarties_tipas": "Pirkimo-pardavimo, Nuomos, Paslaugų teikimo ar pan.",
+      "salis_a": {
+        "pavadinimas": "Šalies A (Pardavėjo/Nuomotojo/Teikėjo) pavadinimas",
+        "imones_kodas": "Įmonės kodas",
+        "adresas": "Adresas"
+      },
+      "salis_b": {
+        "pavadinimas": "Šalies B (Pirkėjo/Nuomininko/Gavėjo) pavadinimas",
+        "imones_kodas": "Įmonės kodas",
+        "adresas": "Adresas"
+      },
+      "galiojimo_terminas": "Sutarties galiojimo terminas (pvz., 1 metai, Iki 2025-12-31, Neterminuota)",
+      "bendra_suma_eur": "Bendra sutarties vertė eurais (skaičius, naudokite tašką kaip dešimtainį skirtuką. Jei nenaudojama, naudokite '0')",
+      "mokestis_uz_paslaugas": "Mokestis už paslaugas/prekes (detalesnis aprašymas, pvz., '1200 EUR per mėnesį', '1.5 EUR už vienetą')"
+    }"""
+
+
+def get_invoice_prompt(pdf_text):
+    """
+    Grąžina raginimą sąskaitos faktūros duomenų ištraukimui.
+    """
+    # Naudojamas jūsų originalus raginimas
+    prompt = f"""
+    Jūs esate dirbtinio intelekto asistentas, specializuojasi sąskaitų faktūrų duomenų ištraukime.
+    Išanalizuokite šį sąskaitos faktūros tekstą ir ištraukite visą struktūrizuotą informaciją.
+
+    Atsakymą pateikite TIK JSON formatu, be jokių papildomų paaiškinimų ar teksto.
+    Niekada neįtraukite papildomų žodžių, frazių ar Markdown formatavimo (pvz., ```json) prieš JSON pradžią ar po pabaigos.
+
+    Štai JSON struktūra, kurią turite naudoti:
+    {INVOICE_JSON_STRUCTURE}
 
     Jei skaitinės reikšmės nerandamos, naudokite '0'. Jei tekstiniai laukai nerandami, palikite juos tuščius "".
     Įsitikinkite, kad grąžinate tik JSON kodą.
@@ -143,25 +336,7 @@ def get_contract_prompt(pdf_text):
     Niekada neįtraukite papildomų žodžių, frazių ar Markdown formatavimo (pvz., ```json) prieš JSON pradžią ar po pabaigos.
 
     Štai JSON struktūra, kurią turite naudoti:
-    {{
-      "dokumento_tipas": "Sutartis",
-      "numeris": "Sutarties numeris (jei nurodytas)",
-      "sudarymo_data": "Sutarties sudarymo data (YYYY-MM-DD formatu)",
-      "sutarties_tipas": "Pirkimo-pardavimo, Nuomos, Paslaugų teikimo ar pan.",
-      "salis_a": {{
-        "pavadinimas": "Šalies A (Pardavėjo/Nuomotojo/Teikėjo) pavadinimas",
-        "imones_kodas": "Įmonės kodas",
-        "adresas": "Adresas"
-      }},
-      "salis_b": {{
-        "pavadinimas": "Šalies B (Pirkėjo/Nuomininko/Gavėjo) pavadinimas",
-        "imones_kodas": "Įmonės kodas",
-        "adresas": "Adresas"
-      }},
-      "galiojimo_terminas": "Sutarties galiojimo terminas (pvz., 1 metai, Iki 2025-12-31, Neterminuota)",
-      "bendra_suma_eur": "Bendra sutarties vertė eurais (skaičius, naudokite tašką kaip dešimtainį skirtuką. Jei nenaudojama, naudokite '0')",
-      "mokestis_uz_paslaugas": "Mokestis už paslaugas/prekes (detalesnis aprašymas, pvz., '1200 EUR per mėnesį', '1.5 EUR už vienetą')"
-    }}
+    {CONTRACT_JSON_STRUCTURE}
 
     Jei skaitinės reikšmės nerandamos, naudokite '0'. Jei tekstiniai laukai nerandami, palikite juos tuščius "".
     Įsitikinkite, kad grąžinate tik JSON kodą.
@@ -175,9 +350,117 @@ def get_contract_prompt(pdf_text):
     return prompt
 
 
-def classify_document(pdf_text_sample):
+def get_combined_prompt(pdf_text):
+    """
+    Grąžina raginimą, kuriuo vienu kvietimu nustatomas dokumento tipas ir ištraukiami jo duomenys.
+    """
+    prompt = f"""
+    Jūs esate dirbtinio intelekto asistentas, specializuojasi sąskaitų faktūrų ir sutarčių duomenų ištraukime.
+    Pirmiausia nustatykite dokumento tipą: sąskaita faktūra ARBA sutartis.
+    Tada ištraukite visą struktūrizuotą informaciją pagal to tipo JSON struktūrą.
+
+    Atsakymą pateikite TIK JSON formatu, be jokių papildomų paaiškinimų ar teksto.
+    Niekada neįtraukite papildomų žodžių, frazių ar Markdown formatavimo (pvz., ```json) prieš JSON pradžią ar po pabaigos.
+
+    Jei dokumentas yra sąskaita faktūra, naudokite šią struktūrą ("dokumento_tipas": "PVM sąskaita faktūra"):
+    {INVOICE_JSON_STRUCTURE}
+
+    Jei dokumentas yra sutartis, naudokite šią struktūrą ("dokumento_tipas": "Sutartis"):
+    {CONTRACT_JSON_STRUCTURE}
+
+    Jei dokumentas nėra nei sąskaita faktūra, nei sutartis, grąžinkite {{"dokumento_tipas": "unknown"}}.
+    Jei skaitinės reikšmės nerandamos, naudokite '0'. Jei tekstiniai laukai nerandami, palikite juos tuščius "".
+    NEĮTRAUKITE JOKIŲ PAPILDOMŲ KOMENTARŲ AR TEKSTO UŽ JSON STRUKTŪROS RIBŲ.
+
+    Dokumento tekstas:
+    ```
+    {pdf_text}
+    ```
+    """
+    return prompt
+
+
+def get_repair_prompt(response_text, errors):
+    """
+    Grąžina trumpą raginimą sugadintam JSON atsakymui pataisyti (be dokumento teksto - pigiau nei kartoti).
+    """
+    error_list = "\n".join(f"- {error}" for error in errors[:20])
+    prompt = f"""
+    Žemiau pateiktas JSON atsakymas neatitinka reikalaujamos struktūros.
+    Pataisykite TIK nurodytas klaidas ir grąžinkite visą pataisytą JSON, be jokių paaiškinimų.
+    Skaitinės reikšmės turi būti skaičiai (tašku kaip dešimtainiu skirtuku), jei reikšmės nėra - 0.
+
+    Klaidos:
+    {error_list}
+
+    Atsakymas:
+    ```
+    {response_text[:20000]}
+    ```
+    """
+    return prompt
+
+
+def fold_diacritics(text):
+    """
+    Pašalina lietuviškus diakritikus ir paverčia mažosiomis raidėmis ('Sąskaita' -> 'saskaita'),
+    nes dalis PDF tekstą pateikia be jų.
+    """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+# Raktiniai žodžiai (be diakritikų) ir jų svoriai vietiniam klasifikatoriui
+PRECLASSIFIER_KEYWORDS = {
+    "invoice": [
+        (re.compile(r'saskait\w*[\s-]+faktur'), 3),
+        (re.compile(r'\bpvm\s+suma'), 1),
+        (re.compile(r'\bviso\s+su\s+pvm'), 1),
+        (re.compile(r'apmoketi\s+iki'), 1),
+        (re.compile(r'vaztarast'), 1),
+    ],
+    "contract": [
+        (re.compile(r'\bsutartis\b|sutarties\s+(dalykas|salys|objektas|kaina|galiojimas)'), 3),
+        (re.compile(r'\bsalys\s+susitar|\bsudare\s+sia\s+sutarti'), 2),
+        (re.compile(r'\bisipareigoja\b'), 1),
+        (re.compile(r'\b(nuomotojas|nuomininkas|uzsakovas|rangovas|tiekejas)\b'), 1),
+    ],
+}
+
+
+def preclassify_document(pdf_text_sample):
+    """
+    Greitas vietinis klasifikatorius pagal raktinius žodžius.
+    Grąžina 'invoice' arba 'contract', kai vieno tipo taškai pakankami ir bent dvigubai didesni už kito;
+    kitu atveju - None (sprendžia Gemini).
+    """
+    if not PRECLASSIFIER_ENABLED:
+        return None
+    text = fold_diacritics(pdf_text_sample[:3000])
+    scores = {doc_type: sum(weight for pattern, weight in patterns if pattern.search(text))
+              for doc_type, patterns in PRECLASSIFIER_KEYWORDS.items()}
+    best, other = sorted(scores, key=scores.get, reverse=True)
+    if scores[best] >= PRECLASSIFIER_MIN_SCORE and scores[best] >= 2 * scores[other]:
+        return best
+    return None
+
+
+def doc_type_from_json(doc_json_data):
+    """
+    Nustato dokumento tipą pagal bendro raginimo grąžintą 'dokumento_tipas' lauką.
+    """
+    value = fold_diacritics(str((doc_json_data or {}).get('dokumento_tipas', '')))
+    if 'sutart' in value:
+        return "contract"
+    if 'saskait' in value or 'faktur' in value:
+        return "invoice"
+    return "unknown"
+
+
+def classify_document(pdf_text_sample, raise_errors=False):
     """
     Naudoja AI, kad klasifikuotų dokumento tipą (invoice arba contract).
+    Jei `raise_errors`, API klaida iškeliama kaip AIRequestError, o ne paverčiama 'unknown'.
     """
     classification_prompt = f"""
     Išanalizuokite šio dokumento tekstą ir nustatykite jo tipą.
@@ -192,7 +475,7 @@ def classify_document(pdf_text_sample):
     ```
     """
     try:
-        response = AI_MODEL.generate_content(classification_prompt)
+        response = generate_content(classification_prompt)
         # Išvalome ir grąžiname atsakymą mažosiomis raidėmis
         classification = response.text.strip().lower()
 
@@ -204,17 +487,102 @@ def classify_document(pdf_text_sample):
 
     except Exception as e:
         print(f"Klaida klasifikuojant dokumentą: {e}")
+        if raise_errors:
+            raise AIRequestError(e) from e
         return "unknown"
 
 
-def process_pdf_with_ai(pdf_text, doc_type):
+def split_text_into_chunks(text, max_tokens=None):
+    """
+    Suskaido tekstą į dalis, ne ilgesnes nei `max_tokens` (numatyta EXTRACTION_CHUNK_TOKENS), nekarpant eilučių.
+    """
+    max_tokens = EXTRACTION_CHUNK_TOKENS if max_tokens is None else max_tokens
+    max_chars = int(max_tokens * EXTRACTION_CHARS_PER_TOKEN)
+    if not max_tokens or len(text) <= max_chars:
+        return [text]
+    chunks, current, current_size = [], [], 0
+    for line in text.split("\n"):
+        # Per ilgą eilutę tenka karpyti
+        pieces = [line[i:i + max_chars] for i in range(0, len(line), max_chars)] or [""]
+        for piece in pieces:
+            if current and current_size + len(piece) + 1 > max_chars:
+                chunks.append("\n".join(current))
+                current, current_size = [], 0
+            current.append(piece)
+            current_size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def process_pdf_with_ai(pdf_text, doc_type, raise_errors=False):
     """
     Siunčia PDF tekstą į Gemini AI ir prašo grąžinti JSON formatu,
-    naudojant atitinkamą raginimą.
+    naudojant atitinkamą raginimą ('auto' - tipas nustatomas tame pačiame kvietime).
+    Ilgi dokumentai skaidomi į dalis (žr. process_chunks_with_ai).
+    Jei `raise_errors`, nepavykęs kvietimas iškeliamas kaip AIRequestError, o ne grąžinamas None.
+    """
+    chunks = split_text_into_chunks(pdf_text)
+    if len(chunks) > 1 and doc_type in SCHEMAS:
+        return process_chunks_with_ai(chunks, doc_type, raise_errors)
+    return process_text_with_ai(pdf_text, doc_type, raise_errors)
+
+
+def process_chunks_with_ai(chunks, doc_type, raise_errors=False):
+    """
+    Ištraukia duomenis iš kiekvienos dokumento dalies lygiagrečiai ir sujungia dalinius rezultatus
+    (tušti laukai užpildomi iš kitų dalių, prekių sąrašai sujungiami be pasikartojimų).
+    Jei tipas nežinomas ('auto'), jis nustatomas iš pirmosios dalies.
+    """
+    print(f"  -> Ilgas dokumentas: {len(chunks)} dalys, apdorojama po {EXTRACTION_CHUNK_CONCURRENCY} lygiagrečiai.")
+    chunk_texts = [f"(Dokumento dalis {index + 1} iš {len(chunks)}. Laukus, kurių šioje dalyje nėra, "
+                   f"palikite tuščius.)\n{chunk}" for index, chunk in enumerate(chunks)]
+
+    parts = []
+    if doc_type == "auto":
+        first_part = process_chunk_with_ai(chunk_texts[0], doc_type, raise_errors)
+        if first_part is None:
+            return None
+        doc_type = doc_type_from_json(first_part)
+        if doc_type == "unknown":
+            return first_part
+        parts.append(first_part)
+        chunk_texts = chunk_texts[1:]
+
+    with ThreadPoolExecutor(max_workers=EXTRACTION_CHUNK_CONCURRENCY) as chunk_pool:
+        parts += chunk_pool.map(lambda chunk: process_chunk_with_ai(chunk, doc_type, raise_errors), chunk_texts)
+    if any(part is None for part in parts):
+        print(f"❌ Nepavyko apdoroti {sum(part is None for part in parts)} iš {len(parts)} dokumento dalių.")
+        return None
+    return validate_and_coerce(merge_partial_results(parts), SCHEMAS[doc_type])[0]
+
+
+def process_chunk_with_ai(chunk_text, doc_type, raise_errors=False):
+    """
+    Apdoroja vieną dokumento dalį, laikinos klaidos atveju ją iškart pakartodama.
+    """
+    for attempt in range(EXTRACTION_CHUNK_RETRIES + 1):
+        try:
+            return process_text_with_ai(chunk_text, doc_type, raise_errors=True)
+        except AIRequestError as e:
+            if e.kind == "permanent" or attempt == EXTRACTION_CHUNK_RETRIES:
+                if raise_errors:
+                    raise
+                return None
+            print(f"  -> Dalis nepavyko ({e.kind}), kartojama...")
+            metrics.increment("retries_total", stage="gemini_chunk")
+
+
+def process_text_with_ai(pdf_text, doc_type, raise_errors=False):
+    """
+    Vienas Gemini kvietimas visam pateiktam tekstui (be skaidymo į dalis).
     """
     if doc_type == "invoice":
         prompt = get_invoice_prompt(pdf_text)
         print("  -> Naudojamas SĄSKAITOS FAKTŪROS raginimas.")
+    elif doc_type == "auto":
+        prompt = get_combined_prompt(pdf_text)
+        print("  -> Naudojamas BENDRAS (tipas + duomenys) raginimas.")
     elif doc_type == "contract":
         prompt = get_contract_prompt(pdf_text)
         print("  -> Naudojamas SUTARTIES raginimas.")
@@ -222,31 +590,54 @@ def process_pdf_with_ai(pdf_text, doc_type):
         print(f"Klaida: Nepalaikomas dokumento tipas: {doc_type}")
         return None
 
-    response = None
-
+    schema = SCHEMAS[doc_type]
     try:
-        response = AI_MODEL.generate_content(prompt)
+        response = generate_content(prompt, schema)
+        doc_json_data = parse_ai_response(response.text, schema)
+    except Exception as e:
+        print(f"Klaida bendraujant su Gemini AI arba apdorojant atsakymą: {e}")
+        if raise_errors:
+            raise AIRequestError(e) from e
+        return None
 
-        # Rankinis JSON valymas (pašaliname '```json' ir '```', naudojame regex)
-        # Tai yra tvirčiausias būdas išgauti JSON, net jei modelis prideda žymes.
-        match = re.search(r'\{.*\}', response.text.strip(), re.DOTALL)
+    if doc_json_data is None:
+        if raise_errors:
+            # Sugadintas JSON dažniausiai nepasikartoja kitą kartą
+            raise AIRequestError("Nepavyko gauti tinkamo JSON atsakymo", kind="transient")
+        return None
 
-        if match:
-            json_string = match.group(0)
-        else:
-            # Atsarginis valymas
-            json_string = response.text.strip().lstrip('`json').strip('`')
+    if doc_type == "auto":
+        # Bendrame atsakyme yra abiejų tipų laukai - paliekame tik nustatyto tipo
+        detected_type = doc_type_from_json(doc_json_data)
+        if detected_type != "unknown":
+            doc_json_data = validate_and_coerce(doc_json_data, SCHEMAS[detected_type])[0]
+    return doc_json_data
 
-        return json.loads(json_string)
 
-    except json.JSONDecodeError as e:
-        print(f"❌ Klaida dekoduojant JSON atsakymą: {e}")
-        if response:
-            print(f"Modelio grąžintas tekstas (pradžia):\n{response.text[:500]}...")
-        return None
-    except Exception as e:
-        print(f"Klaida bendraujant su Gemini AI arba apdorojant atsakymą: {e}")
-        return None
+def parse_ai_response(response_text, schema):
+    """
+    Patikrina modelio atsakymą pagal schemą ir suveda skaičius. Jei atsakymas sugadintas,
+    vieną kartą siunčia pigų taisymo raginimą (tik atsakymas ir klaidos, be dokumento teksto).
+    Grąžina duomenis arba None, jei JSON nepavyko gauti net po taisymo.
+    """
+    doc_json_data, errors = parse_and_validate(response_text, schema)
+    if not errors:
+        return doc_json_data
+
+    print(f"⚠️ Atsakymas neatitinka schemos ({len(errors)} klaidos, pvz.: {errors[0]}). Siunčiamas taisymo raginimas.")
+    metrics.increment("retries_total", stage="gemini_repair")
+    repaired_data, repaired_errors = parse_and_validate(
+        generate_content(get_repair_prompt(response_text, errors), schema).text, schema)
+    if repaired_data is not None and (not repaired_errors or doc_json_data is None):
+        if repaired_errors:
+            print(f"⚠️ Po taisymo liko {len(repaired_errors)} klaidos; trūkstamos reikšmės užpildytos numatytosiomis.")
+        return repaired_data
+    if doc_json_data is not None:
+        print("⚠️ Taisymas nepadėjo; naudojamos suvestos reikšmės (trūkstamos - numatytosios).")
+        return doc_json_data
+    print(f"❌ Klaida dekoduojant JSON atsakymą: {errors[0]}")
+    print(f"Modelio grąžintas tekstas (pradžia):\n{response_text[:500]}...")
+    return None
 
 
 def process_folder(pdf_input_folder):
@@ -263,56 +654,257 @@ def process_folder(pdf_input_folder):
         print(f"Aplanke '{pdf_input_folder}' nerasta jokių PDF failų.")
         return
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(pdf_input_folder, pdf_file)
-        print(f"\n--- Apdorojamas failas: {pdf_file}...")
+    # Fone analizuojami likę puslapiai, kol klasifikatorius laukia AI atsakymo
+    with ThreadPoolExecutor(max_workers=1) as page_parser:
+        for pdf_file in pdf_files:
+            pdf_path = os.path.join(pdf_input_folder, pdf_file)
+            print(f"\n--- Apdorojamas failas: {pdf_file}...")
+
+            # 1. PDF atidaromas vieną kartą: pirmieji puslapiai - klasifikavimui (greičiau)
+            pages = iter_pdf_pages(pdf_path)
+            first_pages = list(islice(pages, CLASSIFICATION_PAGE_LIMIT))
+            pdf_sample_text = join_pages(first_pages)
+            if not pdf_sample_text:
+                pages.close()
+                print(f"Tekstas iš '{pdf_file}' neišgautas. Praleidžiama.")
+                continue
+
+            remaining_pages = page_parser.submit(list, pages)
+            process_document_texts(pdf_path, pdf_sample_text,
+                                   lambda: join_pages(first_pages + remaining_pages.result()))
+            # Užtikriname, kad failas uždarytas prieš jį pašalinant ar pereinant prie kito
+            remaining_pages.result()
+
+
+def classify_pdf(pdf_path, pdf_sample_text, pdf_sha256=None, raise_errors=False, allow_single_call=False):
+    """
+    Klasifikuoja dokumentą: podėlis -> vietinis klasifikatorius -> Gemini.
+    Grąžina 'invoice', 'contract' arba 'unknown'. Jei `allow_single_call` ir vietinis klasifikatorius
+    neužtikrintas, grąžina None: tipą nustatys bendras raginimas (extract_and_classify_pdf).
+    """
+    pdf_file = os.path.basename(pdf_path)
+    cache = EXTRACTION_CACHE
+    if cache and pdf_sha256 is None:
+        pdf_sha256 = hash_pdf_file(pdf_path)
+
+    doc_type = cache.get(pdf_sha256, "classification", PROMPT_VERSION, AI_MODEL_NAME) if cache else None
+    if cache:
+        metrics.record_cache_lookup("extraction", doc_type is not None)
+    if doc_type:
+        print(f"  -> [{pdf_file}] Klasifikacija rasta podėlyje.")
+    elif (doc_type := preclassify_document(pdf_sample_text)):
+        print(f"  -> [{pdf_file}] Tipas nustatytas pagal raktinius žodžius (be AI).")
+        metrics.increment("preclassified_total", doc_type=doc_type)
+    elif allow_single_call:
+        return None
+    else:
+        doc_type = classify_document(pdf_sample_text, raise_errors)
+        # 'unknown' nesaugome: jis gali būti laikinos API klaidos pasekmė
+        if cache and doc_type != "unknown":
+            cache.put(pdf_sha256, "classification", PROMPT_VERSION, AI_MODEL_NAME, doc_type)
+    print(f"  -> [{pdf_file}] Dokumento tipas nustatytas kaip: **{doc_type.upper()}**")
+    return doc_type
 
-        # 1. Paimame tik dalį teksto klasifikavimui (greičiau)
-        pdf_sample_text = extract_text_from_pdf(pdf_path)
-        if not pdf_sample_text:
-            print(f"Tekstas iš '{pdf_file}' neišgautas. Praleidžiama.")
-            continue
 
-        # 2. Klasifikuojame dokumentą
-        doc_type = classify_document(pdf_sample_text)
-        print(f"  -> Dokumento tipas nustatytas kaip: **{doc_type.upper()}**")
+def extract_pdf_data(pdf_path, doc_type, full_text_source, pdf_sha256=None, raise_errors=False):
+    """
+    Ištraukia jau suklasifikuoto dokumento duomenis su AI (pirmiausia tikrindama podėlį).
+    `full_text_source` - pilnas tekstas arba funkcija, kuri jį grąžina (ištraukiama tik prireikus).
+    """
+    pdf_file = os.path.basename(pdf_path)
+    cache = EXTRACTION_CACHE
+    if cache and pdf_sha256 is None:
+        pdf_sha256 = hash_pdf_file(pdf_path)
+
+    doc_json_data = cache.get(pdf_sha256, doc_type, PROMPT_VERSION, AI_MODEL_NAME) if cache else None
+    if cache:
+        metrics.record_cache_lookup("extraction", doc_json_data is not None)
+    if doc_json_data:
+        print(f"  -> [{pdf_file}] Ištraukti duomenys rasti podėlyje, AI nekviečiamas.")
+        return doc_json_data
+
+    # 3. Ištraukiame visą tekstą (jei reikia išsamiai analizei)
+    full_pdf_text = full_text_source() if callable(full_text_source) else full_text_source
+
+    # 4. Apdorojame su AI, naudodami atitinkamą raginimą
+    doc_json_data = process_pdf_with_ai(full_pdf_text, doc_type, raise_errors)
+    # Išsaugome iškart po API kvietimo, kad strigties atveju nereikėtų kartoti
+    if cache and doc_json_data:
+        cache.put(pdf_sha256, doc_type, PROMPT_VERSION, AI_MODEL_NAME, doc_json_data)
+    return doc_json_data
+
+
+def extract_and_classify_pdf(pdf_path, full_text_source, pdf_sha256=None, raise_errors=False):
+    """
+    Vienas Gemini kvietimas: nustato dokumento tipą ir ištraukia duomenis (bendras raginimas).
+    Grąžina (dokumento tipas, JSON duomenys arba None).
+    """
+    pdf_file = os.path.basename(pdf_path)
+    cache = EXTRACTION_CACHE
+    if cache and pdf_sha256 is None:
+        pdf_sha256 = hash_pdf_file(pdf_path)
+
+    full_pdf_text = full_text_source() if callable(full_text_source) else full_text_source
+    doc_json_data = process_pdf_with_ai(full_pdf_text, "auto", raise_errors)
+    doc_type = doc_type_from_json(doc_json_data)
+    print(f"  -> [{pdf_file}] Dokumento tipas nustatytas kaip: **{doc_type.upper()}**")
+    if doc_type == "unknown":
+        return doc_type, None
+
+    # Podėlyje saugoma taip pat, kaip dviejų kvietimų režime
+    if cache:
+        cache.put(pdf_sha256, "classification", PROMPT_VERSION, AI_MODEL_NAME, doc_type)
+        cache.put(pdf_sha256, doc_type, PROMPT_VERSION, AI_MODEL_NAME, doc_json_data)
+    return doc_type, doc_json_data
+
+
+def classify_and_extract(pdf_path, pdf_sample_text, full_text_source, raise_errors=False):
+    """
+    Klasifikuoja dokumentą ir ištraukia jo duomenis su AI (naudodama podėlį, jei jis įjungtas).
+    `full_text_source` - pilnas tekstas arba funkcija, kuri jį grąžina (ištraukiama tik prireikus).
+    Grąžina (dokumento tipas, JSON duomenys arba None).
+    """
+    pdf_file = os.path.basename(pdf_path)
+    pdf_sha256 = hash_pdf_file(pdf_path) if EXTRACTION_CACHE else None
+
+    # 2. Klasifikuojame dokumentą (arba, jei tipas neaiškus, paliekame tai bendram raginimui)
+    doc_type = classify_pdf(pdf_path, pdf_sample_text, pdf_sha256, raise_errors,
+                            allow_single_call=EXTRACTION_MODE == "single")
+    if doc_type is None:
+        doc_type, doc_json_data = extract_and_classify_pdf(pdf_path, full_text_source, pdf_sha256, raise_errors)
+    elif doc_type != "unknown":
+        doc_json_data = extract_pdf_data(pdf_path, doc_type, full_text_source, pdf_sha256, raise_errors)
+    if doc_type == "unknown":
+        print(f"❌ Nepavyko nustatyti dokumento tipo: {pdf_file}. Jis nebuvo apdorotas.")
+        return doc_type, None
+
+    if not doc_json_data:
+        print(f"❌ Nepavyko išgauti struktūrizuotų duomenų iš: {pdf_file}. Jis nebuvo pašalintas.")
+    return doc_type, doc_json_data
+
+
+def save_document_json(pdf_path, doc_type, doc_json_data):
+    """
+    Išsaugo ištrauktus duomenis JSON faile pagal dokumento tipą ir pašalina originalų PDF.
+    """
+    pdf_file = os.path.basename(pdf_path)
+    json_file_name = pdf_file.replace('.pdf', '.json')
 
-        if doc_type == "unknown":
-            print(f"❌ Nepavyko nustatyti dokumento tipo: {pdf_file}. Jis nebuvo apdorotas.")
-            continue
+    # Pasirenkame išvesties aplanką pagal tipą
+    if doc_type == "invoice":
+        json_path = os.path.join(JSON_FOLDER_INVOICES, json_file_name)
+    else:  # contract
+        json_path = os.path.join(JSON_FOLDER_CONTRACTS, json_file_name)
 
-        # 3. Ištraukiame visą tekstą (jei reikia išsamiai analizei)
-        full_pdf_text = extract_full_text_from_pdf(pdf_path)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        # Naudojame 'ensure_ascii=False' kad išsaugotume lietuviškas raides
+        json.dump(doc_json_data, f, indent=2, ensure_ascii=False)
 
-        # 4. Apdorojame su AI, naudodami atitinkamą raginimą
-        doc_json_data = process_pdf_with_ai(full_pdf_text, doc_type)
+    print(f"✅ Sėkmingai sugeneruotas JSON failas: {json_file_name} į '{doc_type}' aplanką.")
 
-        if doc_json_data:
-            json_file_name = pdf_file.replace('.pdf', '.json')
+    os.remove(pdf_path)
+    print(f"🗑️ Originalus PDF failas '{pdf_file}' pašalintas.")
 
-            # Pasirenkame išvesties aplanką pagal tipą
-            if doc_type == "invoice":
-                json_path = os.path.join(JSON_FOLDER_INVOICES, json_file_name)
-            else:  # contract
-                json_path = os.path.join(JSON_FOLDER_CONTRACTS, json_file_name)
 
-            with open(json_path, 'w', encoding='utf-8') as f:
-                # Naudojame 'ensure_ascii=False' kad išsaugotume lietuviškas raides
-                json.dump(doc_json_data, f, indent=2, ensure_ascii=False)
+def process_document_texts(pdf_path, pdf_sample_text, full_text_source):
+    """
+    Klasifikuoja dokumentą, ištraukia duomenis su AI ir išsaugo JSON.
+    Grąžina True, jei dokumentas sėkmingai apdorotas.
+    """
+    doc_type, doc_json_data = classify_and_extract(pdf_path, pdf_sample_text, full_text_source)
+    if not doc_json_data:
+        return False
+    save_document_json(pdf_path, doc_type, doc_json_data)
+    return True
 
-            print(f"✅ Sėkmingai sugeneruotas JSON failas: {json_file_name} į '{doc_type}' aplanką.")
 
-            os.remove(pdf_path)
-            print(f"🗑️ Originalus PDF failas '{pdf_file}' pašalintas.")
-        else:
-            print(f"❌ Nepavyko išgauti struktūrizuotų duomenų iš: {pdf_file}. Jis nebuvo pašalintas.")
+def process_folder_pipelined(pdf_input_folder, workers=4, concurrency=4, requests_per_minute=GEMINI_REQUESTS_PER_MINUTE):
+    """
+    Lygiagretus aplanko apdorojimas:
+    - procesų telkinys (`workers`) ištraukia tekstą su pdfplumber (CPU darbas),
+    - gijų telkinys (`concurrency`) vykdo Gemini kvietimus, ribojamus `requests_per_minute`.
+    Tekstas perduodamas į AI etapą iškart, kai tik jis ištrauktas.
+    """
+    global RATE_LIMITER
+
+    if not os.path.exists(pdf_input_folder):
+        print(f"Informacija: Aplankas '{pdf_input_folder}' nerastas. Praleidžiama.")
+        return
+
+    pdf_files = [f for f in os.listdir(pdf_input_folder) if f.endswith('.pdf')]
+    if not pdf_files:
+        print(f"Aplanke '{pdf_input_folder}' nerasta jokių PDF failų.")
+        return
+
+    RATE_LIMITER = RateLimiter(requests_per_minute)
+    print(f"Lygiagretus režimas: {len(pdf_files)} PDF, procesai={workers}, AI užklausos={concurrency}, "
+          f"limitas={requests_per_minute or 'neribojamas'}/min.")
+
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as ai_pool:
+        extract_futures = {
+            extract_pool.submit(extract_texts_for_pipeline, os.path.join(pdf_input_folder, pdf_file)): pdf_file
+            for pdf_file in pdf_files
+        }
+        ai_futures = []
+        for future in as_completed(extract_futures):
+            pdf_file = extract_futures[future]
+            pdf_path = os.path.join(pdf_input_folder, pdf_file)
+            try:
+                pdf_sample_text, full_pdf_text = future.result()
+            except Exception as e:
+                print(f"Klaida ištraukiant tekstą iš PDF '{pdf_path}': {e}")
+                continue
+            if not pdf_sample_text:
+                print(f"Tekstas iš '{pdf_file}' neišgautas. Praleidžiama.")
+                continue
+            ai_futures.append(ai_pool.submit(process_document_texts, pdf_path, pdf_sample_text, full_pdf_text))
+
+        for future in as_completed(ai_futures):
+            try:
+                if future.result():
+                    processed += 1
+            except Exception as e:
+                print(f"Klaida apdorojant dokumentą su AI: {e}")
+
+    print(f"\nLygiagrečiai apdorota sėkmingai: {processed} iš {len(pdf_files)}.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PDF dokumentų konvertavimas į JSON su Gemini AI.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesų skaičius teksto ištraukimui iš PDF (numatyta: 1 - nuoseklus režimas).")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Vienu metu vykdomų Gemini užklausų skaičius (numatyta: 1).")
+    parser.add_argument("--rpm", type=int, default=GEMINI_REQUESTS_PER_MINUTE,
+                        help="Gemini užklausų limitas per minutę (0 - neribojama).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Nenaudoti AI rezultatų podėlio (visada kreiptis į Gemini).")
+    return parser.parse_args()
 
 
 def main():
+    global EXTRACTION_CACHE
+
+    args = parse_args()
+    if not args.no_cache:
+        EXTRACTION_CACHE = ExtractionCache()
+    ensure_folders()
     print("\n--- Pradedamas automatizuotas DOKUMENTŲ apdorojimas (SF/Sutartis) ---")
     # Visi failai dabar apdorojami iš vieno aplanko
-    process_folder(PDF_FOLDER_DOCUMENTS)
+    if args.workers > 1 or args.concurrency > 1:
+        process_folder_pipelined(PDF_FOLDER_DOCUMENTS, args.workers, args.concurrency, args.rpm)
+    else:
+        process_folder(PDF_FOLDER_DOCUMENTS)
+
+    if EXTRACTION_CACHE:
+        stats = EXTRACTION_CACHE.stats()
+        print(f"\nPodėlis: pataikymai {stats['hits']}, praleidimai {stats['misses']} "
+              f"({stats['hit_rate']:.0%}), įrašų {stats['entries']}, dydis {stats['size_bytes'] / 1024:.1f} KB.")
+        EXTRACTION_CACHE.close()
 
+    metrics.print_summary("PDF -> JSON METRIKOS")
     print("\n\n--- Visų dokumentų konvertavimas baigtas. ---")
 
 
@@ -0,0 +1,116 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+
+def _numpy():
+    """
+    numpy reikalingas tik semantinei paieškai, todėl importuojamas pirmo kvietimo metu.
+    """
+    import numpy
+    return numpy
+
+
+def normalize_query(query):
+    """
+    Suvienodina klausimą podėlio raktui: mažosios raidės, vienas tarpas, be galinių skyrybos ženklų.
+    """
+    return re.sub(r'\s+', ' ', query.strip().lower()).rstrip('?!. ')
+
+
+class AnswerCache:
+    """
+    LLM atsakymų podėlis su TTL ir LRU šalinimu.
+    Raktas: (normalizuotas klausimas, kolekcijų versija). Pasirinktinai ieško ir semantiškai
+    artimų klausimų pagal užklausos vektorių (kosinusinis panašumas >= `similarity_threshold`).
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, similarity_threshold=0.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # (klausimas, versija) -> (atsakymas, sukūrimo laikas, vektorius)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _is_expired(self, created):
+        return self.ttl_seconds > 0 and time.monotonic() - created > self.ttl_seconds
+
+    def get(self, query, version, query_embedding=None):
+        """
+        Grąžina išsaugotą atsakymą arba None.
+        """
+        if not self.enabled:
+            return None
+        key = (normalize_query(query), version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_expired(entry[1]):
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+            if query_embedding is not None and self.similarity_threshold > 0:
+                match = self._find_similar(version, query_embedding)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match][0]
+
+            self.misses += 1
+            return None
+
+    def _find_similar(self, version, query_embedding):
+        np = _numpy()
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector) or 1.0
+        best_key, best_score = None, self.similarity_threshold
+        for key, (answer, created, embedding) in self._entries.items():
+            if key[1] != version or embedding is None or self._is_expired(created):
+                continue
+            score = float(np.dot(query_vector, embedding) / (query_norm * (np.linalg.norm(embedding) or 1.0)))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def put(self, query, version, answer, query_embedding=None):
+        if not self.enabled:
+            return
+        key = (normalize_query(query), version)
+        embedding = None
+        if query_embedding is not None:
+            np = _numpy()
+            embedding = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
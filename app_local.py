@@ -1,12 +1,22 @@
 import os
+import re
 import json
-import chromadb
+import time
+import datetime
+import itertools
+import threading
 # Importuojame requests biblioteką, skirtą bendrauti su vietiniu API
 import requests
+from requests.adapters import HTTPAdapter
 # Importuojame dotenv biblioteką
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template
-from sentence_transformers import SentenceTransformer
+from flask import Blueprint, Flask, Response, request, jsonify, render_template, stream_with_context
+import metrics
+from metrics import estimate_tokens
+from answer_cache import AnswerCache
+from collection_version import read_collection_version, resolve_collection_name
+from query_router import answer_structured_query, find_company_codes, parse_date_range
+from structured_store import StructuredStore, to_date_number
 
 # 1. BENDRI NUSTATYMAI
 # ---
@@ -15,41 +25,407 @@ load_dotenv()
 
 # 2. Konfigūruojame vietinį LLM (Ollama)
 # ---
-LOCAL_LLM_URL = "http://localhost:11434/api/generate"
+# Vienas ar keli Ollama serveriai, atskirti kableliais; užklausos paskirstomos paeiliui (round-robin)
+OLLAMA_BASE_URLS = [url.strip().rstrip('/') for url in
+                    os.getenv("OLLAMA_BASE_URLS", "http://localhost:11434").split(",") if url.strip()]
+# Prisijungimo ir atsakymo laukimo limitai sekundėmis
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))
+# Kiek nuolatinių (keep-alive) jungčių laikoma kiekvienam serveriui
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "32"))
 # Pakeiskite į modelio pavadinimą, kurį esate įkėlę į Ollama (pvz., 'llama3', 'mistral', 'phi3')
 LOCAL_LLM_MODEL = "llama3"
+# Modelio konteksto langas žetonais (Ollama 'num_ctx'). Ilgesnį raginimą Ollama tyliai nukerpa, todėl langas
+# nurodomas kiekvienoje užklausoje ir pagal jį ribojamas raginimas; 0 - naudoti Ollama numatytąjį
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+# Kiek konteksto lango žetonų paliekama atsakymui
+ANSWER_TOKEN_RESERVE = int(os.getenv("ASK_ANSWER_TOKEN_RESERVE", "512"))
+
+# 2a. KONTEKSTO PAIEŠKOS (RETRIEVAL) NUSTATYMAI
+# ---
+# 'hybrid' - vektorinės ir leksinės (BM25, SQLite FTS5) paieškos rezultatai sujungiami (reciprocal rank fusion)
+# 'topk'   - į raginimą siunčiami tik k artimiausių dokumentų (vektorinė paieška)
+# 'all'    - senasis režimas: į raginimą siunčiami visi dokumentai
+RETRIEVAL_MODE = os.getenv("ASK_RETRIEVAL_MODE", "hybrid")
+# Kiek artimiausių dokumentų imama iš KIEKVIENOS kolekcijos
+RETRIEVAL_TOP_K = int(os.getenv("ASK_TOP_K", "8"))
+# Apytikslis konteksto dydžio limitas žetonais (tokens), kad neviršytume llama3 konteksto lango
+# (nustačius OLLAMA_NUM_CTX, limitas dar sumažinamas iki lango be atsakymo rezervo ir klausimo)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("ASK_CONTEXT_TOKEN_BUDGET", "3000"))
+# Beveik identiški dokumentai (pvz., kas mėnesį pasikartojančios to paties tiekėjo sąskaitos) kontekste
+# pateikiami glaustai: panašumo (Jaccard, skaičiai nevertinami) slenkstis 0-1, 0 - netikrinti
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("ASK_CONTEXT_DEDUP_THRESHOLD", "0.9"))
+# Jei įjungta, visi dokumentai kontekste pateikiami glaustai (laukai iš JSON), o ne pilnais sakiniais
+COMPACT_CONTEXT = os.getenv("ASK_COMPACT_CONTEXT", "0") == "1"
+# Jei įjungta, ieškoma ir dokumentų dalių kolekcijoje (atskiros prekės, sutarties dalys - žr. main.py),
+# o rasti atitikmenys sugrupuojami pagal dokumentą
+RETRIEVAL_MULTI_VECTOR = os.getenv("ASK_MULTI_VECTOR", "1") == "1"
+# Kiek dalių imama vienam grąžinamam dokumentui (kelios to paties dokumento dalys sujungiamos į vieną)
+MULTI_VECTOR_OVERSAMPLE = int(os.getenv("ASK_MULTI_VECTOR_OVERSAMPLE", "3"))
+# Reciprocal rank fusion konstanta: dokumento įvertis = sum(1 / (RRF_K + vieta sąraše))
+RRF_K = int(os.getenv("ASK_RRF_K", "60"))
+# Jei klausime yra identifikatorius (sąskaitos numeris, įmonės ar PVM kodas) ir jį atitinka ne daugiau kaip
+# top_k dokumentų, grąžinami tik jie - be klausimo vektorizavimo ir vektorinės paieškos
+IDENTIFIER_SHORTCUT = os.getenv("ASK_IDENTIFIER_SHORTCUT", "1") == "1"
+# Jei įjungta, klausime minimas datų intervalas ir žinomos įmonės paverčiami ChromaDB `where` filtru,
+# todėl vektorinė paieška vykdoma tik atitinkamame dokumentų poaibyje (žr. main.filter_metadata)
+METADATA_FILTERS = os.getenv("ASK_METADATA_FILTERS", "1") == "1"
+# Iki kiek dienų trunkantis intervalas filtruojamas dienų sąrašu ($in), o ne palyginimais ($gte / $lte):
+# ChromaDB lygybės sąlygas tikrina kelis kartus greičiau nei intervalus
+METADATA_FILTER_MAX_DAYS = int(os.getenv("ASK_METADATA_FILTER_MAX_DAYS", "92"))
+# Jei filtrą atitinka ne daugiau dokumentų, jų ID randami SQLite indeksuose ir vektorinė paieška vykdoma
+# tik tarp jų (ChromaDB `where` sąlygas tikrina peržiūrėdama metaduomenis, todėl lėtėja augant archyvui)
+METADATA_FILTER_MAX_IDS = int(os.getenv("ASK_METADATA_FILTER_MAX_IDS", "5000"))
+# Tas pats daugiakalbis modelis, kuriuo dokumentai vektorizuojami main.py
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-mpnet-base-v2'
+
+# 2b. STRUKTŪRIZUOTŲ UŽKLAUSŲ NUSTATYMAI
+# ---
+# Jei įjungta, agreguoti klausimai (sumos, kiekiai, terminai) atsakomi tiesiai iš SQLite, be LLM
+STRUCTURED_QUERY_ROUTER = os.getenv("STRUCTURED_QUERY_ROUTER", "1") == "1"
+
+# 2c. ATSAKYMŲ PODĖLIO NUSTATYMAI
+# ---
+# Kiek atsakymų laikoma atmintyje (0 - podėlis išjungtas) ir kiek sekundžių jie galioja
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Semantinis artimų klausimų paieškos slenkstis (kosinusinis panašumas, 0 - išjungta, pvz., 0.95)
+ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0"))
 
 # 3. CHROMADB NUSTATYMAI
 # ---
 DB_PATH = "./my_documents_db"  # Naudojame tą patį kelią, kuris buvo nustatytas vektorizavimo kode
 INVOICE_COLLECTION_NAME = "invoices"
 CONTRACT_COLLECTION_NAME = "contracts"
+PARTS_COLLECTION_NAME = "document_parts"
 
-# 4. SERVERIO INICIALIZAVIMAS
+# 4. LLM KLIENTAS
 # ---
-app = Flask(__name__)
+class OllamaClient:
+    """
+    Ollama API klientas su nuolatinėmis (keep-alive) jungtimis, laukimo limitais
+    ir užklausų paskirstymu tarp kelių serverių (round-robin).
+    """
 
-# Sentence-transformers modelis naudojamas ne šioje aplikacijoje, bet paliekame čia dėl konteksto
-# sentence_model = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2')
+    def __init__(self, base_urls, model, connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout=OLLAMA_READ_TIMEOUT, pool_size=OLLAMA_POOL_SIZE, num_ctx=OLLAMA_NUM_CTX):
+        self.base_urls = list(base_urls)
+        self.model = model
+        self.num_ctx = num_ctx
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self._url_cycle = itertools.cycle(self.base_urls)
+        self._url_lock = threading.Lock()
 
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.base_urls), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._async_session = None
+
+    def _next_base_url(self):
+        with self._url_lock:
+            return next(self._url_cycle)
+
+    def _post(self, payload, stream=False):
+        """
+        Siunčia užklausą kitam serveriui eilėje. Jei serveris nepasiekiamas, bandomas kitas.
+        """
+        last_error = None
+        for _ in range(len(self.base_urls)):
+            url = f"{self._next_base_url()}/api/generate"
+            try:
+                response = self.session.post(url, json=payload, stream=stream, timeout=self.timeout)
+                response.raise_for_status()
+                return response
+            except requests.exceptions.ConnectionError as e:
+                print(f"Įspėjimas: Ollama serveris {url} nepasiekiamas: {e}")
+                metrics.increment("errors_total", target="ollama", kind="connection")
+                last_error = e
+        raise last_error
+
+    def _payload(self, prompt, stream):
+        payload = {"model": self.model, "prompt": prompt, "stream": stream}
+        if self.num_ctx:
+            payload["options"] = {"num_ctx": self.num_ctx}
+        return payload
+
+    def generate(self, prompt, usage=None):
+        """
+        Grąžina visą sugeneruotą atsakymą (stream: False).
+        Jei perduotas `usage` žodynas, į jį įrašoma raginimo statistika (žr. read_ollama_usage).
+        """
+        prompt_tokens = metrics.record_prompt("ollama", prompt)
+        with metrics.timed("ollama"):
+            response = self._post(self._payload(prompt, False))
+            data = response.json()
+        read_ollama_usage(data, prompt_tokens, usage)
+        return data.get('response', 'Klaida: Nepavyko gauti atsakymo iš vietinio LLM.')
+
+    def stream(self, prompt, usage=None):
+        """
+        Po vieną grąžina žetonus iš Ollama srautinio (NDJSON) atsakymo.
+        Raginimo statistika (`usage`) užpildoma iš paskutinio įvykio.
+        """
+        prompt_tokens = metrics.record_prompt("ollama", prompt)
+        started = time.perf_counter()
+        first_token = True
+        with metrics.timed("ollama_stream"), self._post(self._payload(prompt, True), stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise requests.exceptions.RequestException(chunk['error'])
+                if chunk.get('response'):
+                    if first_token:
+                        metrics.observe("llm_first_token_seconds", time.perf_counter() - started, target="ollama")
+                        first_token = False
+                    yield chunk['response']
+                if chunk.get('done'):
+                    read_ollama_usage(chunk, prompt_tokens, usage)
+                    break
+
+    def _get_async_session(self):
+        # aiohttp nėra privaloma priklausomybė, todėl importuojame tik prireikus
+        import aiohttp
+
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            )
+        return self._async_session
+
+    async def _apost(self, payload):
+        """
+        Asinchroninis _post() variantas: siunčia užklausą kitam serveriui eilėje, nepasiekiamą serverį praleidžia.
+        Grąžina atsakymą, kurį kviečiantysis uždaro (async with).
+        """
+        import aiohttp
+
+        # Prisijungimo laiko limitas - taip pat nepasiekiamas serveris (kaip requests ConnectTimeout, aiohttp >= 3.10)
+        connection_errors = (aiohttp.ClientConnectorError,
+                             getattr(aiohttp, "ConnectionTimeoutError", aiohttp.ClientConnectorError))
+        last_error = None
+        for _ in range(len(self.base_urls)):
+            url = f"{self._next_base_url()}/api/generate"
+            try:
+                response = await self._get_async_session().post(url, json=payload)
+            except connection_errors as e:
+                print(f"Įspėjimas: Ollama serveris {url} nepasiekiamas: {e}")
+                metrics.increment("errors_total", target="ollama", kind="connection")
+                last_error = e
+                continue
+            try:
+                response.raise_for_status()
+            except BaseException:
+                response.release()
+                raise
+            return response
+        raise last_error
+
+    async def agenerate(self, prompt, usage=None):
+        """
+        Asinchroninis generate() variantas (reikalinga 'aiohttp' biblioteka).
+        """
+        prompt_tokens = metrics.record_prompt("ollama", prompt)
+        with metrics.timed("ollama"):
+            async with await self._apost(self._payload(prompt, False)) as response:
+                data = await response.json()
+        read_ollama_usage(data, prompt_tokens, usage)
+        return data.get('response', 'Klaida: Nepavyko gauti atsakymo iš vietinio LLM.')
+
+    async def astream(self, prompt, usage=None):
+        """
+        Asinchroninis stream() variantas: po vieną grąžina žetonus, neužimdamas gijos laukimo metu.
+        """
+        import aiohttp
 
-# 5. CHROMADB KOLEKCIJŲ INICIALIZAVIMAS
+        prompt_tokens = metrics.record_prompt("ollama", prompt)
+        started = time.perf_counter()
+        first_token = True
+        with metrics.timed("ollama_stream"):
+            async with await self._apost(self._payload(prompt, True)) as response:
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise aiohttp.ClientError(chunk['error'])
+                    if chunk.get('response'):
+                        if first_token:
+                            metrics.observe("llm_first_token_seconds", time.perf_counter() - started, target="ollama")
+                            first_token = False
+                        yield chunk['response']
+                    if chunk.get('done'):
+                        read_ollama_usage(chunk, prompt_tokens, usage)
+                        break
+
+    async def aclose(self):
+        if self._async_session is not None:
+            await self._async_session.close()
+
+    def close(self):
+        self.session.close()
+
+
+def read_ollama_usage(data, prompt_tokens, usage=None):
+    """
+    Užregistruoja Ollama atsakymo (arba paskutinio srauto įvykio) statistiką: kiek raginimo žetonų modelis
+    apdorojo (prompt_eval_count) ir per kiek laiko (prompt_eval_duration, ns). Jei perduotas `usage`
+    žodynas, į jį įrašomas raginimo žetonų įvertis ir Ollama reikšmės milisekundėmis.
+    """
+    if 'prompt_eval_count' in data:
+        metrics.increment("llm_prompt_eval_tokens_total", data['prompt_eval_count'], target="ollama")
+    if 'prompt_eval_duration' in data:
+        metrics.observe("llm_prompt_eval_seconds", data['prompt_eval_duration'] / 1e9, target="ollama")
+    if usage is None:
+        return
+    usage['prompt_tokens_estimate'] = prompt_tokens
+    for key in ('prompt_eval_count', 'eval_count'):
+        if key in data:
+            usage[key] = data[key]
+    for key in ('prompt_eval_duration', 'eval_duration', 'load_duration', 'total_duration'):
+        if key in data:
+            usage[key.replace('_duration', '_ms')] = round(data[key] / 1e6, 1)
+
+
+def report_usage(usage):
+    """
+    Atspausdina vienos /ask užklausos raginimo dydį ir Ollama raginimo apdorojimo trukmę.
+    """
+    line = f"📏 Raginimas: ~{usage.get('prompt_tokens_estimate', '?')} žetonų (įvertis)"
+    if 'prompt_eval_count' in usage:
+        line += f", Ollama apdorojo {usage['prompt_eval_count']} žetonų"
+    if 'prompt_eval_ms' in usage:
+        line += f" per {usage['prompt_eval_ms']:.0f} ms"
+    print(line)
+    metrics.log_event("llm_usage", **usage)
+
+
+llm_client = OllamaClient(OLLAMA_BASE_URLS, LOCAL_LLM_MODEL)
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_SEMANTIC_THRESHOLD)
+
+
+# 5. SERVERIO INICIALIZAVIMAS
+# ---
+# Maršrutai registruojami Blueprint'e, o Flask programą sukuria create_app() (žr. serve.py)
+bp = Blueprint('app_local', __name__)
+
+# Sunkūs komponentai (įdėjimo modelis, ChromaDB, SQLite saugykla) inicijuojami tik pirmo kvietimo metu,
+# kad Flask startuotų greitai. Užraktas apsaugo nuo dvigubo įkėlimo, kai užklausos ateina vienu metu.
+_init_lock = threading.Lock()
+sentence_model = None
+client = None
+invoice_collection = None
+contract_collection = None
+parts_collection = None
+structured_store = None
+# Kolekcijų versija prisijungimo metu (žr. refresh_collections)
+collections_version = None
+# (kolekcijų versija, {įmonės kodas: pavadinimas}) - žr. get_known_companies
+_known_companies = (None, {})
+
+
+def get_sentence_model():
+    """
+    Grąžina įdėjimo modelį, įkeldama jį pirmo kvietimo metu.
+    """
+    global sentence_model
+    if sentence_model is None:
+        with _init_lock:
+            if sentence_model is None:
+                # Importuojame tik čia: torch importas užtrunka kelias sekundes
+                from sentence_transformers import SentenceTransformer
+                print(f"Įkeliamas įdėjimo modelis ({EMBEDDING_MODEL_NAME})...")
+                with metrics.timed("model_load"):
+                    sentence_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return sentence_model
+
+
+# 6. CHROMADB KOLEKCIJŲ INICIALIZAVIMAS
 # ---
-print(f"Jungiamės prie ChromaDB ({DB_PATH})...")
-client = chromadb.PersistentClient(path=DB_PATH)
+def get_collections():
+    """
+    Grąžina (sąskaitų kolekcija, sutarčių kolekcija), prisijungdama prie ChromaDB pirmo kvietimo metu.
+    """
+    global client, invoice_collection, contract_collection, collections_version
+    if invoice_collection is None or contract_collection is None:
+        with _init_lock:
+            if invoice_collection is None or contract_collection is None:
+                import chromadb
+
+                collections_version = read_collection_version()
+
+                print(f"Jungiamės prie ChromaDB ({DB_PATH})...")
+                client = chromadb.PersistentClient(path=DB_PATH)
+
+                # Nustatome NUORODAS į abi kolekcijas (sąskaitos ir sutartys)
+                try:
+                    invoices = client.get_collection(name=resolve_collection_name(INVOICE_COLLECTION_NAME))
+                    contracts = client.get_collection(name=resolve_collection_name(CONTRACT_COLLECTION_NAME))
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Nepavyko rasti ChromaDB kolekcijų. Patikrinkite, ar prieš tai įvykdėte vektorizavimo scenarijų. Klaida: {e}")
+                invoice_collection, contract_collection = invoices, contracts
+                print("ChromaDB kolekcijos sėkmingai rastos: sąskaitos ir sutartys.")
+    return invoice_collection, contract_collection
 
-# Nustatome NUORODAS į abi kolekcijas (sąskaitos ir sutartys)
-try:
-    invoice_collection = client.get_collection(name=INVOICE_COLLECTION_NAME)
-    contract_collection = client.get_collection(name=CONTRACT_COLLECTION_NAME)
-    print("ChromaDB kolekcijos sėkmingai rastos: sąskaitos ir sutartys.")
-except Exception as e:
-    print(
-        f"KLAIDA: Nepavyko rasti ChromaDB kolekcijų. Patikrinkite, ar prieš tai įvykdėte vektorizavimo scenarijų. Klaida: {e}")
-    exit()
+
+def get_parts_collection():
+    """
+    Grąžina dokumentų dalių kolekciją arba None, jei ji dar nesukurta (senesnė duomenų bazė).
+    """
+    global parts_collection
+    if parts_collection is None:
+        get_collections()
+        with _init_lock:
+            if parts_collection is None:
+                try:
+                    parts_collection = client.get_collection(name=resolve_collection_name(PARTS_COLLECTION_NAME))
+                except Exception:
+                    return None
+    return parts_collection
 
 
-@app.route('/')
+@bp.before_app_request
+def refresh_collections():
+    """
+    rebuild_index.py įjungia naujas kolekcijas (collection_version.write_collection_names) ir pakeičia kolekcijų versiją.
+    Pasikeitus versijai, nuorodos į kolekcijas gaunamos iš naujo kitos užklausos metu.
+    """
+    global invoice_collection, contract_collection, parts_collection
+    if collections_version is None or read_collection_version() == collections_version:
+        return
+    with _init_lock:
+        invoice_collection = contract_collection = parts_collection = None
+
+
+def get_structured_store():
+    """
+    Tipizuota SQLite saugykla, kurią pildo main.py (žr. structured_store.py).
+    """
+    global structured_store
+    if structured_store is None:
+        with _init_lock:
+            if structured_store is None:
+                structured_store = StructuredStore()
+    return structured_store
+
+
+def get_known_companies():
+    """
+    Saugykloje esančios įmonės ({kodas: pavadinimas}), perskaitomos tik pasikeitus kolekcijų versijai.
+    """
+    global _known_companies
+    version = read_collection_version()
+    if _known_companies[0] != version:
+        _known_companies = (version, get_structured_store().known_companies())
+    return _known_companies[1]
+
+
+@bp.route('/')
 def index():
     # Šiai aplikacijai reikia failo 'templates/index.html'
     return render_template('index.html')
@@ -57,9 +433,11 @@ def index():
 
 def fetch_all_documents_from_collections():
     """
-    Ištraukia ir sujungia visus tekstinius dokumentus (sąskaitas ir sutartis) iš abiejų ChromaDB kolekcijų.
+    Ištraukia visus tekstinius dokumentus (sąskaitas ir sutartis) iš abiejų ChromaDB kolekcijų.
+    Grąžina [(tipas, [None, dokumentas, [], metaduomenys])] - kontekstas sudedamas pack_context().
     """
-    all_context = []
+    all_hits = []
+    invoice_collection, contract_collection = get_collections()
 
     # 1. Ištraukiame sąskaitas
     try:
@@ -67,8 +445,7 @@ def fetch_all_documents_from_collections():
         if invoice_ids:
             invoice_docs = invoice_collection.get(ids=invoice_ids, include=['documents', 'metadatas'])
             for doc, meta in zip(invoice_docs['documents'], invoice_docs['metadatas']):
-                # Pridedame dokumento tipo pavadinimą dėl aiškumo LLM modeliui
-                all_context.append(f"[SĄSKAITA FAKTŪRA]: {doc}")
+                all_hits.append(("invoice", [None, doc, [], meta]))
     except Exception as e:
         print(f"Įspėjimas: Nepavyko gauti sąskaitų duomenų: {e}")
 
@@ -78,72 +455,540 @@ def fetch_all_documents_from_collections():
         if contract_ids:
             contract_docs = contract_collection.get(ids=contract_ids, include=['documents', 'metadatas'])
             for doc, meta in zip(contract_docs['documents'], contract_docs['metadatas']):
-                all_context.append(f"[SUTARTIS]: {doc}")
+                all_hits.append(("contract", [None, doc, [], meta]))
     except Exception as e:
         print(f"Įspėjimas: Nepavyko gauti sutarčių duomenų: {e}")
 
-    if not all_context:
-        return None  # Grąžiname None, jei nerasta jokių dokumentų
+    return all_hits
 
-    # Sujungiame visų dokumentų tekstą į vieną konteksto eilutę
-    return "\n\n---\n\n".join(all_context)
 
+def embed_query(query):
+    """
+    Vektorizuoja vartotojo klausimą tuo pačiu modeliu, kuriuo vektorizuoti dokumentai.
+    """
+    model = get_sentence_model()
+    with metrics.timed("query_embedding"):
+        return model.encode(query).tolist()
 
-@app.route('/ask', methods=['POST'])
-def ask_local_llm():
+
+def get_collection_version():
     """
-    Gauna užklausą, surenka kontekstą iš ChromaDB (abi kolekcijos) ir siunčia jį vietiniam LLM (Ollama).
+    Kolekcijų turinio žymė atsakymų podėliui: main.py įrašoma versija ir dokumentų skaičiai.
+    """
+    invoice_collection, contract_collection = get_collections()
+    return f"{read_collection_version()}:{invoice_collection.count()}:{contract_collection.count()}"
+
+
+DOCUMENT_LABELS = {"invoice": "SĄSKAITA FAKTŪRA", "contract": "SUTARTIS"}
+
+# Dokumento tipas -> (datos laukas, įmonių kodų laukai) plokščiuose metaduomenyse (žr. main.filter_metadata)
+FILTER_FIELDS = {
+    "invoice": ("data", ("pardavejas_kodas", "gavejas_kodas")),
+    "contract": ("sudarymo_data", ("salis_a_kodas", "salis_b_kodas")),
+}
+
+
+def combine_where(operator, clauses):
     """
+    Sujungia ChromaDB `where` sąlygas operatoriumi '$and' / '$or' (ChromaDB reikalauja bent dviejų sąlygų).
+    """
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {operator: clauses}
+
+
+def parse_metadata_filters(query):
+    """
+    Paverčia klausime minimą datų intervalą ir įmones (query_router.parse_date_range / find_company_codes)
+    ChromaDB `where` filtrais. Grąžina {dokumento tipas: where} arba tuščią žodyną, jei filtrų nėra.
+    Atsižvelgiama tik į saugykloje esančias įmones, kad bet koks 7-9 skaitmenų numeris nebūtų laikomas kodu.
+    """
+    if not METADATA_FILTERS:
+        return {}
+    date_from, date_to = parse_date_range(query)
     try:
-        data = request.get_json()
-        query = data.get('query')
-        if not query:
-            return jsonify({'error': 'Užklausa nerasta.'}), 400
+        known_companies = get_known_companies()
+    except Exception as e:
+        print(f"Įspėjimas: Nepavyko gauti įmonių sąrašo: {e}")
+        known_companies = {}
+    codes = [code for code, _ in find_company_codes(query, known_companies) if code in known_companies]
+    if not (date_from or date_to or codes):
+        return {}
+
+    days = None
+    if date_from and date_to and (date_to - date_from).days < METADATA_FILTER_MAX_DAYS:
+        days = [to_date_number((date_from + datetime.timedelta(days=offset)).isoformat())
+                for offset in range((date_to - date_from).days + 1)]
 
-        # Ištraukiame kontekstą iš abiejų kolekcijų
-        context_text = fetch_all_documents_from_collections()
+    filters = {}
+    for doc_type, (date_field, company_fields) in FILTER_FIELDS.items():
+        clauses = []
+        if days:
+            clauses.append({date_field: {"$in": days}})
+        else:
+            if date_from:
+                clauses.append({date_field: {"$gte": to_date_number(date_from.isoformat())}})
+            if date_to:
+                clauses.append({date_field: {"$lte": to_date_number(date_to.isoformat())}})
+        if codes:
+            clauses.append(combine_where("$or", [{field: {"$in": codes}} for field in company_fields]))
+        filters[doc_type] = combine_where("$and", clauses)
+    return filters
 
-        if context_text is None:
-            return jsonify({'response': 'Atsiprašau, duomenų bazėje nerasta jokių dokumentų (sąskaitų ar sutarčių).'})
 
-        # PROMPT'AS VIETINIAM MODELIUI: Dabar nurodome, kad apdorojamos abi dokumentų rūšys
-        full_prompt = f"""
-        [INST]
-        Jūs esate dirbtinio intelekto asistentas, specializuojantis verslo dokumentų (sąskaitų faktūrų ir sutarčių) analizėje.
-        Atsakykite į vartotojo klausimą TIKSLIAI remdamiesi pateiktu kontekstu. Kontekste dokumentai yra pažymėti žymėmis [SĄSKAITA FAKTŪRA] arba [SUTARTIS].
-        Būkite konkretus, išsamus ir nurodykite dokumentų tipus, kai atsakote.
-        Nekurkite jokios informacijos, kurios nėra pateiktuose dokumentuose.
-        Galutinį atsakymą PRIVALOTE pateikti lietuvių kalba.
+def resolve_metadata_filters(filters):
+    """
+    Kiekvienam dokumento tipui parenka paieškos ribas (ChromaDB query / get argumentus): {'ids': [...]},
+    jei filtrą atitinkančius dokumentus pavyksta rasti SQLite saugykloje (ne daugiau kaip METADATA_FILTER_MAX_IDS),
+    kitaip - {'where': filtras}. Jei saugykloje nerandama nieko (pvz., ji nesinchronizuota su ChromaDB,
+    žr. main.py --sync-structured-store), sprendžia pati ChromaDB. Grąžina {dokumento tipas: ribos}.
+    """
+    scopes = {}
+    for doc_type, where in filters.items():
+        doc_ids = None
+        try:
+            doc_ids = get_structured_store().filter_document_ids(doc_type, where, METADATA_FILTER_MAX_IDS)
+        except Exception as e:
+            print(f"Įspėjimas: Nepavyko pritaikyti filtro SQLite saugykloje: {e}")
+        scopes[doc_type] = {"ids": doc_ids} if doc_ids else {"where": where}
+    return scopes
 
-        Kontekstas (įvairūs verslo dokumentai): 
-        {context_text}
 
-        Vartotojo klausimas: 
-        {query}
-        [/INST]
-        """
+def parts_where(scopes):
+    """
+    Dalių kolekcijos filtras pagal dokumentų paieškos ribas: tėvinių dokumentų ID arba tie patys laukai
+    (kiekvieno tipo laukai yra tik to tipo dalyse, todėl atskira 'document_type' sąlyga nereikalinga).
+    """
+    return combine_where("$or", [scope.get("where") or {"parent_id": {"$in": scope["ids"]}}
+                                 for scope in scopes.values()])
+
+
+def query_document_parts(query_embedding, n_results, where=None):
+    """
+    Ieško artimiausių dokumentų dalių.
+    Grąžina (atstumas, dokumento tipas, tėvinio dokumento ID, dalies eilės nr., dalies tekstas).
+    """
+    collection = get_parts_collection()
+    if collection is None:
+        return []
+    try:
+        n_results = min(n_results, collection.count())
+        if n_results == 0:
+            return []
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=where,
+            include=['documents', 'metadatas', 'distances']
+        )
+    except Exception as e:
+        print(f"Įspėjimas: Nepavyko atlikti paieškos kolekcijoje '{PARTS_COLLECTION_NAME}': {e}")
+        return []
+    return [(distance, meta['document_type'], meta['parent_id'], meta.get('position'), doc)
+            for doc, meta, distance in zip(results['documents'][0], results['metadatas'][0], results['distances'][0])]
 
-        # API kvietimo į vietinį Ollama serverį konfigūracija
-        ollama_payload = {
-            "model": LOCAL_LLM_MODEL,
-            "prompt": full_prompt,
-            "stream": False  # Nustatome stream: False, kad gautume visą atsakymą iš karto
-        }
 
-        # Siunčiame POST užklausą į Ollama serverį
-        ollama_response = requests.post(LOCAL_LLM_URL, json=ollama_payload)
-        ollama_response.raise_for_status()
+def reciprocal_rank_fusion(rankings, k=None):
+    """
+    Sujungia kelis surikiuotus raktų sąrašus: kiekvienas raktas gauna sum(1 / (k + vieta)) įvertį.
+    Grąžina raktus, surikiuotus pagal bendrą įvertį.
+    """
+    k = RRF_K if k is None else k
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def lexical_search(query, limit, identifiers_only=False):
+    """
+    Leksinė (BM25) paieška SQLite FTS5 indekse. Grąžina (dokumento tipas, ID) sąrašą.
+    """
+    try:
+        with metrics.timed("lexical_search"):
+            results = get_structured_store().lexical_search(query, limit, identifiers_only)
+    except Exception as e:
+        print(f"Įspėjimas: Leksinė paieška nepavyko: {e}")
+        return []
+    return [(doc_type, doc_id) for doc_id, doc_type, _ in results if doc_type in DOCUMENT_LABELS]
 
-        response_data = ollama_response.json()
-        response_text = response_data.get('response', 'Klaida: Nepavyko gauti atsakymo iš vietinio LLM.')
+
+@metrics.timed("vector_search")
+def vector_search(query_embedding, top_k, collections, scopes=None):
+    """
+    Top-k vektorinė paieška abiejose kolekcijose (ir dalių kolekcijoje), jei nurodyta - tik `scopes` ribose
+    (žr. resolve_metadata_filters). Grąžina {(tipas, dokumento ID):
+    [atstumas, dokumentas arba None, rastos dalys [(eilės nr., tekstas)], metaduomenys arba None]}.
+    """
+    scopes = scopes or {}
+    hits = {}
+    for doc_type, collection in collections.items():
+        scope = scopes.get(doc_type, {})
+        try:
+            n_results = min(top_k, collection.count())
+            if n_results == 0:
+                continue
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                include=['documents', 'metadatas', 'distances'],
+                **scope
+            )
+            for doc_id, doc, meta, distance in zip(results['ids'][0], results['documents'][0],
+                                                   results['metadatas'][0], results['distances'][0]):
+                hits[(doc_type, doc_id)] = [distance, doc, [], meta]
+        except Exception as e:
+            print(f"Įspėjimas: Nepavyko atlikti paieškos kolekcijoje '{collection.name}': {e}")
+
+    if RETRIEVAL_MULTI_VECTOR:
+        # Kelios to paties dokumento dalys sujungiamos: dokumento atstumas - artimiausios dalies atstumas
+        for distance, doc_type, parent_id, position, part in query_document_parts(
+                query_embedding, top_k * MULTI_VECTOR_OVERSAMPLE, parts_where(scopes)):
+            hit = hits.setdefault((doc_type, parent_id), [distance, None, [], None])
+            hit[0] = min(hit[0], distance)
+            if (position, part) not in hit[2]:
+                hit[2].append((position, part))
+    return hits
+
+
+def fetch_missing_documents(hits, collections, scopes=None):
+    """
+    Paima dokumentų, rastų tik per dalis ar leksinę paiešką, santraukas ir metaduomenis
+    (vienu kvietimu kiekvienai kolekcijai). Paieškos ribų (`scopes`) neatitinkantys dokumentai lieka be teksto.
+    """
+    scopes = scopes or {}
+    for doc_type, collection in collections.items():
+        scope = scopes.get(doc_type, {})
+        allowed_ids = set(scope["ids"]) if "ids" in scope else None
+        doc_ids = [doc_id for (hit_type, doc_id), hit in hits.items() if hit_type == doc_type and hit[1] is None
+                   and (allowed_ids is None or doc_id in allowed_ids)]
+        if not doc_ids:
+            continue
+        try:
+            documents = collection.get(ids=doc_ids, where=scope.get("where"), include=['documents', 'metadatas'])
+            for doc_id, doc, meta in zip(documents['ids'], documents['documents'], documents['metadatas']):
+                hit = hits[(doc_type, doc_id)]
+                hit[1], hit[3] = doc, meta
+        except Exception as e:
+            print(f"Įspėjimas: Nepavyko gauti dokumentų iš kolekcijos '{collection.name}': {e}")
+
+
+@metrics.timed("retrieval")
+def retrieve_relevant_documents(query, top_k=None, token_budget=None, query_embedding=None):
+    """
+    Surenka LLM kontekstą: top-k vektorinė paieška abiejose ChromaDB kolekcijose (ir dalių kolekcijoje),
+    'hybrid' režimu - ir BM25 paieška, sujungta su vektorine (reciprocal rank fusion).
+    Klausime minimos datos ir įmonės riboja paiešką (žr. parse_metadata_filters).
+    Rezultatai sugrupuojami pagal dokumentą ir grąžinama tik tiek dokumentų, kiek telpa į žetonų biudžetą.
+    """
+    top_k = top_k or RETRIEVAL_TOP_K
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    hybrid = RETRIEVAL_MODE == "hybrid"
+    collections = dict(zip(DOCUMENT_LABELS, get_collections()))
+
+    # Identifikatoriaus paieška: BM25 atsako per milisekundes, vektorizuoti klausimo nereikia
+    if hybrid and IDENTIFIER_SHORTCUT:
+        identifier_hits = lexical_search(query, top_k + 1, identifiers_only=True)
+        if 0 < len(identifier_hits) <= top_k:
+            hits = {key: [None, None, [], None] for key in identifier_hits}
+            fetch_missing_documents(hits, collections)
+            context_text = pack_context([(key[0], hits[key]) for key in identifier_hits], token_budget)
+            if context_text is not None:
+                return context_text
+
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+
+    filters = parse_metadata_filters(query)
+    scopes = resolve_metadata_filters(filters) if filters else {}
+    hits = vector_search(query_embedding, top_k, collections, scopes)
+    if scopes and not hits:
+        # Filtrą atitinkančių dokumentų nėra (arba jie įkelti be filtravimo laukų, žr. main.py --update-metadata)
+        print("Informacija: Pagal klausimo datas ar įmones dokumentų nerasta, ieškoma visuose dokumentuose.")
+        metrics.increment("metadata_filters_total", outcome="fallback")
+        scopes = {}
+        hits = vector_search(query_embedding, top_k, collections)
+    elif scopes:
+        metrics.increment("metadata_filters_total", outcome="applied")
+    # Artimiausi dokumentai (mažiausias atstumas) - pirmi
+    ranking = sorted(hits, key=lambda key: hits[key][0])
+    if hybrid:
+        lexical_ranking = lexical_search(query, top_k * len(collections))
+        for key in lexical_ranking:
+            hits.setdefault(key, [None, None, [], None])
+        ranking = reciprocal_rank_fusion([ranking, lexical_ranking])
+
+    fetch_missing_documents(hits, collections, scopes)
+    # Leksinės paieškos rezultatai, neatitinkantys filtrų, liko be teksto ir neužima vietų kontekste
+    ranking = [key for key in ranking if hits[key][1] is not None]
+    return pack_context([(key[0], hits[key]) for key in ranking[:top_k * len(collections)]], token_budget)
+
+
+def render_compact_invoice(data, positions=()):
+    """
+    Glausta sąskaitos eilutė iš JSON laukų. Pateikiamos rastos prekės (`positions`), kitaip - pirmoji.
+    """
+    seller, buyer = data.get('pardavejas') or {}, data.get('gavejas') or {}
+    items = data.get('prekes') or []
+    selected = [items[position] for position in positions if position is not None and position < len(items)]
+    fields = [
+        f"Nr. {data.get('numeris', '')} ({data.get('data', '')})",
+        f"{seller.get('pavadinimas', '')} -> {buyer.get('pavadinimas', '')}",
+        f"su PVM {(data.get('sumos') or {}).get('viso_su_pvm_eur', '')} EUR",
+        f"apmokėti iki {data.get('apmoketi_iki', '')}",
+    ]
+    fields += [f"{item.get('pavadinimas', '')} {item.get('kiekis_t', '')} t x {item.get('vieneto_kaina_eur', '')} "
+               f"= {item.get('viso_eur', '')} EUR" for item in selected or items[:1]]
+    return "; ".join(fields)
+
+
+def render_compact_contract(data, positions=()):
+    """
+    Glausta sutarties eilutė iš JSON laukų (sutarties dalys sudarytos iš tų pačių laukų, todėl `positions` nenaudojamas).
+    """
+    salis_a, salis_b = data.get('salis_a') or {}, data.get('salis_b') or {}
+    return "; ".join([
+        f"Nr. {data.get('numeris', '')} ({data.get('sudarymo_data', '')})",
+        f"{data.get('sutarties_tipas', '')}",
+        f"{salis_a.get('pavadinimas', '')} ({salis_a.get('imones_kodas', '')}) -> "
+        f"{salis_b.get('pavadinimas', '')} ({salis_b.get('imones_kodas', '')})",
+        f"vertė {data.get('bendra_suma_eur', '')} EUR",
+        f"mokestis {data.get('mokestis_uz_paslaugas', '')}",
+        f"terminas {data.get('galiojimo_terminas', '')}",
+    ])
+
+
+# Dokumento tipas -> glausto (laukų) pateikimo funkcija
+COMPACT_RENDERERS = {
+    "invoice": render_compact_invoice,
+    "contract": render_compact_contract,
+}
+
+
+def render_context_document(doc_type, hit, compact=False):
+    """
+    Vieno dokumento tekstas kontekste: santrauka su rastomis dalimis arba (`compact`) glausta laukų eilutė.
+    Glaustai pateikti galima tik turint 'json_data' metaduomenis; kitaip grąžinamas pilnas tekstas.
+    """
+    _, doc, parts, meta = hit
+    if compact and meta and meta.get('json_data'):
+        try:
+            data = json.loads(meta['json_data'])
+            positions = [position for position, _ in parts]
+            return f"[{DOCUMENT_LABELS[doc_type]}]: {COMPACT_RENDERERS[doc_type](data, positions)}"
+        except (ValueError, AttributeError) as e:
+            print(f"Įspėjimas: Nepavyko glaustai pateikti dokumento: {e}")
+
+    text = f"[{DOCUMENT_LABELS[doc_type]}]: {doc}"
+    if parts:
+        text += "\nSusijusios dalys:\n" + "\n".join(f"- {part}" for _, part in parts)
+    return text
+
+
+def near_duplicate_signature(text):
+    """
+    Teksto žodžių porų aibė, skaičius pakeitus '#'. Kas mėnesį pasikartojančios to paties tiekėjo sąskaitos
+    skiriasi tik numeriais, datomis ir sumomis, todėl jų parašai sutampa.
+    """
+    words = re.findall(r"\w+", re.sub(r"\d+", "#", text.lower()))
+    return set(zip(words, words[1:])) or set(words)
+
+
+def jaccard_similarity(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def pack_context(ranked_hits, token_budget, compact=None):
+    """
+    Sudeda dokumentus ((tipas, [atstumas, dokumentas, rastos dalys, metaduomenys]), geriausi - pirmi)
+    į kontekstą, kol jie telpa į žetonų biudžetą:
+    - kiekvieno dokumento žetonai įvertinami atskirai; netelpantis dokumentas praleidžiamas,
+      tačiau mažesni tolesni dokumentai dar gali tilpti;
+    - beveik identiški jau įdėtiems dokumentai (žr. CONTEXT_DEDUP_THRESHOLD) pateikiami glaustai,
+      o jei glausto pateikimo nėra - praleidžiami;
+    - `compact` (numatyta - COMPACT_CONTEXT) - visi dokumentai pateikiami glaustai.
+    Grąžina None, jei dokumentų nėra.
+    """
+    compact = COMPACT_CONTEXT if compact is None else compact
+    context_parts = []
+    signatures = []
+    used_tokens = 0
+    outcomes = dict.fromkeys(("full", "compact", "duplicate", "over_budget"), 0)
+    for doc_type, hit in ranked_hits:
+        doc, meta = hit[1], hit[3]
+        if doc is None:
+            continue
+        signature = near_duplicate_signature(doc) if CONTEXT_DEDUP_THRESHOLD > 0 else None
+        duplicate = signature is not None and any(
+            other_type == doc_type and jaccard_similarity(signature, other) >= CONTEXT_DEDUP_THRESHOLD
+            for other_type, other in signatures)
+        if duplicate and not (meta and meta.get('json_data')):
+            outcomes["duplicate"] += 1
+            continue
+
+        part = render_context_document(doc_type, hit, compact or duplicate)
+        part_tokens = estimate_tokens(part)
+        if used_tokens + part_tokens > token_budget:
+            if context_parts or token_budget <= 0:
+                outcomes["over_budget"] += 1
+                continue
+            # Net pirmasis dokumentas netelpa - sutrumpiname jį patys, kad raginimo nenukirptų Ollama
+            # (estimate_tokens prideda vieną žetoną, todėl paliekama vieno žetono atsarga)
+            part = part[:int((token_budget - 1) * metrics.CHARS_PER_TOKEN)]
+            part_tokens = estimate_tokens(part)
+        context_parts.append(part)
+        signatures.append((doc_type, signature))
+        used_tokens += part_tokens
+        outcomes["compact" if compact or duplicate else "full"] += 1
+
+    for outcome, count in outcomes.items():
+        if count:
+            metrics.increment("context_documents_total", count, outcome=outcome)
+    if not context_parts:
+        return None
+    return "\n\n---\n\n".join(context_parts)
+
+
+NO_DOCUMENTS_RESPONSE = 'Atsiprašau, duomenų bazėje nerasta jokių dokumentų (sąskaitų ar sutarčių).'
+
+# PROMPT'AS VIETINIAM MODELIUI: nurodome, kad apdorojamos abi dokumentų rūšys
+LLM_PROMPT_TEMPLATE = """[INST]
+Jūs esate dirbtinio intelekto asistentas, specializuojantis verslo dokumentų (sąskaitų faktūrų ir sutarčių) analizėje.
+Atsakykite į vartotojo klausimą TIKSLIAI remdamiesi pateiktu kontekstu. Kontekste dokumentai yra pažymėti žymėmis [SĄSKAITA FAKTŪRA] arba [SUTARTIS].
+Būkite konkretus, išsamus ir nurodykite dokumentų tipus, kai atsakote.
+Nekurkite jokios informacijos, kurios nėra pateiktuose dokumentuose.
+Galutinį atsakymą PRIVALOTE pateikti lietuvių kalba.
+
+Kontekstas (įvairūs verslo dokumentai):
+{context}
+
+Vartotojo klausimas:
+{query}
+[/INST]"""
+
+
+def context_token_budget(query):
+    """
+    Kiek žetonų gali užimti kontekstas: CONTEXT_TOKEN_BUDGET, bet ne daugiau nei lieka Ollama konteksto lange
+    atėmus atsakymo rezervą, raginimo šabloną ir patį klausimą.
+    """
+    token_budget = CONTEXT_TOKEN_BUDGET
+    if OLLAMA_NUM_CTX:
+        overhead = estimate_tokens(LLM_PROMPT_TEMPLATE.format(context="", query=query))
+        token_budget = min(token_budget, OLLAMA_NUM_CTX - ANSWER_TOKEN_RESERVE - overhead)
+    return token_budget
+
+
+def build_llm_prompt(query, query_embedding=None):
+    """
+    Surenka kontekstą iš ChromaDB ir sudaro raginimą vietiniam LLM.
+    Grąžina None, jei duomenų bazėje nėra dokumentų.
+    """
+    token_budget = context_token_budget(query)
+    if token_budget <= 0:
+        print(f"Įspėjimas: Klausimas netelpa į Ollama konteksto langą ({OLLAMA_NUM_CTX} žetonų).")
+
+    # Ištraukiame kontekstą iš abiejų kolekcijų
+    if RETRIEVAL_MODE == "all":
+        context_text = pack_context(fetch_all_documents_from_collections(), token_budget)
+    else:
+        context_text = retrieve_relevant_documents(query, token_budget=token_budget, query_embedding=query_embedding)
+
+    if context_text is None:
+        return None
+    return LLM_PROMPT_TEMPLATE.format(context=context_text, query=query)
+
+
+def route_structured_query(query):
+    """
+    Bando atsakyti į agreguotą klausimą iš SQLite saugyklos. Grąžina atsakymą arba None (tuomet klausiamas LLM).
+    """
+    if not STRUCTURED_QUERY_ROUTER:
+        return None
+    try:
+        return answer_structured_query(query, get_structured_store())
+    except Exception as e:
+        print(f"Įspėjimas: Struktūrizuota užklausa nepavyko, naudojamas LLM: {e}")
+        return None
+
+
+def lookup_cached_answer(query):
+    """
+    Ieško atsakymo podėlyje. Grąžina (kolekcijų versija, užklausos vektorius arba None, atsakymas arba None).
+    Vektorius apskaičiuojamas tik įjungus semantinę paiešką ir vėliau panaudojamas dokumentų paieškai.
+    """
+    if not answer_cache.enabled:
+        return None, None, None
+    version = get_collection_version()
+    query_embedding = embed_query(query) if ANSWER_CACHE_SEMANTIC_THRESHOLD > 0 else None
+    cached_response = answer_cache.get(query, version, query_embedding)
+    metrics.record_cache_lookup("answer", cached_response is not None)
+    return version, query_embedding, cached_response
+
+
+def prepare_answer(query):
+    """
+    /ask ir /ask_stream (taip pat ir asinchroninio serve.py režimo) bendra dalis iki LLM kvietimo.
+    Grąžina (atsakymas be LLM arba None, (raginimas, kolekcijų versija, užklausos vektorius) arba None).
+    """
+    # Agreguoti klausimai (sumos, kiekiai, terminai) atsakomi be LLM. Jei klausime minimo dokumento numerio
+    # saugykloje nėra, maršrutizatorius grąžina None ir klausimas keliauja į identifikatoriaus (BM25) paiešką
+    structured_response = route_structured_query(query)
+    if structured_response is not None:
+        metrics.increment("answers_total", source="structured")
+        return {'response': structured_response, 'structured': True}, None
+
+    # Tikriname atsakymų podėlį
+    version, query_embedding, cached_response = lookup_cached_answer(query)
+    if cached_response is not None:
+        metrics.increment("answers_total", source="cache")
+        return {'response': cached_response, 'cached': True}, None
+
+    full_prompt = build_llm_prompt(query, query_embedding)
+    if full_prompt is None:
+        metrics.increment("answers_total", source="no_documents")
+        return {'response': NO_DOCUMENTS_RESPONSE}, None
+    metrics.increment("answers_total", source="llm")
+    return None, (full_prompt, version, query_embedding)
+
+
+@bp.route('/ask', methods=['POST'])
+@metrics.timed("ask")
+def ask_local_llm():
+    """
+    Gauna užklausą, surenka kontekstą iš ChromaDB (abi kolekcijos) ir siunčia jį vietiniam LLM (Ollama).
+    """
+    try:
+        data = request.get_json()
+        query = data.get('query')
+        if not query:
+            return jsonify({'error': 'Užklausa nerasta.'}), 400
+
+        answer, llm_request = prepare_answer(query)
+        if answer is not None:
+            return jsonify(answer)
+        full_prompt, version, query_embedding = llm_request
+
+        # Siunčiame užklausą į Ollama serverį ir laukiame viso atsakymo
+        usage = {}
+        response_text = llm_client.generate(full_prompt, usage)
+        answer_cache.put(query, version, response_text, query_embedding)
+        report_usage(usage)
 
         # Grąžiname atsakymą į front-end
-        return jsonify({'response': response_text})
+        return jsonify({'response': response_text, 'usage': usage})
 
     except requests.exceptions.ConnectionError:
         print(
             f"KLAIDA: Nepavyko prisijungti prie Ollama serverio. Patikrinkite, ar Ollama veikia ir ar modelis ({LOCAL_LLM_MODEL}) yra įkeltas.")
         return jsonify({'error': 'Klaida: Nepavyko prisijungti prie vietinio LLM serverio. Ar veikia Ollama?'}), 503
+    except requests.exceptions.Timeout:
+        print(f"KLAIDA: Ollama neatsakė per {OLLAMA_READ_TIMEOUT} s.")
+        return jsonify({'error': 'Klaida: Vietinis LLM serveris neatsakė laiku.'}), 504
     except requests.exceptions.RequestException as e:
         print(f"Klaida siunčiant užklausą į Ollama: {e}")
         return jsonify({'error': f'Ollama API klaida: {str(e)}'}), 500
@@ -153,6 +998,134 @@ def ask_local_llm():
         return jsonify({'error': f'Serverio klaida: {str(e)}'}), 500
 
 
-if __name__ == '__main__':
+def sse_event(payload):
+    """
+    Suformuoja vieną Server-Sent Events įvykį su JSON turiniu.
+    """
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@bp.route('/ask_stream', methods=['POST'])
+def ask_local_llm_stream():
+    """
+    Kaip /ask, tačiau atsakymas siunčiamas naršyklei dalimis (Server-Sent Events),
+    kai tik Ollama sugeneruoja kiekvieną žetoną.
+    """
+    data = request.get_json()
+    query = data.get('query') if data else None
+    if not query:
+        return jsonify({'error': 'Užklausa nerasta.'}), 400
+
+    def generate():
+        try:
+            answer, llm_request = prepare_answer(query)
+            done = {'done': True}
+            if answer is not None:
+                token = answer.pop('response')
+                yield sse_event({'token': token, **answer})
+            else:
+                full_prompt, version, query_embedding = llm_request
+                tokens = []
+                usage = {}
+                for token in llm_client.stream(full_prompt, usage):
+                    tokens.append(token)
+                    yield sse_event({'token': token})
+                # Į podėlį dedame tik pilnai sugeneruotą atsakymą
+                answer_cache.put(query, version, "".join(tokens), query_embedding)
+                report_usage(usage)
+                done['usage'] = usage
+            yield sse_event(done)
+        except requests.exceptions.ConnectionError:
+            print(
+                f"KLAIDA: Nepavyko prisijungti prie Ollama serverio. Patikrinkite, ar Ollama veikia ir ar modelis ({LOCAL_LLM_MODEL}) yra įkeltas.")
+            yield sse_event({'error': 'Klaida: Nepavyko prisijungti prie vietinio LLM serverio. Ar veikia Ollama?'})
+        except requests.exceptions.Timeout:
+            print(f"KLAIDA: Ollama neatsakė per {OLLAMA_READ_TIMEOUT} s.")
+            yield sse_event({'error': 'Klaida: Vietinis LLM serveris neatsakė laiku.'})
+        except requests.exceptions.RequestException as e:
+            print(f"Klaida siunčiant užklausą į Ollama: {e}")
+            yield sse_event({'error': f'Ollama API klaida: {str(e)}'})
+        except Exception as e:
+            print(f"Įvyko klaida apdorojant užklausą: {e}")
+            yield sse_event({'error': f'Serverio klaida: {str(e)}'})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # Neleidžiame tarpiniams serveriams kaupti atsakymo buferyje
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@bp.route('/cache_stats')
+def cache_stats():
+    """
+    Atsakymų podėlio statistika (pataikymų dalis ir kt.), padedanti parinkti jo dydį.
+    """
+    return jsonify(answer_cache.stats())
+
+
+def render_metrics():
+    """
+    Proceso metrikos Prometheus formatu (kiekvienas serverio procesas turi savo skaitiklius).
+    """
+    for name, value in answer_cache.stats().items():
+        if name != "hit_rate":
+            metrics.set_gauge("answer_cache_" + name, value)
+    return metrics.render_prometheus()
+
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """
+    Etapų trukmės (pdfplumber, vektorizavimas, ChromaDB, Ollama), raginimų dydžiai, podėlių ir klaidų skaitikliai.
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def create_app():
+    """
+    Flask programos gamykla (app factory). Sunkūs komponentai čia neinicijuojami - kiekvienas serverio
+    procesas (serve.py) juos įkelia pirmos užklausos metu.
+    """
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(bp)
+    return flask_app
+
+
+def reset_backend():
+    """
+    Pamiršta ChromaDB klientą, kolekcijas ir SQLite saugyklą. Kviečiama prieš kuriant serverio procesus (fork),
+    kad kiekvienas procesas atsidarytų savo jungtis, o ne dalintųsi tėvinio proceso jungtimis.
+    """
+    global client, invoice_collection, contract_collection, parts_collection, structured_store, collections_version
+    with _init_lock:
+        if structured_store is not None:
+            structured_store.close()
+        client = invoice_collection = contract_collection = parts_collection = None
+        structured_store = None
+        collections_version = None
+
+
+app = create_app()
+
+
+def run_server(debug=True, use_reloader=True):
+    """
+    Patikrina kolekcijas ir paleidžia Flask serverį. Grąžina False, jei kolekcijų nėra.
+    """
+    # Prieš paleidžiant serverį patikriname, ar kolekcijos egzistuoja
+    try:
+        get_collections()
+    except RuntimeError as e:
+        print(f"KLAIDA: {e}")
+        return False
+
     # Flask paleidimas
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=debug, use_reloader=use_reloader)
+    return True
+
+
+if __name__ == '__main__':
+    if not run_server():
+        exit()
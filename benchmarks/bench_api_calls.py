@@ -0,0 +1,81 @@
+"""
+Gemini kvietimų skaičius 1000 dokumentų: dviejų kvietimų (klasifikavimas + ištraukimas) režimas prieš
+vieno kvietimo režimą, su vietiniu klasifikatoriumi ir be jo. Veikia be tinklo (netikras modelis),
+PDF failai nekuriami - classify_and_extract gauna tekstą tiesiogiai.
+
+Paleidimas:
+    python benchmarks/bench_api_calls.py --documents 1000 --ambiguous-share 0.1
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import ai_pdf_to_json  # noqa: E402
+from benchmarks.fakes import FakeGenerativeModel  # noqa: E402
+
+# Aiškūs dokumentai (vietinis klasifikatorius turėtų būti užtikrintas) ir neaiškūs (sprendžia Gemini)
+INVOICE_TEXT = ("PVM sąskaita faktūra Serija SF Nr. {i}\nData 2025-10-20\nPardavėjas UAB Tiekėjas\n"
+                "Smėlis 0/5 važtaraštis {i} 13.3 t 1.50 EUR 19.95 EUR\nPVM suma 3.46\nViso su PVM 19.95\n"
+                "Apmokėti iki 2025-11-03")
+CONTRACT_TEXT = ("PASLAUGŲ TEIKIMO SUTARTIS Nr. S-{i}\n2025-01-15, Vilnius\nUAB Tiekėjas ir Algintra MB "
+                 "sudarė šią sutartį.\n1. SUTARTIES DALYKAS\nTiekėjas įsipareigoja teikti paslaugas.")
+AMBIGUOUS_INVOICE_TEXT = "Kreditinis dokumentas Nr. {i}\nGrąžinama suma 120.00 EUR\nUAB Tiekėjas"
+AMBIGUOUS_CONTRACT_TEXT = "Papildomas susitarimas Nr. {i}\nŠalys susitarė pratęsti terminą iki 2026-12-31."
+
+
+def synthetic_documents(count, ambiguous_share):
+    """(tekstas, tikrasis tipas) sąrašas: pusė sąskaitų, pusė sutarčių, dalis - be aiškių raktinių žodžių."""
+    documents = []
+    ambiguous_every = int(1 / ambiguous_share) if ambiguous_share else 0
+    for i in range(count):
+        is_contract = i % 2 == 1
+        ambiguous = ambiguous_every and i % ambiguous_every == 0
+        if is_contract:
+            template = AMBIGUOUS_CONTRACT_TEXT if ambiguous else CONTRACT_TEXT
+        else:
+            template = AMBIGUOUS_INVOICE_TEXT if ambiguous else INVOICE_TEXT
+        documents.append((template.format(i=i), "contract" if is_contract else "invoice"))
+    return documents
+
+
+def run_mode(label, documents, mode, preclassifier):
+    ai_pdf_to_json.EXTRACTION_MODE = mode
+    ai_pdf_to_json.PRECLASSIFIER_ENABLED = preclassifier
+    ai_pdf_to_json.EXTRACTION_CACHE = None
+    ai_pdf_to_json.AI_MODEL = FakeGenerativeModel(latency=0)
+
+    correct = 0
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, (text, expected) in enumerate(documents):
+            doc_type, data = ai_pdf_to_json.classify_and_extract(f"bench_{i}.pdf", text, text)
+            correct += doc_type == expected and bool(data)
+    elapsed = time.perf_counter() - started
+
+    calls = ai_pdf_to_json.AI_MODEL.calls
+    # Apytikslis raginimo žetonų skaičius (~4 simboliai žetonui)
+    prompt_tokens = ai_pdf_to_json.AI_MODEL.prompt_chars / 4 / len(documents)
+    print(f"{label:<40} {calls:>6} kvietimų  {calls * 1000 / len(documents):>7.0f} / 1000 dok.  "
+          f"~{prompt_tokens:>5.0f} žet./dok.  teisingai: {correct / len(documents):.1%}  ({elapsed:.2f} s)")
+    return calls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gemini kvietimų skaičiaus palyginimas pagal ištraukimo režimą.")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--ambiguous-share", type=float, default=0.1,
+                        help="Dokumentų be aiškių raktinių žodžių dalis (0-1).")
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.documents, args.ambiguous_share)
+    baseline = run_mode("two_step, be vietinio klasifikatoriaus", documents, "two_step", False)
+    run_mode("two_step + vietinis klasifikatorius", documents, "two_step", True)
+    run_mode("single, be vietinio klasifikatoriaus", documents, "single", False)
+    best = run_mode("single + vietinis klasifikatorius", documents, "single", True)
+    print(f"\nKvietimų sumažėjo {baseline / best:.2f}x")
@@ -0,0 +1,100 @@
+"""
+/ask vėlinimo (latency) matavimas, kai duomenų bazėje yra nuo 100 iki 100 000 dokumentų.
+
+Naudojama atmintinė (ephemeral) ChromaDB, netikras įdėjimo modelis ir netikras Ollama atsakymas,
+todėl matuojamas tik konteksto surinkimo ir raginimo paruošimo laikas.
+
+Paleidimas:
+    python benchmarks/bench_ask_retrieval.py
+    python benchmarks/bench_ask_retrieval.py --sizes 100 1000 10000 --mode all
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import time
+
+import chromadb
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import app_local  # noqa: E402
+
+EMBEDDING_DIM = 768
+ADD_BATCH_SIZE = 5000
+
+
+class FakeSentenceModel:
+    """Deterministinis netikras įdėjimo modelis (be torch)."""
+
+    def encode(self, text):
+        seed = int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).random(EMBEDDING_DIM, dtype=np.float32)
+
+
+def fake_generate(prompt):
+    # Įsimename raginimo ilgį, kad matytume, jog jis neauga kartu su archyvu
+    fake_generate.last_prompt_chars = len(prompt)
+    return 'Testinis atsakymas.'
+
+
+def populate(client, size):
+    """Sukuria kolekcijas su `size` sąskaitų ir size // 10 sutarčių."""
+    rng = np.random.default_rng(42)
+    collections = {}
+    for name, count, template in [
+        ("invoices", size, "PVM sąskaita faktūra Nr. BENCH-{i} išrašyta 2025-10-20. Pardavėjas: UAB Tiekėjas {i}."),
+        ("contracts", max(1, size // 10), "Dokumento tipas: Sutartis, Nr. S-{i}. Šalis A: UAB Tiekėjas {i}."),
+    ]:
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
+        collection = client.create_collection(name)
+        for start in range(0, count, ADD_BATCH_SIZE):
+            ids = [f"{name}-{i}" for i in range(start, min(start + ADD_BATCH_SIZE, count))]
+            collection.add(
+                ids=ids,
+                documents=[template.format(i=i) for i in range(start, start + len(ids))],
+                embeddings=rng.random((len(ids), EMBEDDING_DIM), dtype=np.float32).tolist(),
+            )
+        collections[name] = collection
+    return collections["invoices"], collections["contracts"]
+
+
+def run(sizes, mode, repeats):
+    app_local.sentence_model = FakeSentenceModel()
+    app_local.llm_client.generate = fake_generate
+    app_local.RETRIEVAL_MODE = mode
+
+    client = chromadb.EphemeralClient()
+    flask_client = app_local.app.test_client()
+
+    print(f"{'dokumentų':>10} | {'p50 ms':>9} | {'p95 ms':>9} | {'raginimas (simb.)':>18}")
+    print("-" * 56)
+    for size in sizes:
+        app_local.invoice_collection, app_local.contract_collection = populate(client, size)
+
+        timings = []
+        for i in range(repeats):
+            started = time.perf_counter()
+            response = flask_client.post('/ask', json={'query': f"Kiek kainavo sąskaita BENCH-{i}?"})
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.get_json()
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{size:>10} | {statistics.median(timings):>9.1f} | {p95:>9.1f} | {fake_generate.last_prompt_chars:>18}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/ask vėlinimo matavimas priklausomai nuo archyvo dydžio.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--mode", choices=["hybrid", "topk", "all"], default="topk")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.mode, args.repeats)
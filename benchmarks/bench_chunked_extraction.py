@@ -0,0 +1,62 @@
+"""
+Ilgo (100 psl.) dokumento ištraukimo trukmė: vienas Gemini kvietimas visam tekstui prieš skaidymą į dalis,
+apdorojamas lygiagrečiai. Netikro modelio vėlinimas auga su raginimo ilgiu, todėl matuojamas ir
+lygiagretumo, ir mažesnių raginimų poveikis. Taip pat tikrinama, ar sujungus dalis prekių sąrašas
+neturi pasikartojimų (kiekvieno puslapio viršuje pakartota ankstesnio puslapio eilutė).
+
+Paleidimas:
+    python benchmarks/bench_chunked_extraction.py --pages 100 --latency 1.0 --latency-per-1k 0.1
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import ai_pdf_to_json  # noqa: E402
+from benchmarks.fakes import FakeGenerativeModel, long_invoice_pages  # noqa: E402
+
+
+def run(label, text, doc_type, chunk_tokens, concurrency, latency, latency_per_1k):
+    ai_pdf_to_json.EXTRACTION_CHUNK_TOKENS = chunk_tokens
+    ai_pdf_to_json.EXTRACTION_CHUNK_CONCURRENCY = concurrency
+    ai_pdf_to_json.AI_MODEL = FakeGenerativeModel(latency, latency_per_1k)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = ai_pdf_to_json.process_pdf_with_ai(text, doc_type)
+    elapsed = time.perf_counter() - started
+
+    items = data.get("prekes", []) if data else []
+    unique_waybills = len({item["vezimas"] for item in items})
+    print(f"{label:<44} {elapsed:>7.2f} s  kvietimų: {ai_pdf_to_json.AI_MODEL.calls:>3}  "
+          f"prekių: {len(items)} (unikalių važtaraščių: {unique_waybills})")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ilgo dokumento ištraukimas: vienas kvietimas prieš dalis.")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=1.0, help="Bazinis kvietimo vėlinimas sekundėmis.")
+    parser.add_argument("--latency-per-1k", type=float, default=0.1,
+                        help="Papildomas vėlinimas už 1000 raginimo žetonų.")
+    parser.add_argument("--chunk-tokens", type=int, default=ai_pdf_to_json.EXTRACTION_CHUNK_TOKENS)
+    args = parser.parse_args()
+
+    pages = long_invoice_pages(args.pages, args.lines_per_page)
+    text = ai_pdf_to_json.join_pages("\n".join(lines) for lines in pages)
+    print(f"Dokumentas: {args.pages} psl., {len(text)} simbolių (~{len(text) // 4} žetonų), "
+          f"prekių eilučių: {args.pages * args.lines_per_page}\n")
+
+    single = run("vienas kvietimas", text, "invoice", 0, 1, args.latency, args.latency_per_1k)
+    for concurrency in (1, 4, 8):
+        chunked = run(f"dalys po {args.chunk_tokens} žet., {concurrency} lygiagr.", text, "invoice",
+                      args.chunk_tokens, concurrency, args.latency, args.latency_per_1k)
+    run(f"dalys, tipas nežinomas ('auto'), 8 lygiagr.", text, "auto",
+        args.chunk_tokens, 8, args.latency, args.latency_per_1k)
+    print(f"\nPagreitėjimas (8 lygiagr.): {single / chunked:.1f}x")
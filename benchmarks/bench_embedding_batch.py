@@ -0,0 +1,64 @@
+"""
+main.py įkėlimo pralaidumo (dok./s) matavimas esant skirtingiems vektorizavimo paketų dydžiams.
+
+Naudojamas tikras 'paraphrase-multilingual-mpnet-base-v2' modelis ir atmintinė ChromaDB.
+
+Paleidimas:
+    python benchmarks/bench_embedding_batch.py --documents 512 --batch-sizes 1 32 256
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import main  # noqa: E402
+from benchmarks.fakes import synthetic_invoice  # noqa: E402
+
+
+def write_invoices(folder, documents):
+    paths = []
+    for i in range(documents):
+        path = os.path.join(folder, f"BENCH-{i}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(synthetic_invoice(i), f, ensure_ascii=False)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paketinio vektorizavimo pralaidumo matavimas.")
+    parser.add_argument("--documents", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    args = parser.parse_args()
+
+    # Matuojamas pats vektorizavimas: podėlis ir dokumentų dalys (kitos kolekcijos) išjungiami
+    main.EMBEDDING_CACHE = False
+    main.MULTI_VECTOR_INDEX = False
+
+    client = chromadb.EphemeralClient()
+    print(f"{'paketas':>8} | {'laikas s':>9} | {'dok./s':>8}")
+    print("-" * 32)
+    for batch_size in args.batch_sizes:
+        collection_name = f"bench_batch_{batch_size}"
+        try:
+            client.delete_collection(collection_name)
+        except Exception:
+            pass
+        collection = client.create_collection(collection_name)
+
+        with tempfile.TemporaryDirectory() as folder:
+            paths = write_invoices(folder, args.documents)
+            started = time.perf_counter()
+            added = main.process_documents_batch(paths, collection, "invoice", main.create_invoice_text_representation,
+                                                 batch_size=batch_size)
+            elapsed = time.perf_counter() - started
+
+        assert added == args.documents, f"Įkelta {added} iš {args.documents}"
+        print(f"{batch_size:>8} | {elapsed:>9.2f} | {args.documents / elapsed:>8.1f}")
@@ -0,0 +1,77 @@
+"""
+Pakartotinio įkėlimo trukmė su vektorių podėliu ir be jo: tie patys dokumentai įkeliami į tuščią
+kolekciją antrą kartą (pvz., atkūrus my_documents_db iš atsarginės kopijos), o dalis jų - pakeistu tekstu
+(pvz., pakeitus create_invoice_text_representation).
+
+Netikras modelis kiekvienam tekstui sugaišta `--ms-per-text` milisekundžių (tikro modelio greitis CPU).
+
+Paleidimas:
+    python benchmarks/bench_embedding_cache.py --documents 5000 --changed-share 0.1
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import main  # noqa: E402
+from benchmarks.fakes import HashingSentenceModel, synthetic_invoice  # noqa: E402
+from structured_store import StructuredStore  # noqa: E402
+
+
+def load(label, records, model):
+    """Įkelia įrašus į naują kolekciją ir atspausdina trukmę bei modelio kvietimų skaičių."""
+    client = chromadb.EphemeralClient()
+    try:
+        client.delete_collection("invoices")
+    except Exception:
+        pass
+    collection = client.create_collection("invoices")
+    model.encoded = 0
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.add_records(records, collection, "invoice", main.create_invoice_text_representation)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<42} {elapsed:>7.2f} s  vektorizuota tekstų: {model.encoded}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vektorių podėlio poveikis pakartotiniam įkėlimui.")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--changed-share", type=float, default=0.1,
+                        help="Dokumentų, kurių tekstas pasikeitė, dalis (0-1).")
+    parser.add_argument("--ms-per-text", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model = HashingSentenceModel(ms_per_text=args.ms_per_text)
+    main.model = model
+    main.MULTI_VECTOR_INDEX = False
+
+    records = {f"invoice-{i}": synthetic_invoice(i) for i in range(args.documents)}
+    changed = dict(records)
+    for i in range(int(args.documents * args.changed_share)):
+        changed[f"invoice-{i}"] = {**records[f"invoice-{i}"], "apmoketi_iki": "2026-01-31", "numeris": f"CHANGED-{i}"}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        main.structured_store = StructuredStore(os.path.join(tmp_dir, "structured.sqlite3"))
+
+        main.EMBEDDING_CACHE = False
+        baseline = load("be podėlio", records, model)
+
+        main.EMBEDDING_CACHE = True
+        main.embedding_cache = main.EmbeddingCache(os.path.join(tmp_dir, "embedding_cache"))
+        load("podėlis tuščias (pirmas įkėlimas)", records, model)
+        cached = load("pakartotinis įkėlimas", records, model)
+        load(f"pakartotinis, {args.changed_share:.0%} tekstų pakeista", changed, model)
+        main.embedding_cache.close()
+
+    print(f"\nPakartotinis įkėlimas greitesnis {baseline / cached:.1f}x")
@@ -0,0 +1,243 @@
+"""
+Visos grandinės matavimas be tinklo: sintetiniai sąskaitų ir sutarčių PDF bei JSON failai, netikras Gemini
+modelis ir netikras Ollama serveris su nustatomu vėlinimu. Kiekvienas etapas matuojamas atskirai:
+extract_full_text_from_pdf, classify_document, process_pdf_with_ai, main.process_and_add_document ir /ask.
+
+Rezultatai įrašomi į JSON failą (numatyta - benchmarks/results/<data>-<commit>.json), kad būtų galima
+palyginti skirtingus commit'us; su --baseline atspausdinamas p50 pokytis lyginant su ankstesniu rezultatu.
+
+Paleidimas:
+    python benchmarks/bench_end_to_end.py --documents 40 --gemini-latency 0.2 --ollama-latency 0.2
+    python benchmarks/bench_end_to_end.py --baseline benchmarks/results/20251020-120000-abc1234.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import ai_pdf_to_json  # noqa: E402
+import app_local  # noqa: E402
+import main as vectorizer  # noqa: E402
+from answer_cache import AnswerCache  # noqa: E402
+from structured_store import StructuredStore  # noqa: E402
+from benchmarks.fakes import (FakeGenerativeModel, HashingSentenceModel, contract_pdf_pages,  # noqa: E402
+                              invoice_pdf_pages, synthetic_contract, synthetic_invoice, write_simple_pdf)
+from benchmarks.load_test_ollama_client import percentile, start_stub_servers  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+STAGES = ["extract_full_text_from_pdf", "classify_document", "process_pdf_with_ai", "process_and_add_document", "ask"]
+
+
+class StageTimer:
+    """Kaupia kiekvieno etapo kvietimų trukmes (sekundėmis)."""
+
+    def __init__(self):
+        self.timings = {stage: [] for stage in STAGES}
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage].append(time.perf_counter() - started)
+
+    def summary(self):
+        result = {}
+        for stage, values in self.timings.items():
+            if not values:
+                continue
+            result[stage] = {
+                "count": len(values),
+                "total_s": round(sum(values), 4),
+                "mean_ms": round(statistics.mean(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "max_ms": round(max(values) * 1000, 3),
+            }
+        return result
+
+
+def generate_corpus(base_dir, documents, pages):
+    """
+    Sukuria pusę sąskaitų, pusę sutarčių: PDF failus ir juos atitinkančius JSON failus (get_invoice_prompt /
+    get_contract_prompt struktūra). Grąžina [(pdf kelias, json kelias, tipas)].
+    """
+    for folder in ("pdf", "invoices", "contracts"):
+        os.makedirs(os.path.join(base_dir, folder), exist_ok=True)
+    corpus = []
+    for i in range(documents):
+        if i % 2 == 0:
+            doc_type, record, page_texts = "invoice", synthetic_invoice(i), invoice_pdf_pages(i, page_count=pages)
+        else:
+            doc_type, record, page_texts = "contract", synthetic_contract(i), contract_pdf_pages(i, page_count=pages)
+        name = f"{doc_type}_{i}"
+        pdf_path = os.path.join(base_dir, "pdf", f"{name}.pdf")
+        json_path = os.path.join(base_dir, doc_type + "s", f"{name}.json")
+        write_simple_pdf(pdf_path, page_texts)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=4)
+        corpus.append((pdf_path, json_path, doc_type))
+    return corpus
+
+
+def make_queries(documents, count):
+    """Klausimų rinkinys: identifikatoriai, prekės, sutarčių sąlygos ir agreguoti klausimai."""
+    rng = random.Random(5)
+    queries = []
+    for n in range(count):
+        index = rng.randrange(documents)
+        invoice_index = index - index % 2
+        queries.append([
+            f"Kokia sąskaitos BENCH-{invoice_index} suma su PVM?",
+            f"Kiek kainavo smėlis pagal sąskaitą BENCH-{invoice_index}?",
+            f"Kokios sutarties S-{invoice_index + 1} mokėjimo sąlygos?",
+            "Kokia bendra visų sąskaitų suma 2025 m.?",
+        ][n % 4])
+    return queries
+
+
+def prepare_stores(client, tmp_dir):
+    """Tuščios atmintinės ChromaDB kolekcijos ir laikina SQLite saugykla, bendros main.py ir app_local.py."""
+    vectorizer.client = app_local.client = client
+    vectorizer.invoice_collection = app_local.invoice_collection = client.create_collection("invoices")
+    vectorizer.contract_collection = app_local.contract_collection = client.create_collection("contracts")
+    vectorizer.parts_collection = app_local.parts_collection = client.create_collection("document_parts")
+    vectorizer.structured_store = app_local.structured_store = StructuredStore(
+        os.path.join(tmp_dir, "structured.sqlite3"))
+    vectorizer.EMBEDDING_CACHE = False
+
+
+def run_extraction_stages(timer, corpus):
+    """PDF teksto ištraukimas, klasifikavimas ir duomenų ištraukimas - kiekvienas etapas atskirai."""
+    for pdf_path, _, _ in corpus:
+        with timer.measure("extract_full_text_from_pdf"):
+            text = ai_pdf_to_json.extract_full_text_from_pdf(pdf_path)
+        with timer.measure("classify_document"):
+            doc_type = ai_pdf_to_json.classify_document(text[:1000])
+        with timer.measure("process_pdf_with_ai"):
+            ai_pdf_to_json.process_pdf_with_ai(text, doc_type if doc_type != "unknown" else "invoice")
+
+
+def run_ingest_stage(timer, corpus):
+    """JSON failų vektorizavimas ir įkėlimas į ChromaDB (failai po įkėlimo pašalinami, kaip main.py)."""
+    collections = {"invoice": vectorizer.invoice_collection, "contract": vectorizer.contract_collection}
+    for _, json_path, doc_type in corpus:
+        with timer.measure("process_and_add_document"):
+            vectorizer.process_and_add_document(json_path, collections[doc_type], doc_type,
+                                                vectorizer.TEXT_GENERATORS[doc_type])
+
+
+def run_ask_stage(timer, queries):
+    """Klausimai per /ask; grąžina (klaidų skaičius, be LLM atsakytų (struktūrizuotų) klausimų skaičius)."""
+    flask_client = app_local.create_app().test_client()
+    errors = structured = 0
+    for query in queries:
+        with timer.measure("ask"):
+            response = flask_client.post("/ask", json={"query": query})
+        errors += response.status_code != 200
+        structured += bool((response.get_json() or {}).get('structured'))
+    return errors, structured
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_summary(stages, baseline=None):
+    print(f"\n{'etapas':<28} | {'kiekis':>6} | {'p50 ms':>9} | {'p95 ms':>9} | {'viso s':>8} | {'p50 pokytis':>11}")
+    print("-" * 88)
+    for stage, stats in stages.items():
+        change = ""
+        previous = (baseline or {}).get(stage)
+        if previous and previous["p50_ms"]:
+            change = f"{(stats['p50_ms'] - previous['p50_ms']) / previous['p50_ms']:+.1%}"
+        print(f"{stage:<28} | {stats['count']:>6} | {stats['p50_ms']:>9.1f} | {stats['p95_ms']:>9.1f} | "
+              f"{stats['total_s']:>8.2f} | {change:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Visos grandinės (PDF -> JSON -> ChromaDB -> /ask) matavimas be tinklo.")
+    parser.add_argument("--documents", type=int, default=40, help="Dokumentų skaičius (pusė sąskaitų, pusė sutarčių).")
+    parser.add_argument("--pages", type=int, default=1, help="Puslapių skaičius viename PDF.")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--gemini-latency", type=float, default=0.2, help="Netikro Gemini atsakymo vėlinimas (s).")
+    parser.add_argument("--ollama-latency", type=float, default=0.2, help="Netikro Ollama atsakymo vėlinimas (s).")
+    parser.add_argument("--embed-ms", type=float, default=5.0, help="Vieno teksto vektorizavimo trukmė (ms).")
+    parser.add_argument("--output", help="Rezultatų JSON failas (numatyta - benchmarks/results/<data>-<commit>.json).")
+    parser.add_argument("--baseline", help="Ankstesnis rezultatų failas, su kuriuo palyginti.")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    created_at = datetime.now()
+    output = args.output or os.path.join(RESULTS_DIR, f"{created_at:%Y%m%d-%H%M%S}-{commit}.json")
+    timer = StageTimer()
+    servers, base_urls = start_stub_servers(1, args.ollama_latency)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus = generate_corpus(tmp_dir, args.documents, args.pages)
+        ai_pdf_to_json.AI_MODEL = FakeGenerativeModel(args.gemini_latency)
+        # Podėliai išjungti - matuojamas kiekvienas kvietimas
+        ai_pdf_to_json.EXTRACTION_CACHE = None
+        model = HashingSentenceModel(ms_per_text=args.embed_ms)
+        vectorizer.model = model
+        app_local.sentence_model = model
+        app_local.answer_cache = AnswerCache(0, 0)
+        app_local.llm_client = app_local.OllamaClient(base_urls, "llama3")
+        prepare_stores(chromadb.EphemeralClient(), tmp_dir)
+
+        print(f"{args.documents} dokumentų, {args.queries} klausimų, Gemini {args.gemini_latency} s, "
+              f"Ollama {args.ollama_latency} s, commit {commit}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_extraction_stages(timer, corpus)
+            run_ingest_stage(timer, corpus)
+            ask_errors, ask_structured = run_ask_stage(timer, make_queries(args.documents, args.queries))
+        vectorizer.structured_store.close()
+
+    for server in servers:
+        server.shutdown()
+
+    stages = timer.summary()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+    print_summary(stages, baseline)
+    print(f"\n/ask: {ask_structured} iš {args.queries} atsakyta be LLM (struktūrizuota užklausa), klaidų: {ask_errors}")
+
+    result = {
+        "suite": "end_to_end",
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "stages": stages,
+        "ask_errors": ask_errors,
+        "ask_structured": ask_structured,
+        "gemini_calls": ai_pdf_to_json.AI_MODEL.calls,
+        "embedded_texts": model.encoded,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nRezultatai įrašyti: {output}")
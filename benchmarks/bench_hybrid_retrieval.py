@@ -0,0 +1,89 @@
+"""
+Klausimai su tiksliais identifikatoriais (sąskaitos numeris, važtaraščio numeris):
+vektorinė paieška ('topk') prieš hibridinę (BM25 + vektoriai, reciprocal rank fusion) su identifikatorių
+trumpiniu ir be jo. Matuojama, ar reikiamas dokumentas patenka į kontekstą, paieškos vėlinimas ir
+konteksto dydis.
+
+Netikras leksinis įdėjimo modelis identifikatorius atskiria geriau nei tikras MPNet modelis, todėl
+vektorinės paieškos recall čia yra optimistinis. `--embed-ms` imituoja klausimo vektorizavimo trukmę CPU.
+
+Paleidimas:
+    python benchmarks/bench_hybrid_retrieval.py --invoices 2000 --queries 200 --embed-ms 30
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import app_local  # noqa: E402
+import main as vectorizer  # noqa: E402
+from benchmarks.bench_multi_vector_recall import populate  # noqa: E402
+from benchmarks.fakes import HashingSentenceModel, synthetic_invoice  # noqa: E402
+
+
+def make_queries(invoices, items, count):
+    """(klausimas, sąskaitos žymė) - klausimai apie sąskaitą pagal jos numerį arba važtaraštį."""
+    rng = random.Random(11)
+    queries = []
+    for n in range(count):
+        index = rng.randrange(invoices)
+        invoice = synthetic_invoice(index, items)
+        item = invoice["prekes"][rng.randrange(items)]
+        question = [
+            f"Kokia sąskaitos {invoice['numeris']} suma su PVM?",
+            f"Kuriai sąskaitai priklauso važtaraštis {item['vezimas']}?",
+            f"Kada apmokėti sąskaitą Nr. {invoice['numeris']}, išrašytą {invoice['data']}?",
+        ][n % 3]
+        queries.append((question, f"Nr. {invoice['numeris']} "))
+    return queries
+
+
+def run(label, mode, shortcut, queries, top_k):
+    app_local.RETRIEVAL_MODE = mode
+    app_local.IDENTIFIER_SHORTCUT = shortcut
+    found = 0
+    timings = []
+    context_chars = 0
+    for query, marker in queries:
+        started = time.perf_counter()
+        context = app_local.retrieve_relevant_documents(query, top_k=top_k) or ""
+        timings.append((time.perf_counter() - started) * 1000)
+        found += marker in context
+        context_chars += len(context)
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<38} | {found / len(queries):>7.1%} | {statistics.median(timings):>7.1f} | {p95:>7.1f} | "
+          f"{context_chars // len(queries):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vektorinės ir hibridinės paieškos palyginimas identifikatorių klausimams.")
+    parser.add_argument("--invoices", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--contracts", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=app_local.RETRIEVAL_TOP_K)
+    parser.add_argument("--embed-ms", type=float, default=30.0, help="Klausimo vektorizavimo trukmė (ms).")
+    args = parser.parse_args()
+
+    vectorizer.model = HashingSentenceModel()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        populate(chromadb.EphemeralClient(), args.invoices, args.items, args.contracts, tmp_dir)
+        app_local.sentence_model = HashingSentenceModel(ms_per_text=args.embed_ms)
+
+        queries = make_queries(args.invoices, args.items, args.queries)
+        print(f"{args.invoices} sąskaitų, {args.queries} klausimų, recall@{args.top_k}\n")
+        print(f"{'režimas':<38} | {'recall':>7} | {'p50 ms':>7} | {'p95 ms':>7} | {'kontekstas':>10}")
+        print("-" * 82)
+        run("vektorinė (topk)", "topk", False, queries, args.top_k)
+        run("hibridinė (RRF)", "hybrid", False, queries, args.top_k)
+        run("hibridinė + identifikatorių trumpinys", "hybrid", True, queries, args.top_k)
@@ -0,0 +1,61 @@
+"""
+ai_pdf_to_json apdorojimo greičio matavimas: nuoseklus process_folder prieš lygiagretų
+process_folder_pipelined. Gemini pakeičiamas netikru modeliu su dirbtiniu vėlinimu.
+
+Paleidimas:
+    python benchmarks/bench_ingest_pipeline.py --documents 40 --latency 0.5 --workers 4 --concurrency 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import ai_pdf_to_json  # noqa: E402
+from benchmarks.fakes import FakeGenerativeModel, invoice_pdf_pages, write_simple_pdf  # noqa: E402
+
+
+def prepare_folder(base_dir, documents, pages):
+    pdf_dir = os.path.join(base_dir, "pdf")
+    for folder in ["pdf", "invoices", "contracts"]:
+        os.makedirs(os.path.join(base_dir, folder), exist_ok=True)
+    for i in range(documents):
+        write_simple_pdf(os.path.join(pdf_dir, f"bench_{i}.pdf"), invoice_pdf_pages(i, page_count=pages))
+    ai_pdf_to_json.JSON_FOLDER_INVOICES = os.path.join(base_dir, "invoices")
+    ai_pdf_to_json.JSON_FOLDER_CONTRACTS = os.path.join(base_dir, "contracts")
+    return pdf_dir
+
+
+def timed_run(label, documents, pages, latency, run):
+    with tempfile.TemporaryDirectory() as base_dir:
+        pdf_dir = prepare_folder(base_dir, documents, pages)
+        ai_pdf_to_json.AI_MODEL = FakeGenerativeModel(latency)
+        started = time.perf_counter()
+        run(pdf_dir)
+        elapsed = time.perf_counter() - started
+        produced = len(os.listdir(ai_pdf_to_json.JSON_FOLDER_INVOICES))
+    print(f"{label:<28} {elapsed:>8.2f} s  {documents / elapsed:>7.2f} dok./s  "
+          f"JSON: {produced}/{documents}  AI kvietimai: {ai_pdf_to_json.AI_MODEL.calls}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nuoseklaus ir lygiagretaus PDF apdorojimo palyginimas.")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.5, help="Netikro modelio vėlinimas sekundėmis.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=0)
+    args = parser.parse_args()
+
+    sequential = timed_run("nuoseklus", args.documents, args.pages, args.latency,
+                           ai_pdf_to_json.process_folder)
+    pipelined = timed_run(f"lygiagretus ({args.workers}p/{args.concurrency}g)", args.documents, args.pages,
+                          args.latency,
+                          lambda folder: ai_pdf_to_json.process_folder_pipelined(
+                              folder, args.workers, args.concurrency, args.rpm))
+    print(f"\nPagreitėjimas: {sequential / pipelined:.1f}x")
@@ -0,0 +1,98 @@
+"""
+Metaduomenų filtrų (ASK_METADATA_FILTERS) poveikis paieškai: klausimai apie konkretaus tiekėjo konkretaus mėnesio
+sąskaitos prekę ("Koks Smėlis 0/5 kiekis UAB Žvyro tiekimas sąskaitoje 2025-03 mėn.?"), be sąskaitos numerio.
+
+Su filtrais vektorinė paieška vykdoma tik to tiekėjo ir to mėnesio dokumentuose, be filtrų - visame archyve.
+Matuojama:
+- dokumento ir prekės recall (ar klausiamos sąskaitos ir prekės duomenys pateko į kontekstą),
+- kontekste esančių dokumentų, atitinkančių klausimo tiekėją ir mėnesį, dalis (tikslumas),
+- konteksto paieškos trukmė.
+Naudojama atmintinė (ephemeral) ChromaDB ir leksinis netikras įdėjimo modelis (be torch).
+
+Paleidimas:
+    python benchmarks/bench_metadata_filter.py --invoices 5000 --items 4 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import app_local  # noqa: E402
+import main as vectorizer  # noqa: E402
+from benchmarks.bench_multi_vector_recall import populate  # noqa: E402
+from benchmarks.fakes import HashingSentenceModel, synthetic_invoice  # noqa: E402
+
+
+def make_queries(invoices, items, count):
+    """
+    (klausimas, sąskaitos žymė, prekės žymė, tiekėjas, mėnuo YYYY-MM).
+    """
+    rng = random.Random(11)
+    queries = []
+    for _ in range(count):
+        index = rng.randrange(invoices)
+        invoice = synthetic_invoice(index, items)
+        item = invoice["prekes"][rng.randrange(items)]
+        supplier = invoice["pardavejas"]["pavadinimas"]
+        month = invoice["data"][:7]
+        queries.append((f"Koks {item['pavadinimas']} kiekis {supplier} sąskaitoje {month} mėn.?",
+                        f"Nr. BENCH-{index} ", f"{item['kiekis_t']} t", supplier, month))
+    return queries
+
+
+def run(label, metadata_filters, queries, top_k):
+    app_local.METADATA_FILTERS = metadata_filters
+    documents_found = items_found = 0
+    matching_blocks = total_blocks = 0
+    timings = []
+    for query, document_marker, item_marker, supplier, month in queries:
+        started = time.perf_counter()
+        context = app_local.retrieve_relevant_documents(query, top_k=top_k) or ""
+        timings.append((time.perf_counter() - started) * 1000)
+        blocks = context.split("\n\n---\n\n")
+        found = [block for block in blocks if document_marker in block]
+        documents_found += bool(found)
+        items_found += any(item_marker in block for block in found)
+        invoice_blocks = [block for block in blocks if block.startswith("[SĄSKAITA FAKTŪRA]")]
+        matching_blocks += sum(supplier in block and f"{month}-" in block for block in invoice_blocks)
+        total_blocks += len(invoice_blocks)
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<16} | {documents_found / len(queries):>10.1%} | {items_found / len(queries):>8.1%} | "
+          f"{matching_blocks / max(total_blocks, 1):>9.1%} | {statistics.median(timings):>7.1f} | {p95:>7.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paieška su metaduomenų filtrais ir be jų.")
+    parser.add_argument("--invoices", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=4, help="Prekių skaičius kiekvienoje sąskaitoje.")
+    parser.add_argument("--contracts", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=app_local.RETRIEVAL_TOP_K)
+    args = parser.parse_args()
+
+    model = HashingSentenceModel()
+    vectorizer.model = model
+    app_local.sentence_model = model
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        populate(chromadb.EphemeralClient(), args.invoices, args.items, args.contracts, tmp_dir)
+        app_local.RETRIEVAL_MULTI_VECTOR = True
+        print(f"Įkelta {args.invoices} sąskaitų ({args.items} prekės) ir {args.contracts} sutarčių "
+              f"({time.perf_counter() - started:.1f} s), top-k {args.top_k}, {args.queries} klausimų\n")
+        print(f"{'paieška':<16} | {'dokumentas':>10} | {'prekė':>8} | {'tikslumas':>9} | {'p50 ms':>7} | {'p95 ms':>7}")
+        print("-" * 74)
+        queries = make_queries(args.invoices, args.items, args.queries)
+        run("be filtrų", False, queries, args.top_k)
+        run("su filtrais", True, queries, args.top_k)
+        vectorizer.structured_store.close()
@@ -0,0 +1,124 @@
+"""
+Paieškos kokybė (recall@k) ir vėlinimas: vienas vektorius dokumentui (santrauka tik su pirmąja preke)
+prieš kelių vektorių režimą (atskiras vektorius kiekvienai prekei ir sutarties daliai, rezultatai
+sugrupuojami pagal dokumentą).
+
+Klausimai teiraujasi apie konkrečią (dažniausiai ne pirmąją) sąskaitos prekę, todėl matuojama:
+- dokumento recall: ar atitinkama sąskaita patenka į LLM kontekstą,
+- prekės recall: ar kontekste, prie tos sąskaitos, yra ir klausiamos prekės duomenys (t. y. ar LLM gali atsakyti).
+Naudojama atmintinė (ephemeral) ChromaDB ir leksinis netikras įdėjimo modelis (be torch).
+
+Paleidimas:
+    python benchmarks/bench_multi_vector_recall.py --invoices 2000 --items 6 --queries 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import app_local  # noqa: E402
+import main as vectorizer  # noqa: E402
+from benchmarks.fakes import HashingSentenceModel, synthetic_contract, synthetic_invoice  # noqa: E402
+from structured_store import StructuredStore  # noqa: E402
+
+
+def populate(client, invoices, items, contracts, tmp_dir):
+    """Įkelia sintetinius dokumentus per main.add_records (kartu sukuriamos ir dalys)."""
+    for name in ("invoices", "contracts", "document_parts"):
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
+    vectorizer.client = client
+    vectorizer.invoice_collection = client.create_collection("invoices")
+    vectorizer.contract_collection = client.create_collection("contracts")
+    vectorizer.parts_collection = client.create_collection("document_parts")
+    vectorizer.structured_store = StructuredStore(os.path.join(tmp_dir, "structured.sqlite3"))
+    vectorizer.MULTI_VECTOR_INDEX = True
+    vectorizer.EMBEDDING_CACHE = False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        vectorizer.add_records({f"invoice-{i}": synthetic_invoice(i, items) for i in range(invoices)},
+                               vectorizer.invoice_collection, "invoice", vectorizer.TEXT_GENERATORS["invoice"])
+        vectorizer.add_records({f"contract-{i}": synthetic_contract(i) for i in range(contracts)},
+                               vectorizer.contract_collection, "contract", vectorizer.TEXT_GENERATORS["contract"])
+
+    app_local.client = client
+    app_local.invoice_collection = vectorizer.invoice_collection
+    app_local.contract_collection = vectorizer.contract_collection
+    app_local.parts_collection = vectorizer.parts_collection
+    app_local.structured_store = vectorizer.structured_store
+    # Lyginama tik vektorinė paieška (hibridinė - žr. bench_hybrid_retrieval.py)
+    app_local.RETRIEVAL_MODE = "topk"
+
+
+def make_queries(invoices, items, count):
+    """
+    (klausimas, sąskaitos žymė, prekės žymė) - apie atsitiktinę, dažniausiai ne pirmąją prekę.
+    """
+    rng = random.Random(7)
+    queries = []
+    for _ in range(count):
+        index = rng.randrange(invoices)
+        item = synthetic_invoice(index, items)["prekes"][rng.randrange(items)]
+        queries.append((f"Koks {item['pavadinimas']} kiekis ir suma sąskaitoje BENCH-{index}?",
+                        f"Nr. BENCH-{index} ", f"{item['kiekis_t']} t"))
+    return queries
+
+
+def run(label, multi_vector, queries, top_k):
+    app_local.RETRIEVAL_MULTI_VECTOR = multi_vector
+    documents_found = items_found = 0
+    timings = []
+    context_chars = 0
+    for query, document_marker, item_marker in queries:
+        started = time.perf_counter()
+        context = app_local.retrieve_relevant_documents(query, top_k=top_k) or ""
+        timings.append((time.perf_counter() - started) * 1000)
+        blocks = [block for block in context.split("\n\n---\n\n") if document_marker in block]
+        documents_found += bool(blocks)
+        items_found += any(item_marker in block for block in blocks)
+        context_chars += len(context)
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<24} | {documents_found / len(queries):>10.1%} | {items_found / len(queries):>10.1%} | "
+          f"{statistics.median(timings):>7.1f} | {p95:>7.1f} | {context_chars // len(queries):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vieno ir kelių vektorių paieškos kokybės ir vėlinimo palyginimas.")
+    parser.add_argument("--invoices", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=6, help="Prekių skaičius kiekvienoje sąskaitoje.")
+    parser.add_argument("--contracts", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=app_local.RETRIEVAL_TOP_K)
+    args = parser.parse_args()
+
+    model = HashingSentenceModel()
+    vectorizer.model = model
+    app_local.sentence_model = model
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        populate(chromadb.EphemeralClient(), args.invoices, args.items, args.contracts, tmp_dir)
+        print(f"Įkelta {args.invoices} sąskaitų ({args.items} prekės) ir {args.contracts} sutarčių: "
+              f"{vectorizer.invoice_collection.count() + vectorizer.contract_collection.count()} dokumentų, "
+              f"{vectorizer.parts_collection.count()} dalių ({time.perf_counter() - started:.1f} s)\n")
+
+        queries = make_queries(args.invoices, args.items, args.queries)
+        print(f"Recall@{args.top_k}, {args.queries} klausimų\n")
+        print(f"{'režimas':<24} | {'dokumentas':>10} | {'prekė':>10} | {'p50 ms':>7} | {'p95 ms':>7} | {'kontekstas':>10}")
+        print("-" * 86)
+        run("vienas vektorius", False, queries, args.top_k)
+        run("keli vektoriai (dalys)", True, queries, args.top_k)
@@ -0,0 +1,88 @@
+"""
+Raginimo dydis ir konteksto kokybė: pilni dokumentų tekstai prieš beveik identiškų dokumentų glaudinimą
+(ASK_CONTEXT_DEDUP_THRESHOLD) ir glaustą laukų pateikimą (ASK_COMPACT_CONTEXT).
+
+Sintetinėse sąskaitose tie patys tiekėjai ir prekės kartojasi kas kelias sąskaitas (kaip mėnesinės to paties
+tiekėjo sąskaitos), todėl dauguma rastų dokumentų yra beveik identiški. Matuojama:
+- raginimo dydis žetonais (įvertis) ir dokumentų skaičius kontekste,
+- dokumento ir prekės recall (ar klausiamos sąskaitos ir prekės duomenys pateko į raginimą),
+- raginimo paruošimo trukmė.
+Naudojama atmintinė (ephemeral) ChromaDB ir leksinis netikras įdėjimo modelis (be torch).
+
+Paleidimas:
+    python benchmarks/bench_prompt_budget.py --invoices 2000 --items 6 --queries 200 --budget 1500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import app_local  # noqa: E402
+import main as vectorizer  # noqa: E402
+from benchmarks.bench_multi_vector_recall import make_queries, populate  # noqa: E402
+from benchmarks.fakes import HashingSentenceModel  # noqa: E402
+from metrics import estimate_tokens  # noqa: E402
+
+
+def run(label, dedup_threshold, compact, queries):
+    app_local.CONTEXT_DEDUP_THRESHOLD = dedup_threshold
+    app_local.COMPACT_CONTEXT = compact
+    documents_found = items_found = 0
+    timings, prompt_tokens, context_documents = [], [], []
+    for query, document_marker, item_marker in queries:
+        started = time.perf_counter()
+        prompt = app_local.build_llm_prompt(query) or ""
+        timings.append((time.perf_counter() - started) * 1000)
+        blocks = prompt.split("\n\n---\n\n")
+        matching = [block for block in blocks if document_marker in block]
+        documents_found += bool(matching)
+        items_found += any(item_marker in block for block in matching)
+        prompt_tokens.append(estimate_tokens(prompt))
+        context_documents.append(len(blocks))
+
+    print(f"{label:<28} | {statistics.mean(prompt_tokens):>9.0f} | {max(prompt_tokens):>8} | "
+          f"{statistics.mean(context_documents):>9.1f} | {documents_found / len(queries):>10.1%} | "
+          f"{items_found / len(queries):>8.1%} | {statistics.median(timings):>7.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raginimo dydžio ir konteksto glaudinimo palyginimas.")
+    parser.add_argument("--invoices", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=6, help="Prekių skaičius kiekvienoje sąskaitoje.")
+    parser.add_argument("--contracts", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=app_local.RETRIEVAL_TOP_K)
+    parser.add_argument("--budget", type=int, default=app_local.CONTEXT_TOKEN_BUDGET,
+                        help="Konteksto žetonų biudžetas (ASK_CONTEXT_TOKEN_BUDGET).")
+    args = parser.parse_args()
+
+    model = HashingSentenceModel()
+    vectorizer.model = model
+    app_local.sentence_model = model
+    app_local.RETRIEVAL_TOP_K = args.top_k
+    app_local.CONTEXT_TOKEN_BUDGET = args.budget
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        populate(chromadb.EphemeralClient(), args.invoices, args.items, args.contracts, tmp_dir)
+        app_local.RETRIEVAL_MODE = "hybrid"
+        app_local.RETRIEVAL_MULTI_VECTOR = True
+        # Kitaip klausimai su sąskaitos numeriu atsakomi vienu dokumentu ir konteksto dėti nereikia
+        app_local.IDENTIFIER_SHORTCUT = False
+        queries = make_queries(args.invoices, args.items, args.queries)
+
+        print(f"{args.invoices} sąskaitų ({args.items} prekės), {args.contracts} sutarčių, top-k {args.top_k}, "
+              f"biudžetas {app_local.context_token_budget('')} žetonų (Ollama num_ctx {app_local.OLLAMA_NUM_CTX})\n")
+        print(f"{'kontekstas':<28} | {'žetonai':>9} | {'maks.':>8} | {'dokumentai':>9} | {'dokumentas':>10} | "
+              f"{'prekė':>8} | {'p50 ms':>7}")
+        print("-" * 100)
+        run("pilni tekstai", 0, False, queries)
+        run("beveik identiški - glaustai", 0.9, False, queries)
+        run("visi glaustai", 0.9, True, queries)
+        vectorizer.structured_store.close()
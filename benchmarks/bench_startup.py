@@ -0,0 +1,73 @@
+"""
+Importo ir paleidimo laiko matavimas kiekvienam scenarijui (`python -X importtime` principu).
+
+Kiekvienas modulis importuojamas švariame interpretatoriuje; pateikiamas bendras importo laikas
+ir lėčiausi importuojami paketai. Su --max-ms grąžinamas klaidos kodas, jei limitas viršytas
+(tinka naudoti prieš kiekvieną pakeitimą, kad paleidimas išliktų greitas).
+
+Paleidimas:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --max-ms 800 --top 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ["ai_pdf_to_json", "main", "app_local"]
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure_import(module):
+    """
+    Grąžina (sienos laikas ms, kaupiamasis importo laikas ms, [(kaupiamasis ms, paketas)]).
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Nepavyko importuoti '{module}':\n{result.stderr[-2000:]}")
+
+    top_level = []
+    module_total_ms = 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        indent = len(match.group(3))
+        name = match.group(4)
+        if name == module:
+            module_total_ms = cumulative_ms
+        # Tiesioginiai modulio importai (vienu lygiu giliau)
+        elif indent <= 3:
+            top_level.append((cumulative_ms, name))
+    return wall_ms, module_total_ms, sorted(top_level, reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scenarijų importo laiko matavimas.")
+    parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=5, help="Kiek lėčiausių importų parodyti.")
+    parser.add_argument("--max-ms", type=float, default=0,
+                        help="Didžiausias leistinas importo laikas ms (0 - netikrinama).")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        wall_ms, import_ms, slowest = measure_import(module)
+        over_limit = args.max_ms and import_ms > args.max_ms
+        failed = failed or over_limit
+        print(f"{module:<16} importas {import_ms:>8.1f} ms   procesas {wall_ms:>8.1f} ms"
+              + ("   ❌ viršytas limitas" if over_limit else ""))
+        for cumulative_ms, name in slowest[:args.top]:
+            print(f"    {cumulative_ms:>8.1f} ms  {name}")
+
+    sys.exit(1 if failed else 0)
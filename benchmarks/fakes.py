@@ -0,0 +1,249 @@
+"""
+Bendri netikri (fake) komponentai ir sintetiniai duomenys matavimams be tinklo.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+SAMPLE_INVOICE = {
+    "dokumento_tipas": "PVM sąskaita faktūra",
+    "numeris": "BENCH-1",
+    "data": "2025-10-20",
+    "pardavejas": {"pavadinimas": "UAB Tiekėjas", "imones_kodas": "305654042", "pvm_kodas": "LT100013856212",
+                   "adresas": "Taikos pr. 4A-59, Klaipėda", "bankas": "Swedbank, AB", "saskaitos_numeris": "LT17 7300 0101 6633 9230"},
+    "gavejas": {"pavadinimas": "Algintra MB", "imones_kodas": "307055970", "pvm_kodas": "LT100017485212",
+                "adresas": "M. Mažvydo g. 3-67, Vilnius"},
+    "prekes": [{"pavadinimas": "Smėlis 0/5", "vezimas": "15201", "kiekis_t": 13.3, "vieneto_kaina_eur": 1.5, "viso_eur": 19.95}],
+    "sumos": {"viso_be_pvm_eur": 16.49, "pvm_suma_eur": 3.46, "viso_su_pvm_eur": 19.95},
+    "apmoketi_iki": "2025-11-03",
+}
+
+SAMPLE_CONTRACT = {
+    "dokumento_tipas": "Sutartis",
+    "numeris": "S-1",
+    "sudarymo_data": "2025-01-15",
+    "sutarties_tipas": "Paslaugų teikimo",
+    "salis_a": {"pavadinimas": "UAB Tiekėjas", "imones_kodas": "305654042", "adresas": "Taikos pr. 4A-59, Klaipėda"},
+    "salis_b": {"pavadinimas": "Algintra MB", "imones_kodas": "307055970", "adresas": "M. Mažvydo g. 3-67, Vilnius"},
+    "galiojimo_terminas": "1 metai",
+    "bendra_suma_eur": "12000",
+    "mokestis_uz_paslaugas": "1000 EUR per mėnesį",
+}
+
+
+def _document_text(prompt):
+    """Dokumento tekstas iš raginimo (visi raginimai jį pateikia paskutiniame ``` bloke), be diakritikų."""
+    parts = prompt.rsplit("```", 2)
+    text = parts[-2] if len(parts) == 3 else prompt
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(ch))
+
+
+def _looks_like_contract(text):
+    return "sutart" in text or "salys" in text
+
+
+# Prekių eilutė, kaip ją generuoja invoice_pdf_pages / long_invoice_pages
+ITEM_LINE = re.compile(r'vezimas (\d+)\s+([\d.]+) t\s+([\d.]+) eur\s+([\d.]+) eur')
+
+
+def _invoice_from_text(text):
+    """Pavyzdinė sąskaita, kurios prekės - tekste rastos prekių eilutės (jei jų yra)."""
+    items = [{"pavadinimas": "Smėlis 0/5", "vezimas": vezimas, "kiekis_t": quantity, "vieneto_kaina_eur": price,
+              "viso_eur": total} for vezimas, quantity, price, total in ITEM_LINE.findall(text)]
+    return dict(SAMPLE_INVOICE, prekes=items) if items else SAMPLE_INVOICE
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Imituoja `genai.GenerativeModel`: kiekvienas kvietimas užtrunka `latency` sekundžių
+    ir dar `latency_per_1k_tokens` už kiekvieną raginimo tūkstantį žetonų (~4 simboliai žetonui).
+    Klasifikavimo raginimui grąžina 'invoice' arba 'contract' (pagal dokumento tekstą), sutarties
+    raginimui - pavyzdinės sutarties JSON, bendram raginimui - pagal tekstą, kitiems - sąskaitos JSON.
+    """
+
+    def __init__(self, latency=0.5, latency_per_1k_tokens=0.0):
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+        time.sleep(self.latency + self.latency_per_1k_tokens * len(prompt) / 4000)
+        document_text = _document_text(prompt)
+        is_contract = _looks_like_contract(document_text)
+        if "nustatykite jo tipą" in prompt:
+            return FakeResponse("contract" if is_contract else "invoice")
+        if "Pirmiausia nustatykite dokumento tipą" in prompt:
+            sample = SAMPLE_CONTRACT if is_contract else _invoice_from_text(document_text)
+        elif "sutarčių duomenų ištraukime" in prompt:
+            sample = SAMPLE_CONTRACT
+        else:
+            sample = _invoice_from_text(document_text)
+        return FakeResponse(json.dumps(sample, ensure_ascii=False))
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_simple_pdf(path, pages):
+    """
+    Įrašo minimalų PDF failą (be papildomų bibliotekų). `pages` - puslapių eilučių sąrašai.
+    Naudojamas tik ASCII tekstas, nes standartinis Helvetica šriftas neturi lietuviškų raidžių.
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 50 800 Td 12 TL " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def invoice_pdf_pages(index, page_count=1, lines_per_page=40):
+    """Sintetinės sąskaitos faktūros puslapių tekstas."""
+    pages = []
+    for page in range(page_count):
+        lines = [f"PVM saskaita faktura Nr. BENCH-{index}", f"Data 2025-10-20  Puslapis {page + 1}"]
+        lines += [f"Smelis 0/5  vezimas {15000 + i}  13.3 t  1.50 EUR  19.95 EUR" for i in range(lines_per_page)]
+        pages.append(lines)
+    return pages
+
+
+def contract_pdf_pages(index, page_count=1, lines_per_page=30):
+    """Sintetinės sutarties puslapių tekstas (FakeGenerativeModel ją atpažįsta kaip sutartį)."""
+    pages = []
+    for page in range(page_count):
+        lines = [f"PASLAUGU TEIKIMO SUTARTIS Nr. S-{index}", f"2025-{index % 12 + 1:02d}-01, Vilnius  Puslapis {page + 1}",
+                 "Salys: UAB Tiekejas (imones kodas 305654042) ir Algintra MB (imones kodas 307055970)"]
+        lines += [f"{page * lines_per_page + i + 1}. Tiekejas isipareigoja teikti paslaugas pagal sutarties priede "
+                  f"nurodyta grafika, mokestis {100 + index} EUR per menesi." for i in range(lines_per_page)]
+        pages.append(lines)
+    return pages
+
+
+def long_invoice_pages(page_count=100, lines_per_page=40):
+    """
+    Ilgos sąskaitos puslapių tekstas: kiekviena prekių eilutė unikali (skirtingas važtaraštis),
+    o kiekvieno puslapio viršuje pakartojama paskutinė ankstesnio puslapio eilutė ("Perkelta").
+    """
+    pages = []
+    previous_line = None
+    for page in range(page_count):
+        lines = ["PVM saskaita faktura Nr. BENCH-LONG", f"Puslapis {page + 1} is {page_count}"]
+        if previous_line:
+            lines.append(f"Perkelta: {previous_line}")
+        for i in range(lines_per_page):
+            previous_line = f"Smelis 0/5  vezimas {20000 + page * lines_per_page + i}  13.3 t  1.50 EUR  19.95 EUR"
+            lines.append(previous_line)
+        pages.append(lines)
+    return pages
+
+
+SUPPLIERS = ["UAB \"7 karjerai\"", "UAB Žvyro tiekimas", "Algintra MB", "UAB Statybų prekyba", "AB Smėlio karjeras"]
+PRODUCTS = [("Smėlis 0/5", 1.5), ("Žvirgždo skalda 0/45 II", 10.0), ("Dolomito skalda 5/8", 14.2), ("Juodžemis", 6.0)]
+
+
+def synthetic_invoice(index, item_count=3):
+    """Sintetinė sąskaita faktūra, atitinkanti get_invoice_prompt JSON struktūrą."""
+    supplier = SUPPLIERS[index % len(SUPPLIERS)]
+    items = []
+    for i in range(item_count):
+        name, price = PRODUCTS[(index + i) % len(PRODUCTS)]
+        quantity = round(5 + (index * 7 + i * 3) % 20 * 0.45, 2)
+        items.append({"pavadinimas": name, "vezimas": str(15000 + index * 10 + i), "kiekis_t": quantity,
+                      "vieneto_kaina_eur": price, "viso_eur": round(quantity * price, 2)})
+    total = round(sum(item["viso_eur"] for item in items), 2)
+    vat = round(total * 0.21, 2)
+    month = index % 12 + 1
+    return {
+        "dokumento_tipas": "PVM sąskaita faktūra",
+        "numeris": f"BENCH-{index}",
+        "data": f"2025-{month:02d}-{index % 28 + 1:02d}",
+        "pardavejas": {"pavadinimas": supplier, "imones_kodas": str(305654000 + index % len(SUPPLIERS)),
+                       "pvm_kodas": f"LT1000138562{index % len(SUPPLIERS)}", "adresas": "Taikos pr. 4A-59, Klaipėda",
+                       "bankas": "Swedbank, AB", "saskaitos_numeris": "LT17 7300 0101 6633 9230"},
+        "gavejas": {"pavadinimas": "Algintra MB", "imones_kodas": "307055970", "pvm_kodas": "LT100017485212",
+                    "adresas": "M. Mažvydo g. 3-67, Vilnius"},
+        "prekes": items,
+        "sumos": {"viso_be_pvm_eur": total, "pvm_suma_eur": vat, "viso_su_pvm_eur": round(total + vat, 2)},
+        "apmoketi_iki": f"2025-{month:02d}-28",
+    }
+
+
+def synthetic_contract(index):
+    """Sintetinė sutartis, atitinkanti get_contract_prompt JSON struktūrą."""
+    supplier = SUPPLIERS[index % len(SUPPLIERS)]
+    return {
+        "dokumento_tipas": "Sutartis",
+        "numeris": f"S-{index}",
+        "sudarymo_data": f"2025-{index % 12 + 1:02d}-01",
+        "sutarties_tipas": ["Pirkimo-pardavimo", "Nuomos", "Paslaugų teikimo"][index % 3],
+        "salis_a": {"pavadinimas": supplier, "imones_kodas": str(305654000 + index % len(SUPPLIERS)),
+                    "adresas": "Taikos pr. 4A-59, Klaipėda"},
+        "salis_b": {"pavadinimas": "Algintra MB", "imones_kodas": "307055970", "adresas": "M. Mažvydo g. 3-67, Vilnius"},
+        "galiojimo_terminas": "1 metai",
+        "bendra_suma_eur": 1000 + index * 10,
+        "mokestis_uz_paslaugas": f"{100 + index} EUR per mėnesį",
+    }
+
+
+class HashingSentenceModel:
+    """
+    Deterministinis leksinis įdėjimo modelis (žodžių maišos į fiksuoto dydžio vektorių, be torch).
+    Skirtingai nei atsitiktiniai vektoriai, panašūs tekstai gauna artimus vektorius, todėl tinka paieškos
+    kokybei (recall) palyginti. `ms_per_text` - dirbtinis vėlinimas kiekvienam tekstui (tikro modelio greitis CPU).
+    """
+
+    def __init__(self, dim=512, ms_per_text=0.0):
+        self.dim = dim
+        self.ms_per_text = ms_per_text
+        self.encoded = 0
+
+    def _encode_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        folded = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+        for word in re.findall(r"\w+", folded):
+            vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        count = 1 if isinstance(texts, str) else len(texts)
+        self.encoded += count
+        if self.ms_per_text:
+            time.sleep(count * self.ms_per_text / 1000)
+        if isinstance(texts, str):
+            return self._encode_one(texts)
+        return np.array([self._encode_one(text) for text in texts], dtype=np.float32).reshape(len(texts), self.dim)
@@ -0,0 +1,138 @@
+"""
+OllamaClient apkrovos testas prieš vietinį netikrą (stub) Ollama serverį.
+
+Palyginami trys variantai esant N vienu metu dirbančių vartotojų:
+- `requests.post` be sesijos (senasis būdas, nauja TCP jungtis kiekvienai užklausai),
+- OllamaClient.generate su nuolatinėmis jungtimis (gijos),
+- OllamaClient.agenerate (asyncio, reikalinga 'aiohttp').
+
+Paleidimas:
+    python benchmarks/load_test_ollama_client.py --users 50 --requests 20 --latency 0.05 --servers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import app_local  # noqa: E402
+
+
+def make_stub_handler(latency):
+    class StubOllamaHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1, kad klientas galėtų pakartotinai naudoti jungtį (keep-alive)
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            json.loads(self.rfile.read(length) or b'{}')
+            time.sleep(latency)
+            body = json.dumps({"response": "Testinis atsakymas.", "done": True}).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubOllamaHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Numatytoji eilė (5) per maža 50 vienu metu besijungiančių vartotojų
+    request_queue_size = 256
+
+
+def start_stub_servers(count, latency):
+    servers = []
+    for _ in range(count):
+        server = StubServer(("127.0.0.1", 0), make_stub_handler(latency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers, [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(label, latencies, elapsed):
+    print(f"{label:<34} p50 {statistics.median(latencies) * 1000:>7.1f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:>7.1f} ms   {len(latencies) / elapsed:>7.1f} užkl./s")
+
+
+def run_threads(call, users, requests_per_user):
+    def user_session(_):
+        latencies = []
+        for _ in range(requests_per_user):
+            started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        results = list(pool.map(user_session, range(users)))
+    return [latency for user in results for latency in user], time.perf_counter() - started
+
+
+async def run_async(client, users, requests_per_user):
+    latencies = []
+
+    async def user_session():
+        for _ in range(requests_per_user):
+            started = time.perf_counter()
+            await client.agenerate("Testinis klausimas")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_session() for _ in range(users)))
+    await client.aclose()
+    return latencies, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OllamaClient apkrovos testas (p50/p99).")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="Užklausų skaičius vienam vartotojui.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Netikro serverio atsakymo vėlinimas (s).")
+    parser.add_argument("--servers", type=int, default=1, help="Netikrų Ollama serverių skaičius (round-robin).")
+    args = parser.parse_args()
+
+    servers, base_urls = start_stub_servers(args.servers, args.latency)
+    print(f"{args.users} vartotojai x {args.requests} užklausų, serveriai: {', '.join(base_urls)}\n")
+
+    def plain_post():
+        requests.post(f"{base_urls[0]}/api/generate",
+                      json={"model": "llama3", "prompt": "Testinis klausimas", "stream": False}).json()
+
+    report("requests.post (be sesijos)", *run_threads(plain_post, args.users, args.requests))
+
+    client = app_local.OllamaClient(base_urls, "llama3", pool_size=args.users)
+    report("OllamaClient.generate", *run_threads(lambda: client.generate("Testinis klausimas"),
+                                                  args.users, args.requests))
+    client.close()
+
+    try:
+        async_client = app_local.OllamaClient(base_urls, "llama3", pool_size=args.users)
+        report("OllamaClient.agenerate (asyncio)", *asyncio.run(run_async(async_client, args.users, args.requests)))
+    except ImportError:
+        print("OllamaClient.agenerate praleistas: neįdiegta 'aiohttp' biblioteka.")
+
+    for server in servers:
+        server.shutdown()
@@ -0,0 +1,144 @@
+"""
+/ask apkrovos testas: daugiagijis Flask (WSGI) serveris prieš asinchroninį aiohttp serverį (serve.py).
+
+Abu serveriai naudoja tą pačią atmintinę ChromaDB, netikrą įdėjimo modelį ir netikrą Ollama serverį,
+kuris veikia atskirame procese ir atsako po `--latency` sekundžių. Atsakymų podėlis ir struktūrizuotų
+užklausų maršrutizatorius išjungti - kiekviena užklausa pasiekia LLM. Matuojama užklausų per sekundę,
+p50/p99 vėlinimas ir didžiausias serverio gijų skaičius.
+
+Paleidimas:
+    python benchmarks/load_test_server.py --users 100 --requests 10 --latency 0.5
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import aiohttp
+import chromadb
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import app_local  # noqa: E402
+import serve  # noqa: E402
+from answer_cache import AnswerCache  # noqa: E402
+from benchmarks.bench_ask_retrieval import FakeSentenceModel, populate  # noqa: E402
+from benchmarks.load_test_ollama_client import percentile, start_stub_servers  # noqa: E402
+
+
+def run_stub_ollama(latency, port_queue):
+    """Netikras Ollama atskirame procese, kad jo gijos nekonkuruotų su matuojamu serveriu dėl GIL."""
+    servers, base_urls = start_stub_servers(1, latency)
+    port_queue.put(base_urls[0])
+    threading.Event().wait()
+
+
+def start_wsgi_server():
+    from werkzeug.serving import make_server
+
+    # Kiekvienos užklausos žurnalo eilutė iškreiptų matavimą
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app_local.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def start_async_server(threads):
+    from aiohttp import web
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(serve.create_async_app(threads))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+async def drive(url, users, requests_per_user):
+    """`users` vartotojų vienu metu siunčia po `requests_per_user` klausimų; grąžina (vėlinimai, klaidos, trukmė)."""
+    latencies = []
+    errors = 0
+
+    async def user_session(session, user):
+        nonlocal errors
+        for n in range(requests_per_user):
+            started = time.perf_counter()
+            async with session.post(f"{url}/ask", json={"query": f"Kokia sąskaitos BENCH-{user * 31 + n} suma?"}) as response:
+                data = await response.json()
+            latencies.append(time.perf_counter() - started)
+            errors += response.status != 200 or 'error' in data
+
+    connector = aiohttp.TCPConnector(limit=users)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=600)) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(user_session(session, user) for user in range(users)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run(label, start_server, args, base_url):
+    # Kiekvienas serveris gauna naują LLM klientą (aiohttp sesija pririšta prie įvykių ciklo)
+    app_local.llm_client = app_local.OllamaClient([base_url], "llama3", pool_size=args.users)
+    url, stop = start_server()
+
+    peak_threads = threading.active_count()
+    done = threading.Event()
+
+    def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            time.sleep(0.01)
+
+    sampler = threading.Thread(target=sample_threads, daemon=True)
+    sampler.start()
+    latencies, errors, elapsed = asyncio.run(drive(url, args.users, args.requests))
+    done.set()
+    sampler.join()
+    stop()
+
+    print(f"{label:<30} | {len(latencies) / elapsed:>8.1f} | {percentile(latencies, 0.5) * 1000:>8.1f} | "
+          f"{percentile(latencies, 0.99) * 1000:>8.1f} | {peak_threads:>6} | {errors:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/ask apkrovos testas: WSGI prieš asinchroninį serverį.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=10, help="Užklausų skaičius vienam vartotojui.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Netikro LLM atsakymo vėlinimas (s).")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=serve.SERVER_THREADS,
+                        help="Konteksto paieškos gijų skaičius asinchroniniame serveryje.")
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=run_stub_ollama, args=(args.latency, port_queue), daemon=True)
+    stub.start()
+    base_url = port_queue.get(timeout=30)
+
+    app_local.sentence_model = FakeSentenceModel()
+    app_local.invoice_collection, app_local.contract_collection = populate(chromadb.EphemeralClient(), args.documents)
+    app_local.answer_cache = AnswerCache(0, 0)
+    app_local.STRUCTURED_QUERY_ROUTER = False
+    app_local.RETRIEVAL_MODE = "topk"
+    app_local.RETRIEVAL_MULTI_VECTOR = False
+
+    print(f"{args.users} vartotojų x {args.requests} užklausų, LLM vėlinimas {args.latency} s, "
+          f"{args.documents} dokumentų\n")
+    print(f"{'serveris':<30} | {'užkl./s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'gijos':>6} | {'klaidos':>6}")
+    print("-" * 82)
+    run("Flask, daugiagijis (WSGI)", start_wsgi_server, args, base_url)
+    run(f"aiohttp (serve.py, {args.threads} gijos)", lambda: start_async_server(args.threads), args, base_url)
+    stub.terminate()
@@ -0,0 +1,65 @@
+import os
+import json
+import uuid
+
+# Failas šalia ChromaDB duomenų bazės, kuriame saugoma kolekcijų turinio versija.
+# main.py ją keičia po kiekvieno įkėlimo, app_local.py pagal ją invaliduoja atsakymų podėlį.
+COLLECTION_VERSION_PATH = os.getenv("COLLECTION_VERSION_PATH", "./my_documents_db/collections_version.txt")
+# Veikiančių kolekcijų pavadinimai: {"active": {kolekcija: tikrasis pavadinimas}, "backup": {...}}.
+# rebuild_index.py perstatytas kolekcijas sukuria naujais pavadinimais ir visas kartu įjungia vienu šio failo įrašu.
+COLLECTION_NAMES_PATH = os.getenv("COLLECTION_NAMES_PATH", "./my_documents_db/collection_names.json")
+
+
+def _write_atomically(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def read_collection_version(path=COLLECTION_VERSION_PATH):
+    """
+    Grąžina dabartinę kolekcijų versiją (arba "0", jei jos dar nėra).
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def bump_collection_version(path=COLLECTION_VERSION_PATH):
+    """
+    Pakeičia kolekcijų versiją. Rašoma atomiškai, kad skaitytojas niekada nematytų pusiau įrašyto failo.
+    """
+    version = uuid.uuid4().hex
+    _write_atomically(path, version)
+    return version
+
+
+def read_collection_names(path=COLLECTION_NAMES_PATH):
+    """
+    Grąžina {"active": {...}, "backup": {...}} (tušti žodynai, jei kolekcijos dar nebuvo perstatytos).
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            names = json.load(f)
+    except FileNotFoundError:
+        return {"active": {}, "backup": {}}
+    return {"active": names.get("active") or {}, "backup": names.get("backup") or {}}
+
+
+def resolve_collection_name(name, path=COLLECTION_NAMES_PATH):
+    """
+    Tikrasis veikiančios kolekcijos pavadinimas (pvz., "invoices" -> "invoices_3f9c2a71b0de").
+    """
+    return read_collection_names(path)["active"].get(name, name)
+
+
+def write_collection_names(active, backup, path=COLLECTION_NAMES_PATH):
+    """
+    Įrašo veikiančių ir atsarginių kolekcijų pavadinimus. Rašoma atomiškai: skaitytojas mato arba visas senąsias,
+    arba visas naujas kolekcijas.
+    """
+    _write_atomically(path, json.dumps({"active": active, "backup": backup}, ensure_ascii=False, indent=2))
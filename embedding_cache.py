@@ -0,0 +1,215 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+# --- NUSTATYMAI ---
+
+# Aplankas, kuriame saugomas vektorių podėlis: SQLite indeksas ir po vieną NumPy failą kiekvienam modeliui
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+# Kiek eilučių iš anksto rezervuojama vektorių faile; užpildžius dydis dvigubinamas
+EMBEDDING_CACHE_INITIAL_ROWS = int(os.getenv("EMBEDDING_CACHE_INITIAL_ROWS", "1024"))
+# Kiek sekundžių laukiama, kol kitas procesas baigs rašyti į podėlį
+EMBEDDING_CACHE_LOCK_TIMEOUT = float(os.getenv("EMBEDDING_CACHE_LOCK_TIMEOUT", "60"))
+
+
+def hash_text(text):
+    """
+    Apskaičiuoja teksto SHA-256 (podėlio raktas).
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Pastovus vektorių podėlis. Raktas: (modelio pavadinimas, teksto SHA-256).
+    Vektoriai laikomi atmintyje atvaizduotame (memory-mapped) float32 masyve, o SQLite saugo tik
+    rakto -> eilutės numerio indeksą, todėl podėlis gali augti iki milijonų vektorių neįkeliant jų į RAM.
+    """
+
+    def __init__(self, directory=EMBEDDING_CACHE_DIR, initial_rows=EMBEDDING_CACHE_INITIAL_ROWS):
+        self.directory = directory
+        self.initial_rows = initial_rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Modelio pavadinimas -> atvaizduotas masyvas
+        self._arrays = {}
+        os.makedirs(directory, exist_ok=True)
+        # Podėliu naudojasi ir lygiagretaus režimo gijos, ir kiti procesai (pipeline, watcher, main, rebuild_index)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False,
+                                     timeout=EMBEDDING_CACHE_LOCK_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS models (
+                model_name TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                capacity INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                model_name TEXT NOT NULL,
+                text_sha256 TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model_name, text_sha256)
+            )
+        """)
+        self._conn.commit()
+
+    def _model_info(self, model_name):
+        return self._conn.execute(
+            "SELECT file_name, dim, rows, capacity FROM models WHERE model_name=?", (model_name,)
+        ).fetchone()
+
+    def _lookup_rows(self, model_name, hashes):
+        """
+        Grąžina {teksto SHA-256: eilutės numeris} podėlyje esantiems tekstams.
+        """
+        rows = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        # SQLite kintamųjų skaičius užklausoje ribotas - ieškome dalimis
+        for start in range(0, len(unique_hashes), 500):
+            chunk = unique_hashes[start:start + 500]
+            rows.update(self._conn.execute(
+                f"SELECT text_sha256, row FROM vectors WHERE model_name=? AND text_sha256 IN ({','.join('?' * len(chunk))})",
+                [model_name] + chunk
+            ).fetchall())
+        return rows
+
+    def _open_array(self, model_name, file_name, dim, capacity):
+        """
+        Atidaro (arba padidina iki `capacity` eilučių) modelio vektorių failą.
+        """
+        array = self._arrays.get(model_name)
+        if array is not None and array.shape[0] >= capacity:
+            return array
+        if array is not None:
+            array.flush()
+            del self._arrays[model_name]
+        path = os.path.join(self.directory, file_name)
+        # Failas didinamas iš anksto: np.memmap 'r+' režimu negali viršyti esamo failo dydžio
+        with open(path, 'ab') as f:
+            f.truncate(max(os.path.getsize(path), capacity * dim * 4))
+        array = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, dim))
+        self._arrays[model_name] = array
+        return array
+
+    def get_many(self, model_name, texts):
+        """
+        Grąžina vektorių sąrašą (arba None tiems tekstams, kurių podėlyje nėra).
+        """
+        hashes = [hash_text(text) for text in texts]
+        with self._lock:
+            info = self._model_info(model_name)
+            if info is None:
+                self.misses += len(texts)
+                return [None] * len(texts)
+            file_name, dim, _, capacity = info
+            rows = self._lookup_rows(model_name, hashes)
+            array = self._open_array(model_name, file_name, dim, capacity)
+            result = [np.array(array[rows[digest]]) if digest in rows else None for digest in hashes]
+            found = sum(vector is not None for vector in result)
+            self.hits += found
+            self.misses += len(texts) - found
+        return result
+
+    def put_many(self, model_name, texts, vectors):
+        """
+        Išsaugo tekstų vektorius. Jau esantys įrašai nekeičiami.
+        Eilutės rezervuojamos BEGIN IMMEDIATE transakcijoje: kol ji neužbaigta, kiti procesai negali perskaityti
+        tų pačių laisvų eilučių numerių ir įrašyti savo vektorių į tas pačias vektorių failo eilutes.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        hashes = [hash_text(text) for text in texts]
+        with self._lock:
+            if self._conn.in_transaction:
+                self._conn.commit()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._put_many_locked(model_name, hashes, vectors)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _put_many_locked(self, model_name, hashes, vectors):
+        info = self._model_info(model_name)
+        if info is None:
+            file_name = re.sub(r'[^\w.-]', '_', model_name) + ".f32"
+            dim, used_rows, capacity = vectors.shape[1], 0, self.initial_rows
+            self._conn.execute("INSERT INTO models VALUES (?, ?, ?, ?, ?)",
+                               (model_name, file_name, dim, used_rows, capacity))
+        else:
+            file_name, dim, used_rows, capacity = info
+        if vectors.shape[1] != dim:
+            raise ValueError(f"Vektoriaus dydis {vectors.shape[1]} nesutampa su podėlio dydžiu {dim} ({model_name})")
+
+        # Praleidžiame jau esančius ir pasikartojančius tekstus
+        existing = self._lookup_rows(model_name, hashes)
+        new = {}
+        for digest, vector in zip(hashes, vectors):
+            if digest not in existing and digest not in new:
+                new[digest] = vector
+        if not new:
+            return
+
+        while used_rows + len(new) > capacity:
+            capacity *= 2
+        array = self._open_array(model_name, file_name, dim, capacity)
+        array[used_rows:used_rows + len(new)] = np.stack(list(new.values()))
+        # Pirma įrašomi vektoriai, tik tada indeksas - nutrūkus darbui indekse neatsiras tuščių eilučių
+        array.flush()
+        now = time.time()
+        self._conn.executemany(
+            "INSERT INTO vectors VALUES (?, ?, ?, ?)",
+            [(model_name, digest, used_rows + offset, now) for offset, digest in enumerate(new)]
+        )
+        self._conn.execute("UPDATE models SET rows=?, capacity=? WHERE model_name=?",
+                           (used_rows + len(new), capacity, model_name))
+
+    def encode(self, model_name, texts, encode_func):
+        """
+        Grąžina tekstų vektorius (np.ndarray): esantys imami iš podėlio, likę apskaičiuojami
+        `encode_func(trūkstami tekstai)` ir išsaugomi.
+        """
+        vectors = self.get_many(model_name, texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = np.asarray(encode_func([texts[index] for index in missing]), dtype=np.float32)
+            self.put_many(model_name, [texts[index] for index in missing], encoded)
+            for index, vector in zip(missing, encoded):
+                vectors[index] = vector
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def stats(self):
+        """
+        Grąžina pataikymų/praleidimų skaitiklius ir įrašų skaičių.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self._lock:
+            for array in self._arrays.values():
+                array.flush()
+            self._arrays.clear()
+            self._conn.close()
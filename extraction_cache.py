@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# --- NUSTATYMAI ---
+
+# SQLite failas, kuriame saugomi Gemini klasifikavimo ir ištraukimo rezultatai
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3")
+# Maksimalus podėlio dydis megabaitais; viršijus šalinami seniausiai naudoti įrašai (LRU)
+EXTRACTION_CACHE_MAX_MB = float(os.getenv("EXTRACTION_CACHE_MAX_MB", "256"))
+
+
+def hash_pdf_file(pdf_path, chunk_size=1024 * 1024):
+    """
+    Apskaičiuoja PDF failo turinio SHA-256 (nepriklauso nuo failo pavadinimo).
+    """
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Pastovus, turiniu adresuojamas AI rezultatų podėlis.
+    Raktas: (PDF SHA-256, įrašo rūšis, raginimo versija, modelio pavadinimas).
+    """
+
+    def __init__(self, path=EXTRACTION_CACHE_PATH, max_mb=EXTRACTION_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Podėliu naudojasi ir lygiagretaus režimo gijos
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                pdf_sha256 TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (pdf_sha256, kind, prompt_version, model_name)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access)")
+        self._conn.commit()
+
+    def get(self, pdf_sha256, kind, prompt_version, model_name):
+        """
+        Grąžina išsaugotą reikšmę (iš JSON) arba None, jei įrašo nėra.
+        """
+        key = (pdf_sha256, kind, prompt_version, model_name)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE pdf_sha256=? AND kind=? AND prompt_version=? AND model_name=?",
+                key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE cache SET last_access=? WHERE pdf_sha256=? AND kind=? AND prompt_version=? AND model_name=?",
+                (time.time(),) + key
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, pdf_sha256, kind, prompt_version, model_name, value):
+        """
+        Išsaugo reikšmę ir, jei reikia, pašalina seniausiai naudotus įrašus.
+        """
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (pdf_sha256, kind, prompt_version, model_name, serialized, len(serialized.encode('utf-8')), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT rowid, size FROM cache ORDER BY last_access").fetchall()
+        to_delete = []
+        for rowid, size in rows:
+            if total_size <= self.max_bytes:
+                break
+            to_delete.append((rowid,))
+            total_size -= size
+        self._conn.executemany("DELETE FROM cache WHERE rowid=?", to_delete)
+
+    def stats(self):
+        """
+        Grąžina pataikymų/praleidimų skaitiklius ir podėlio dydį.
+        """
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,201 @@
+import re
+import json
+
+# Gemini atsakymų schemos (JSON Schema poaibis, kurį priima `response_schema`).
+# Struktūra atitinka INVOICE_JSON_STRUCTURE / CONTRACT_JSON_STRUCTURE raginimuose ai_pdf_to_json.py.
+
+
+def _string():
+    return {"type": "string"}
+
+
+def _number():
+    return {"type": "number"}
+
+
+def _object(properties):
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+
+def _company(*extra_fields):
+    return _object({field: _string() for field in ("pavadinimas", "imones_kodas") + extra_fields})
+
+
+INVOICE_SCHEMA = _object({
+    "dokumento_tipas": _string(),
+    "numeris": _string(),
+    "data": _string(),
+    "pardavejas": _company("pvm_kodas", "adresas", "bankas", "saskaitos_numeris"),
+    "gavejas": _company("pvm_kodas", "adresas"),
+    "prekes": {"type": "array", "items": _object({
+        "pavadinimas": _string(),
+        "vezimas": _string(),
+        "kiekis_t": _number(),
+        "vieneto_kaina_eur": _number(),
+        "viso_eur": _number(),
+    })},
+    "sumos": _object({
+        "viso_be_pvm_eur": _number(),
+        "pvm_suma_eur": _number(),
+        "viso_su_pvm_eur": _number(),
+    }),
+    "apmoketi_iki": _string(),
+})
+
+CONTRACT_SCHEMA = _object({
+    "dokumento_tipas": _string(),
+    "numeris": _string(),
+    "sudarymo_data": _string(),
+    "sutarties_tipas": _string(),
+    "salis_a": _company("adresas"),
+    "salis_b": _company("adresas"),
+    "galiojimo_terminas": _string(),
+    "bendra_suma_eur": _number(),
+    "mokestis_uz_paslaugas": _string(),
+})
+
+# Bendras (tipas + duomenys) raginimas: Gemini schemos nepalaiko 'oneOf', todėl sujungiami abiejų tipų laukai,
+# o privalomas tik 'dokumento_tipas'. Atsakymas vėliau suvedamas į konkretaus tipo schemą.
+COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **INVOICE_SCHEMA["properties"],
+        **CONTRACT_SCHEMA["properties"],
+        "dokumento_tipas": {"type": "string", "enum": ["PVM sąskaita faktūra", "Sutartis", "unknown"]},
+    },
+    "required": ["dokumento_tipas"],
+}
+
+SCHEMAS = {"invoice": INVOICE_SCHEMA, "contract": CONTRACT_SCHEMA, "auto": COMBINED_SCHEMA}
+
+
+def coerce_number(value):
+    """
+    Paverčia AI grąžintą reikšmę skaičiumi ("1 234,56", "1.234,56", "599.71 EUR", 12 -> float).
+    Grąžina None, jei reikšmė nėra skaičius.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = re.sub(r'[^\d,.\-]', '', str(value or ''))
+    if ',' in cleaned and '.' in cleaned:
+        # Abu skirtukai: dešimtainis yra paskutinis ("1.234,56" ir "1,234.56"), kitas skiria tūkstančius
+        decimal = max((',', '.'), key=cleaned.rfind)
+        thousands = ',' if decimal == '.' else '.'
+        cleaned = cleaned.replace(thousands, '').replace(decimal, '.')
+    else:
+        separator = ',' if ',' in cleaned else '.'
+        # Pasikartojantis skirtukas skiria tūkstančius ("1.234.567"), vienas kablelis - dešimtainis
+        cleaned = cleaned.replace(separator, '' if cleaned.count(separator) > 1 else '.')
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def validate_and_coerce(value, schema, path="$"):
+    """
+    Patikrina reikšmę pagal schemą ir suveda tipus: skaičiai iš teksto, trūkstami laukai - numatytosiomis
+    reikšmėmis ("" / 0.0 / [] / {...}), schemoje nenurodyti laukai atmetami.
+    Grąžina (sutvarkyta reikšmė, klaidų sąrašas).
+    """
+    errors = []
+    schema_type = schema["type"]
+
+    if schema_type == "object":
+        if value is None:
+            value = {}
+        if not isinstance(value, dict):
+            return validate_and_coerce({}, schema, path)[0], [f"{path}: tikėtasi objekto, gauta {type(value).__name__}"]
+        result = {}
+        required = set(schema.get("required", ()))
+        for key, field_schema in schema["properties"].items():
+            if key not in value:
+                if key not in required:
+                    continue
+                # Trūkstamas viršutinio lygio laukas dažniausiai reiškia nukirptą atsakymą; gilesni tiesiog tušti
+                if path == "$":
+                    errors.append(f"{path}.{key}: trūksta lauko")
+            result[key], field_errors = validate_and_coerce(value.get(key), field_schema, f"{path}.{key}")
+            errors += field_errors
+        return result, errors
+
+    if schema_type == "array":
+        if value is None:
+            return [], errors
+        if not isinstance(value, list):
+            return [], [f"{path}: tikėtasi sąrašo, gauta {type(value).__name__}"]
+        result = []
+        for index, item in enumerate(value):
+            item, item_errors = validate_and_coerce(item, schema["items"], f"{path}[{index}]")
+            result.append(item)
+            errors += item_errors
+        return result, errors
+
+    if schema_type == "number":
+        if value is None or value == "":
+            return 0.0, errors
+        number = coerce_number(value)
+        if number is None:
+            return 0.0, [f"{path}: '{value}' nėra skaičius"]
+        return number, errors
+
+    # string
+    if value is None:
+        return "", errors
+    if isinstance(value, (dict, list)):
+        return "", [f"{path}: tikėtasi teksto, gauta {type(value).__name__}"]
+    return str(value), errors
+
+
+def _is_filled(value):
+    return value not in (None, "", 0, 0.0, [], {})
+
+
+def _merge(left, right):
+    if isinstance(left, dict) and isinstance(right, dict):
+        return {key: _merge(left.get(key), right.get(key)) for key in {**left, **right}}
+    if isinstance(left, list) and isinstance(right, list):
+        return left + right
+    return left if _is_filled(left) else right
+
+
+def merge_partial_results(parts):
+    """
+    Sujungia iš dokumento dalių ištrauktus JSON: tekstiniai ir skaitiniai laukai imami iš pirmos dalies,
+    kurioje jie užpildyti, sąrašai (pvz., 'prekes') sujungiami, pašalinant visiškai vienodus įrašus
+    (dalių sandūroje ar puslapio antraštėje pakartotas eilutes).
+    """
+    merged = {}
+    for part in parts:
+        merged = _merge(merged, part)
+    for key, value in merged.items():
+        if isinstance(value, list):
+            seen = set()
+            unique = []
+            for item in value:
+                item_key = json.dumps(item, sort_keys=True, ensure_ascii=False)
+                if item_key not in seen:
+                    seen.add(item_key)
+                    unique.append(item)
+            merged[key] = unique
+    return merged
+
+
+def parse_and_validate(text, schema):
+    """
+    Išanalizuoja modelio atsakymą kaip JSON ir patikrina pagal schemą.
+    Grąžina (duomenys arba None, jei JSON sugadintas, klaidų sąrašas).
+    """
+    text = (text or "").strip()
+    # Be struktūrizuotos išvesties modelis kartais apgaubia JSON Markdown blokeliu
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        value = json.loads(text)
+    except (TypeError, ValueError) as e:
+        return None, [f"$: netinkamas JSON ({e})"]
+    if not isinstance(value, dict):
+        return None, [f"$: tikėtasi JSON objekto, gauta {type(value).__name__}"]
+    return validate_and_coerce(value, schema)
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import threading
+
+# --- NUSTATYMAI ---
+
+# SQLite failas, kuriame saugoma kiekvieno dokumento apdorojimo būsena
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "job_queue.sqlite3")
+# Kiek kartų kartojamas laikinai nepavykęs dokumentas, kol jis perkeliamas į nepavykusių sąrašą
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "6"))
+# Pirmojo pakartojimo delsa sekundėmis; kiekvieną kartą dvigubinama
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+# Pradinė delsa po užklausų limito (429) klaidos - ilgesnė nei laikinų klaidų
+JOB_RATE_LIMIT_BASE_SECONDS = float(os.getenv("JOB_RATE_LIMIT_BASE_SECONDS", "60"))
+# Ilgiausia delsa tarp pakartojimų
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+
+# Dokumento būsenos: pending -> classified -> extracted -> embedded; failed - nepavykusių (dead-letter) sąrašas
+PENDING = "pending"
+CLASSIFIED = "classified"
+EXTRACTED = "extracted"
+EMBEDDED = "embedded"
+FAILED = "failed"
+OUTSTANDING_STATES = (PENDING, CLASSIFIED, EXTRACTED)
+
+
+class JobQueue:
+    """
+    Pastovi dokumentų apdorojimo eilė. Kiekvienas PDF turi būseną, bandymų skaičių ir kito bandymo laiką,
+    todėl po perkrovimo tęsiamas tik nebaigtas darbas, o laikinos klaidos kartojamos su eksponentine delsa.
+    Ištraukti duomenys saugomi kartu su būsena: nepavykus įkelti į ChromaDB, Gemini nekviečiamas iš naujo.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Eile naudojasi kelios grandinės gijos
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                pdf_path TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                doc_type TEXT,
+                data TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                error_kind TEXT,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, next_attempt_at)")
+        self._conn.commit()
+
+    def add(self, pdf_paths):
+        """
+        Užregistruoja naujus PDF failus. Jau žinomi failai nekeičiami, išskyrus įkeltus (tas pats
+        pavadinimas vėl pasirodė aplanke - tai naujas dokumentas). Grąžina naujai pridėtų skaičių.
+        """
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO jobs (pdf_path, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(pdf_path) DO UPDATE SET state=excluded.state, doc_type=NULL, data=NULL, attempts=0, "
+                "next_attempt_at=0, error_kind=NULL, last_error=NULL, updated_at=excluded.updated_at "
+                "WHERE jobs.state=?",
+                [(path, PENDING, now, EMBEDDED) for path in pdf_paths]
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def outstanding(self, now=None):
+        """
+        Grąžina nebaigtus dokumentus, kurių kito bandymo laikas jau atėjo: (kelias, būsena, tipas, duomenys).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT pdf_path, state, doc_type, data FROM jobs "
+                f"WHERE state IN ({','.join('?' * len(OUTSTANDING_STATES))}) AND next_attempt_at <= ? "
+                f"ORDER BY next_attempt_at, pdf_path",
+                OUTSTANDING_STATES + (now,)
+            ).fetchall()
+        return [(row['pdf_path'], row['state'], row['doc_type'], json.loads(row['data']) if row['data'] else None)
+                for row in rows]
+
+    def next_attempt_in(self):
+        """
+        Kiek sekundžių liko iki artimiausio atidėto bandymo (None, jei nebaigto darbo nėra).
+        """
+        with self._lock:
+            next_at = self._conn.execute(
+                f"SELECT MIN(next_attempt_at) FROM jobs WHERE state IN ({','.join('?' * len(OUTSTANDING_STATES))})",
+                OUTSTANDING_STATES
+            ).fetchone()[0]
+        return None if next_at is None else max(0.0, next_at - time.time())
+
+    def advance(self, pdf_path, state, doc_type=None, data=None):
+        """
+        Pažymi sėkmingai baigtą etapą. Bandymų skaičius atstatomas: kitas etapas gauna visus bandymus.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state=?, doc_type=COALESCE(?, doc_type), data=COALESCE(?, data), attempts=0, "
+                "next_attempt_at=0, error_kind=NULL, last_error=NULL, updated_at=? WHERE pdf_path=?",
+                (state, doc_type, json.dumps(data, ensure_ascii=False) if data is not None else None,
+                 time.time(), pdf_path)
+            )
+            self._conn.commit()
+
+    def fail(self, pdf_path, error, kind="transient"):
+        """
+        Užregistruoja nesėkmę. 'permanent' klaidos iškart perkeliamos į nepavykusių sąrašą;
+        'transient' ir 'rate_limit' kartojamos su eksponentine delsa, kol baigiasi bandymai.
+        Grąžina naują būseną.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT state, attempts FROM jobs WHERE pdf_path=?", (pdf_path,)).fetchone()
+            if row is None:
+                return None
+            attempts = row['attempts'] + 1
+            state = row['state']
+            next_attempt_at = 0.0
+            if kind == "permanent" or attempts >= self.max_attempts:
+                state = FAILED
+            else:
+                base = JOB_RATE_LIMIT_BASE_SECONDS if kind == "rate_limit" else JOB_RETRY_BASE_SECONDS
+                delay = min(JOB_RETRY_MAX_SECONDS, base * 2 ** (attempts - 1))
+                # Atsitiktinis išsklaidymas, kad po limito klaidos visi dokumentai negrįžtų vienu metu
+                next_attempt_at = time.time() + delay * random.uniform(0.8, 1.2)
+            self._conn.execute(
+                "UPDATE jobs SET state=?, attempts=?, next_attempt_at=?, error_kind=?, last_error=?, updated_at=? "
+                "WHERE pdf_path=?",
+                (state, attempts, next_attempt_at, kind, str(error)[:1000], time.time(), pdf_path)
+            )
+            self._conn.commit()
+        return state
+
+    def dead_letters(self):
+        """
+        Grąžina nepavykusius dokumentus: (kelias, klaidos rūšis, paskutinė klaida, bandymų skaičius).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pdf_path, error_kind, last_error, attempts FROM jobs WHERE state=? ORDER BY updated_at",
+                (FAILED,)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def requeue_failed(self):
+        """
+        Grąžina visus nepavykusius dokumentus į eilę (pvz., pataisius API raktą). Grąžina jų skaičių.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state=CASE WHEN data IS NOT NULL THEN ? WHEN doc_type IS NOT NULL THEN ? ELSE ? END, "
+                "attempts=0, next_attempt_at=0, updated_at=? WHERE state=?",
+                (EXTRACTED, CLASSIFIED, PENDING, time.time(), FAILED)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def forget_missing(self):
+        """
+        Pašalina nebaigtus įrašus, kurių PDF failo nebėra (pvz., ištrintas ranka).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT pdf_path FROM jobs WHERE state IN ({','.join('?' * len(OUTSTANDING_STATES))})",
+                OUTSTANDING_STATES
+            ).fetchall()
+            missing = [(row['pdf_path'],) for row in rows if not os.path.exists(row['pdf_path'])]
+            self._conn.executemany("DELETE FROM jobs WHERE pdf_path=?", missing)
+            self._conn.commit()
+        return len(missing)
+
+    def stats(self):
+        """
+        Grąžina dokumentų skaičių pagal būseną.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in OUTSTANDING_STATES + (EMBEDDED, FAILED)}
+        counts.update({state: count for state, count in rows})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,8 +1,15 @@
 import os
 import json
-import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import Dict, Any
+import argparse
+import threading
+from typing import Dict, Any, TYPE_CHECKING
+import metrics
+from collection_version import bump_collection_version, resolve_collection_name
+from embedding_cache import EmbeddingCache
+from structured_store import StructuredStore, to_date_number, to_number
+
+if TYPE_CHECKING:
+    import chromadb
 
 # --- NUSTATYMAI ---
 
@@ -14,32 +21,140 @@ CONTRACTS_FOLDER = "contracts"
 DB_PATH = "./my_documents_db"
 INVOICE_COLLECTION_NAME = "invoices"
 CONTRACT_COLLECTION_NAME = "contracts"
+# Vaikinė kolekcija: po vieną vektorių kiekvienai sąskaitos prekei ir sutarties daliai (metaduomenyse - parent_id)
+PARTS_COLLECTION_NAME = "document_parts"
+# Jei įjungta, kartu su dokumento santrauka įkeliamos ir jo dalys (žr. create_document_parts)
+MULTI_VECTOR_INDEX = os.getenv("MULTI_VECTOR_INDEX", "1") == "1"
+
+# Įdėjimo (embedding) modelis; jo pavadinimas yra ir vektorių podėlio rakto dalis
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-mpnet-base-v2'
+# Jei įjungta, nepasikeitusių tekstų vektoriai imami iš podėlio (žr. embedding_cache.py), o ne skaičiuojami iš naujo
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "1") == "1"
+
+# Paketinio (batch) įkėlimo nustatymai
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "1000"))
+
+# Sunkūs komponentai (modelis, ChromaDB, SQLite saugykla) inicijuojami tik tada, kai jų prireikia.
+# Užraktas apsaugo nuo dvigubo įkėlimo, kai getteriai kviečiami iš kelių gijų (pipeline.py, watcher.py).
+_init_lock = threading.Lock()
+model = None
+client = None
+invoice_collection = None
+contract_collection = None
+parts_collection = None
+structured_store = None
+embedding_cache = None
+
+
+def get_model():
+    """
+    2. Įdėjimo modelio inicijavimas (pirmo kvietimo metu).
+    """
+    global model
+    if model is None:
+        with _init_lock:
+            if model is None:
+                print("--- 1. ĮDĖJIMO MODELIO INICIAVIMAS ---")
+                print(f"⏳ Pradedamas 'Sentence-BERT' modelio ({EMBEDDING_MODEL_NAME}) įkėlimas/atsisiuntimas. Tai gali užtrukti kelias minutes...")
+                # Importuojame tik čia: torch importas užtrunka kelias sekundes
+                from sentence_transformers import SentenceTransformer
+                # Naudojamas tas pats daugeliakalbis modelis
+                try:
+                    with metrics.timed("model_load"):
+                        model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                    print("✅ Modelis įkeltas sėkmingai! (Apie 500 MB RAM)")
+                except Exception as e:
+                    print(f"❌ Klaida įkeliant modelį: {e}")
+                    exit()
+    return model
+
+
+def get_collections():
+    """
+    3. ChromaDB duomenų bazės kliento ir kolekcijų inicijavimas (pirmo kvietimo metu).
+    Grąžina (sąskaitų kolekcija, sutarčių kolekcija).
+    """
+    global client, invoice_collection, contract_collection, parts_collection
+    if invoice_collection is None or contract_collection is None:
+        with _init_lock:
+            if invoice_collection is None or contract_collection is None:
+                import chromadb
+
+                print("\n--- 2. CHROMADB PRISIJUNGIMAS ---")
+                print(f"⏳ Jungiamės prie ChromaDB atminties saugyklos ({DB_PATH})...")
+                try:
+                    client = chromadb.PersistentClient(path=DB_PATH)
+                    # Inicijuojame dvi skirtingas kolekcijas
+                    # Po rebuild_index.py kolekcijos turi kitus pavadinimus (žr. collection_version.py)
+                    invoice_collection = client.get_or_create_collection(
+                        name=resolve_collection_name(INVOICE_COLLECTION_NAME))
+                    contract_collection = client.get_or_create_collection(
+                        name=resolve_collection_name(CONTRACT_COLLECTION_NAME))
+                    parts_collection = client.get_or_create_collection(
+                        name=resolve_collection_name(PARTS_COLLECTION_NAME))
+                    print("✅ ChromaDB paruošta. Yra dvi kolekcijos: sąskaitos ir sutartys.")
+                    print(f"   Egzistuojančių sąskaitų skaičius: {invoice_collection.count()}")
+                    print(f"   Egzistuojančių sutarčių skaičius: {contract_collection.count()}")
+                except Exception as e:
+                    print(f"❌ Klaida jungiantis prie ChromaDB: {e}")
+                    exit()
+    return invoice_collection, contract_collection
+
 
-# 2. Įdėjimo modelio inicijavimas.
-print("--- 1. ĮDĖJIMO MODELIO INICIAVIMAS ---")
-print("⏳ Pradedamas 'Sentence-BERT' modelio (paraphrase-multilingual-mpnet-base-v2) įkėlimas/atsisiuntimas. Tai gali užtrukti kelias minutes...")
-# Naudojamas tas pats daugeliakalbis modelis
-try:
-    model = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2')
-    print("✅ Modelis įkeltas sėkmingai! (Apie 500 MB RAM)")
-except Exception as e:
-    print(f"❌ Klaida įkeliant modelį: {e}")
-    exit()
-
-# 3. ChromaDB duomenų bazės kliento ir kolekcijų inicijavimas.
-print("\n--- 2. CHROMADB PRISIJUNGIMAS ---")
-print(f"⏳ Jungiamės prie ChromaDB atminties saugyklos ({DB_PATH})...")
-try:
-    client = chromadb.PersistentClient(path=DB_PATH)
-    # Inicijuojame dvi skirtingas kolekcijas
-    invoice_collection = client.get_or_create_collection(name=INVOICE_COLLECTION_NAME)
-    contract_collection = client = client.get_or_create_collection(name=CONTRACT_COLLECTION_NAME)
-    print("✅ ChromaDB paruošta. Yra dvi kolekcijos: sąskaitos ir sutartys.")
-    print(f"   Egzistuojančių sąskaitų skaičius: {invoice_collection.count()}")
-    print(f"   Egzistuojančių sutarčių skaičius: {contract_collection.count()}")
-except Exception as e:
-    print(f"❌ Klaida jungiantis prie ChromaDB: {e}")
-    exit()
+def get_parts_collection():
+    """
+    Dokumentų dalių (prekių, sutarties dalių) kolekcija, sukuriama kartu su pagrindinėmis kolekcijomis.
+    """
+    get_collections()
+    return parts_collection
+
+
+def get_structured_store():
+    """
+    Tipizuota SQLite saugykla agreguotoms užklausoms (sumos, filtrai pagal datą ar įmonę).
+    """
+    global structured_store
+    if structured_store is None:
+        with _init_lock:
+            if structured_store is None:
+                structured_store = StructuredStore()
+    return structured_store
+
+
+def get_embedding_cache():
+    """
+    Pastovus vektorių podėlis (None, jei išjungtas).
+    """
+    global embedding_cache
+    if embedding_cache is None and EMBEDDING_CACHE:
+        with _init_lock:
+            if embedding_cache is None:
+                embedding_cache = EmbeddingCache()
+    return embedding_cache
+
+
+def encode_texts(texts, batch_size: int = EMBEDDING_BATCH_SIZE):
+    """
+    Grąžina tekstų vektorių sąrašą. Podėlyje esantys vektoriai neperskaičiuojami,
+    o modelis įkeliamas tik tada, kai bent vieno teksto podėlyje nėra.
+    """
+    encoded = 0
+
+    def encode(missing_texts):
+        nonlocal encoded
+        encoded += len(missing_texts)
+        metrics.increment("embedded_texts_total", len(missing_texts))
+        with metrics.timed("embedding"):
+            return get_model().encode(missing_texts, batch_size=batch_size, show_progress_bar=False)
+
+    cache = get_embedding_cache()
+    if cache is None:
+        return encode(texts).tolist()
+    vectors = cache.encode(EMBEDDING_MODEL_NAME, texts, encode).tolist()
+    metrics.record_cache_lookup("embedding", True, len(texts) - encoded)
+    metrics.record_cache_lookup("embedding", False, encoded)
+    return vectors
 
 # --- PAGALBINĖS FUNKCIJOS TEKSTO GENERAVIMUI ---
 
@@ -77,11 +192,192 @@ def create_contract_text_representation(data: Dict[str, Any]) -> str:
     )
     return text_content.strip()
 
+def create_invoice_item_texts(data: Dict[str, Any]):
+    """
+    Sukuria po vieną tekstą kiekvienai sąskaitos prekei. Į tekstą įtraukiama sąskaitos antraštė,
+    kad prekės vektorius būtų randamas ir pagal sąskaitos numerį ar pardavėją.
+    """
+    header = (
+        f"PVM sąskaita faktūra Nr. {data.get('numeris', '')} ({data.get('data', '')}), "
+        f"pardavėjas {data.get('pardavejas', {}).get('pavadinimas', '')}. "
+    )
+    return [
+        header + (
+            f"Prekė: {item.get('pavadinimas', '')}, Važtaraštis: {item.get('vezimas', '')}, "
+            f"Kiekis: {item.get('kiekis_t', 'Nenurodyta')} t, Kaina: {item.get('vieneto_kaina_eur', '0')} EUR/t, "
+            f"Viso: {item.get('viso_eur', '0')} EUR."
+        )
+        for item in data.get('prekes', [])
+    ]
+
+
+def create_contract_section_texts(data: Dict[str, Any]):
+    """
+    Sukuria po vieną tekstą kiekvienai sutarties daliai (šalys, terminas, kaina).
+    Sutarties JSON saugo tik šiuos laukus, todėl dalys sudaromos iš jų, o ne iš pilno sutarties teksto.
+    """
+    header = f"Sutartis Nr. {data.get('numeris', '')} ({data.get('sutarties_tipas', 'Nenurodyta')}). "
+    salis_a, salis_b = data.get('salis_a', {}), data.get('salis_b', {})
+    sections = [
+        f"Šalys: {salis_a.get('pavadinimas', '')} (Įm. kodas: {salis_a.get('imones_kodas', '')}, "
+        f"{salis_a.get('adresas', '')}) ir {salis_b.get('pavadinimas', '')} "
+        f"(Įm. kodas: {salis_b.get('imones_kodas', '')}, {salis_b.get('adresas', '')}).",
+        f"Sudarymo data: {data.get('sudarymo_data', '')}. "
+        f"Galiojimo terminas: {data.get('galiojimo_terminas', 'Nenurodyta')}.",
+        f"Bendra vertė: {data.get('bendra_suma_eur', '0')} EUR. "
+        f"Mokestis už paslaugas/prekes: {data.get('mokestis_uz_paslaugas', 'Nenurodyta')}.",
+    ]
+    return [header + section for section in sections]
+
+
+def filter_metadata(data: Dict[str, Any], doc_type: str) -> Dict[str, Any]:
+    """
+    Pagrindiniai laukai kaip plokšti, tipizuoti ChromaDB metaduomenys, pagal kuriuos app_local.py filtruoja
+    vektorinę paiešką (`where`): įmonių kodai, datos (sveikasis skaičius YYYYMMDD) ir suma.
+    Pavadinimai sutampa su structured_store.py stulpeliais. Tuščios reikšmės praleidžiamos (ChromaDB nepriima None).
+    """
+    if doc_type == "invoice":
+        fields = {
+            "pardavejas_kodas": str((data.get('pardavejas') or {}).get('imones_kodas') or ''),
+            "gavejas_kodas": str((data.get('gavejas') or {}).get('imones_kodas') or ''),
+            "data": to_date_number(data.get('data')),
+            "apmoketi_iki": to_date_number(data.get('apmoketi_iki')),
+            "viso_su_pvm_eur": to_number((data.get('sumos') or {}).get('viso_su_pvm_eur')),
+        }
+    else:
+        fields = {
+            "salis_a_kodas": str((data.get('salis_a') or {}).get('imones_kodas') or ''),
+            "salis_b_kodas": str((data.get('salis_b') or {}).get('imones_kodas') or ''),
+            "sudarymo_data": to_date_number(data.get('sudarymo_data')),
+        }
+    return {key: value for key, value in fields.items() if value not in (None, '')}
+
+
+def build_metadata(data: Dict[str, Any], doc_type: str) -> Dict[str, Any]:
+    """
+    Sukuria ChromaDB metaduomenis dokumentui: visas JSON įrašas ir filtravimo laukai (žr. filter_metadata).
+    """
+    return {"json_data": json.dumps(data), "document_type": doc_type, **filter_metadata(data, doc_type)}
+
+# Dokumento tipas -> teksto generavimo funkcija
+TEXT_GENERATORS = {
+    "invoice": create_invoice_text_representation,
+    "contract": create_contract_text_representation,
+}
+
+# Dokumento tipas -> dalių (multi-vector) teksto generavimo funkcija
+PART_GENERATORS = {
+    "invoice": create_invoice_item_texts,
+    "contract": create_contract_section_texts,
+}
+
+
+def build_document_parts(records: Dict[str, Dict[str, Any]], doc_type: str):
+    """
+    Sukuria dokumentų dalių ID ("<doc_id>#<eilės nr.>"), tekstus ir metaduomenis.
+    Dalys gauna tėvinio dokumento filtravimo laukus, kad ir dalių paieška būtų filtruojama.
+    """
+    ids, texts, metadatas = [], [], []
+    for doc_id, data in records.items():
+        fields = filter_metadata(data, doc_type)
+        for position, text in enumerate(PART_GENERATORS[doc_type](data)):
+            ids.append(f"{doc_id}#{position}")
+            texts.append(text)
+            metadatas.append({"parent_id": doc_id, "document_type": doc_type, "position": position, **fields})
+    return ids, texts, metadatas
+
+
+def add_document_parts(records: Dict[str, Dict[str, Any]], doc_type: str, batch_size: int = EMBEDDING_BATCH_SIZE,
+                       upsert_chunk_size: int = UPSERT_CHUNK_SIZE) -> int:
+    """
+    Vektorizuoja dokumentų dalis ir įrašo jas į vaikinę kolekciją.
+    Seniau įrašytos to paties dokumento dalys pašalinamos, kad neliktų nebeegzistuojančių prekių.
+    Grąžina įrašytų dalių skaičių.
+    """
+    ids, texts, metadatas = build_document_parts(records, doc_type)
+    collection = get_parts_collection()
+    with metrics.timed("chroma_write", collection="parts"):
+        collection.delete(where={"$and": [{"parent_id": {"$in": list(records)}}, {"document_type": doc_type}]})
+    if not ids:
+        return 0
+
+    embeddings = encode_texts(texts, batch_size)
+    for start in range(0, len(ids), upsert_chunk_size):
+        with metrics.timed("chroma_write", collection="parts"):
+            collection.upsert(
+                documents=texts[start:start + upsert_chunk_size],
+                embeddings=embeddings[start:start + upsert_chunk_size],
+                ids=ids[start:start + upsert_chunk_size],
+                metadatas=metadatas[start:start + upsert_chunk_size]
+            )
+    return len(ids)
+
+
+def index_parts_from_collection(collection: "chromadb.api.models.Collection", doc_type: str,
+                                page_size: int = UPSERT_CHUNK_SIZE) -> int:
+    """
+    Sukuria dalių vektorius jau kolekcijoje esantiems dokumentams (iš 'json_data' metaduomenų).
+    Grąžina įrašytų dalių skaičių.
+    """
+    indexed = 0
+    offset = 0
+    while True:
+        page = collection.get(include=['metadatas'], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        records = {doc_id: json.loads(meta['json_data']) for doc_id, meta in zip(page['ids'], page['metadatas'])
+                   if meta and meta.get('json_data')}
+        indexed += add_document_parts(records, doc_type)
+        offset += page_size
+    return indexed
+
+
+def update_metadata_from_collection(collection: "chromadb.api.models.Collection", doc_type: str,
+                                    page_size: int = UPSERT_CHUNK_SIZE) -> int:
+    """
+    Papildo jau įkeltų dokumentų (ir jų dalių) metaduomenis filtravimo laukais iš 'json_data',
+    nevektorizuojant tekstų iš naujo. Grąžina atnaujintų dokumentų skaičių.
+    """
+    updated = 0
+    offset = 0
+    while True:
+        page = collection.get(include=['metadatas'], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        offset += page_size
+        records = {doc_id: json.loads(meta['json_data']) for doc_id, meta in zip(page['ids'], page['metadatas'])
+                   if meta and meta.get('json_data')}
+        if not records:
+            continue
+        with metrics.timed("chroma_write", collection=doc_type):
+            collection.update(ids=list(records),
+                              metadatas=[build_metadata(data, doc_type) for data in records.values()])
+        if MULTI_VECTOR_INDEX:
+            part_ids, _, part_metadatas = build_document_parts(records, doc_type)
+            # Neegzistuojančių dalių ID ChromaDB praleidžia (dalys galėjo būti dar nesukurtos)
+            for start in range(0, len(part_ids), page_size):
+                with metrics.timed("chroma_write", collection="parts"):
+                    get_parts_collection().update(ids=part_ids[start:start + page_size],
+                                                  metadatas=part_metadatas[start:start + page_size])
+        updated += len(records)
+    return updated
+
+def remove_from_collection(collection: "chromadb.api.models.Collection", ids, doc_type: str):
+    """
+    Pašalina ką tik įkeltus dokumentus, kurių nepavyko įrašyti į SQLite saugyklą:
+    kitaip kartojant jie būtų praleisti kaip jau esantys kolekcijoje.
+    """
+    try:
+        collection.delete(ids=list(ids))
+    except Exception as e:
+        print(f"   ⚠️ Nepavyko pašalinti {len(ids)} dokumentų iš kolekcijos ({doc_type}): {e}")
+
 # --- PAGRINDINĖ APDOROJIMO FUNKCIJA ---
 
-def process_and_add_document(file_path: str, collection: chromadb.api.models.Collection, doc_type: str, text_generator_func):
+def process_and_add_document(file_path: str, collection: "chromadb.api.models.Collection", doc_type: str, text_generator_func):
     """
     Nuskaito JSON failą, vektorizuoja, įkelia į nurodytą ChromaDB kolekciją ir pašalina JSON failą.
+    Grąžina True, jei dokumentas įkeltas.
     """
     file_name = os.path.basename(file_path)
     print(f"\n   ⚙️ Pradedamas apdoroti: {file_name}")
@@ -96,7 +392,7 @@ def process_and_add_document(file_path: str, collection: chromadb.api.models.Col
             if collection.get(ids=[doc_id])['ids']:
                 print(f"   ⏭️ Dokumentas {doc_id} ({doc_type}) jau egzistuoja kolekcijoje, praleidžiamas.")
                 # Nepašaliname, jei jis buvo tikrinamas anksčiau, bet neįkeltas
-                return
+                return False
         except KeyError:
             pass # Vykdome toliau, jei nerasta
 
@@ -106,74 +402,231 @@ def process_and_add_document(file_path: str, collection: chromadb.api.models.Col
 
         # Vektorizuojame tekstą
         print("   🧠 Generuojamas vektorius (Embedding)...")
-        embedding = model.encode(text_content).tolist()
+        embedding = encode_texts([text_content])[0]
         print(f"   ✅ Vektorius sugeneruotas (Dydis: {len(embedding)})")
 
         # Įkeliame į ChromaDB
-        collection.add(
-            documents=[text_content],
-            embeddings=[embedding],
-            ids=[doc_id],
-            metadatas=[{"json_data": json.dumps(data), "document_type": doc_type}]
-        )
+        with metrics.timed("chroma_write", collection=doc_type):
+            collection.add(
+                documents=[text_content],
+                embeddings=[embedding],
+                ids=[doc_id],
+                metadatas=[build_metadata(data, doc_type)]
+            )
+        try:
+            with metrics.timed("sqlite_write"):
+                get_structured_store().upsert_documents([(doc_id, doc_type, data)])
+        except Exception:
+            remove_from_collection(collection, [doc_id], doc_type)
+            raise
+        if MULTI_VECTOR_INDEX:
+            print(f"   🧩 Įkelta dokumento dalių: {add_document_parts({doc_id: data}, doc_type)}")
         print(f"   👍 Sėkmingai įkelta į ChromaDB: {file_name}")
 
         # Pašaliname sėkmingai įkeltą JSON failą
         os.remove(file_path)
         print(f"   🗑️ Originalus JSON failas '{file_name}' pašalintas.")
+        return True
 
     except Exception as e:
         print(f"   ❌ Klaida apdorojant {file_name} ({doc_type}): {e}")
+        return False
+
+def process_documents_batch(file_paths, collection: "chromadb.api.models.Collection", doc_type: str, text_generator_func,
+                            batch_size: int = EMBEDDING_BATCH_SIZE, upsert_chunk_size: int = UPSERT_CHUNK_SIZE) -> int:
+    """
+    Paketinis įkėlimas: vienas `get` užklausa egzistuojantiems ID patikrinti,
+    paketinis vektorizavimas (`model.encode(list, batch_size=N)`) ir dalimis vykdomas `upsert`.
+    Grąžina įkeltų dokumentų skaičių.
+    """
+    # 1. Nuskaitome visus JSON failus
+    documents = {}  # doc_id -> (file_path, data)
+    for file_path in file_paths:
+        file_name = os.path.basename(file_path)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"   ❌ Klaida skaitant {file_name} ({doc_type}): {e}")
+            continue
+        documents[file_name.replace('.json', '')] = (file_path, data)
+
+    if not documents:
+        return 0
+
+    records = {doc_id: data for doc_id, (_, data) in documents.items()}
+    added_ids = add_records(records, collection, doc_type, text_generator_func, batch_size, upsert_chunk_size)
+
+    # Pašaliname sėkmingai įkeltus JSON failus
+    for doc_id in added_ids:
+        os.remove(documents[doc_id][0])
+    return len(added_ids)
+
+
+def add_records(records: Dict[str, Dict[str, Any]], collection: "chromadb.api.models.Collection", doc_type: str,
+                text_generator_func, batch_size: int = EMBEDDING_BATCH_SIZE,
+                upsert_chunk_size: int = UPSERT_CHUNK_SIZE, failures: Dict[str, Any] = None):
+    """
+    Vektorizuoja ir įkelia jau nuskaitytus dokumentus ({doc_id: JSON duomenys}) į kolekciją.
+    Grąžina sėkmingai įkeltų dokumentų ID sąrašą (jau egzistuojantys praleidžiami).
+    Klaidingas dokumentas ar nepavykusi dalis nesustabdo viso paketo; jei nurodytas `failures` žodynas,
+    į jį įrašoma {doc_id: (klaida, 'permanent' | 'transient')}.
+    """
+    failures = {} if failures is None else failures
+
+    # 2. Vienu kvietimu patikriname, kurie dokumentai jau yra kolekcijoje
+    existing_ids = set(collection.get(ids=list(records), include=[])['ids'])
+    for doc_id in existing_ids:
+        print(f"   ⏭️ Dokumentas {doc_id} ({doc_type}) jau egzistuoja kolekcijoje, praleidžiamas.")
+
+    # 3. Kiekvieno dokumento tekstas ir metaduomenys kuriami atskirai: klaidingas JSON praleidžiamas
+    texts, metadatas = {}, {}
+    for doc_id in records:
+        if doc_id in existing_ids:
+            continue
+        try:
+            texts[doc_id] = text_generator_func(records[doc_id])
+            metadatas[doc_id] = build_metadata(records[doc_id], doc_type)
+        except Exception as e:
+            print(f"   ❌ Klaida kuriant dokumento {doc_id} ({doc_type}) tekstą: {e}")
+            texts.pop(doc_id, None)
+            failures[doc_id] = (e, "permanent")
+    new_ids = list(texts)
+    if not new_ids:
+        return []
+
+    # 4. Vektorizuojame ir įrašome dalimis
+    print(f"   🧠 Generuojami {len(new_ids)} vektoriai (paketo dydis: {batch_size})...")
+    added_ids = []
+    for start in range(0, len(new_ids), upsert_chunk_size):
+        chunk_ids = new_ids[start:start + upsert_chunk_size]
+        chunk_texts = [texts[doc_id] for doc_id in chunk_ids]
+        written = False
+        try:
+            embeddings = encode_texts(chunk_texts, batch_size)
+            with metrics.timed("chroma_write", collection=doc_type):
+                collection.upsert(
+                    documents=chunk_texts,
+                    embeddings=embeddings,
+                    ids=chunk_ids,
+                    metadatas=[metadatas[doc_id] for doc_id in chunk_ids]
+                )
+            written = True
+            with metrics.timed("sqlite_write"):
+                get_structured_store().upsert_documents([(doc_id, doc_type, records[doc_id]) for doc_id in chunk_ids])
+        except Exception as e:
+            print(f"   ❌ Klaida įkeliant {len(chunk_ids)} dokumentų dalį ({doc_type}): {e}")
+            if written:
+                remove_from_collection(collection, chunk_ids, doc_type)
+            failures.update((doc_id, (e, "transient")) for doc_id in chunk_ids)
+            continue
+        if MULTI_VECTOR_INDEX:
+            try:
+                add_document_parts({doc_id: records[doc_id] for doc_id in chunk_ids}, doc_type, batch_size)
+            except Exception as e:
+                # Santrauka jau įkelta; dalis galima atkurti su --index-parts
+                print(f"   ⚠️ Nepavyko įkelti dokumentų dalių ({doc_type}): {e}")
+
+        added_ids.extend(chunk_ids)
+        print(f"   👍 Įkelta į ChromaDB: {len(added_ids)}/{len(new_ids)}")
+
+    return added_ids
+
+
+def list_json_files(folder: str, label: str):
+    """
+    Grąžina aplanke esančių JSON failų kelius (arba tuščią sąrašą, jei aplanko nėra).
+    """
+    if not os.path.exists(folder):
+        print(f"Klaida: Aplankas '{folder}' nerastas. Praleidžiama.")
+        return []
+    json_files = [f for f in os.listdir(folder) if f.endswith('.json')]
+    print(f"Rasti {len(json_files)} {label} JSON failai apdorojimui.")
+    if not json_files:
+        print(f"Aplanke '{folder}' nerasta jokių naujų JSON failų.")
+    return [os.path.join(folder, f) for f in json_files]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="JSON dokumentų vektorizavimas ir įkėlimas į ChromaDB.")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE,
+                        help="Vektorizavimo paketo dydis (numatyta: %(default)s).")
+    parser.add_argument("--one-by-one", action="store_true",
+                        help="Apdoroti kiekvieną dokumentą atskirai (senasis režimas).")
+    parser.add_argument("--sync-structured-store", action="store_true",
+                        help="Užpildyti SQLite saugyklą ir leksinį (FTS5) indeksą iš jau ChromaDB esančių dokumentų ir baigti darbą.")
+    parser.add_argument("--index-parts", action="store_true",
+                        help="Sukurti prekių ir sutarčių dalių vektorius jau įkeltiems dokumentams ir baigti darbą.")
+    parser.add_argument("--update-metadata", action="store_true",
+                        help="Papildyti jau įkeltų dokumentų metaduomenis filtravimo laukais (įmonių kodai, datos, "
+                             "suma) ir baigti darbą.")
+    return parser.parse_args(argv)
 
 # --- MAIN FUNKCIJA ---
 
-def main():
+def main(argv=None):
     """
     Pagrindinė funkcija, kuri apdoroja sąskaitas ir sutartis atskirai.
     """
-    # 1. Apdorojame SĄSKAITAS FAKTŪRAS
-    print("\n--- 3. PRADEDAMAS SĄSKAITŲ FAKTŪRŲ (Invoices) APDOROJIMAS ---")
-    if not os.path.exists(INVOICES_FOLDER):
-        print(f"Klaida: Aplankas '{INVOICES_FOLDER}' nerastas. Praleidžiama.")
-    else:
-        invoice_files = [f for f in os.listdir(INVOICES_FOLDER) if f.endswith('.json')]
-        print(f"Rasti {len(invoice_files)} sąskaitų faktūrų JSON failai apdorojimui.")
-        if not invoice_files:
-            print(f"Aplanke '{INVOICES_FOLDER}' nerasta jokių naujų JSON failų.")
-        else:
-            for json_file in invoice_files:
-                file_path = os.path.join(INVOICES_FOLDER, json_file)
-                process_and_add_document(
-                    file_path,
-                    invoice_collection,
-                    "invoice",
-                    create_invoice_text_representation
-                )
+    args = parse_args(argv)
+    invoice_collection, contract_collection = get_collections()
 
-    # 2. Apdorojame SUTARTIS
-    print("\n--- 4. PRADEDAMAS SUTARČIŲ (Contracts) APDOROJIMAS ---")
-    if not os.path.exists(CONTRACTS_FOLDER):
-        print(f"Klaida: Aplankas '{CONTRACTS_FOLDER}' nerastas. Praleidžiama.")
-    else:
-        contract_files = [f for f in os.listdir(CONTRACTS_FOLDER) if f.endswith('.json')]
-        print(f"Rasti {len(contract_files)} sutarčių JSON failai apdorojimui.")
-        if not contract_files:
-            print(f"Aplanke '{CONTRACTS_FOLDER}' nerasta jokių naujų JSON failų.")
+    if args.sync_structured_store:
+        print("\n--- SQLITE SAUGYKLOS SINCHRONIZAVIMAS IŠ CHROMADB ---")
+        print(f"Sąskaitų: {get_structured_store().sync_from_collection(invoice_collection, 'invoice')}")
+        print(f"Sutarčių: {get_structured_store().sync_from_collection(contract_collection, 'contract')}")
+        return
+
+    if args.index_parts:
+        print("\n--- DOKUMENTŲ DALIŲ (MULTI-VECTOR) INDEKSAVIMAS ---")
+        print(f"Sąskaitų prekių: {index_parts_from_collection(invoice_collection, 'invoice')}")
+        print(f"Sutarčių dalių: {index_parts_from_collection(contract_collection, 'contract')}")
+        bump_collection_version()
+        return
+
+    if args.update_metadata:
+        print("\n--- FILTRAVIMO METADUOMENŲ ATNAUJINIMAS ---")
+        print(f"Sąskaitų: {update_metadata_from_collection(invoice_collection, 'invoice')}")
+        print(f"Sutarčių: {update_metadata_from_collection(contract_collection, 'contract')}")
+        bump_collection_version()
+        return
+
+    jobs = [
+        ("3. PRADEDAMAS SĄSKAITŲ FAKTŪRŲ (Invoices) APDOROJIMAS", INVOICES_FOLDER, "sąskaitų faktūrų",
+         invoice_collection, "invoice", create_invoice_text_representation),
+        ("4. PRADEDAMAS SUTARČIŲ (Contracts) APDOROJIMAS", CONTRACTS_FOLDER, "sutarčių",
+         contract_collection, "contract", create_contract_text_representation),
+    ]
+
+    added = 0
+    for title, folder, label, collection, doc_type, text_generator_func in jobs:
+        print(f"\n--- {title} ---")
+        file_paths = list_json_files(folder, label)
+        if not file_paths:
+            continue
+        if args.one_by_one:
+            for file_path in file_paths:
+                added += bool(process_and_add_document(file_path, collection, doc_type, text_generator_func))
         else:
-            for json_file in contract_files:
-                file_path = os.path.join(CONTRACTS_FOLDER, json_file)
-                process_and_add_document(
-                    file_path,
-                    contract_collection,
-                    "contract",
-                    create_contract_text_representation
-                )
+            added += process_documents_batch(file_paths, collection, doc_type, text_generator_func,
+                                             batch_size=args.batch_size)
+
+    # Pranešame app_local.py, kad kolekcijų turinys pasikeitė (invaliduojamas atsakymų podėlis)
+    if added:
+        bump_collection_version()
 
     print("\n" + "="*50)
     print("--- VISŲ FAILŲ APDOROJIMAS BAIGTAS. ---")
     print(f"Iš viso sąskaitų kolekcijoje: {invoice_collection.count()}")
     print(f"Iš viso sutarčių kolekcijoje: {contract_collection.count()}")
+    if MULTI_VECTOR_INDEX:
+        print(f"Iš viso dokumentų dalių: {get_parts_collection().count()}")
+    if embedding_cache is not None:
+        cache_stats = embedding_cache.stats()
+        print(f"Vektorių podėlis: paimta {cache_stats['hits']}, apskaičiuota {cache_stats['misses']} "
+              f"(iš viso podėlyje: {cache_stats['entries']})")
     print("="*50)
+    metrics.print_summary("VEKTORIZAVIMO METRIKOS")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+
+# --- NUSTATYMAI ---
+
+# Struktūrizuotas žurnalas: kiekvienas išmatuotas etapas ir įvykis išvedamas viena JSON eilute į stderr
+METRICS_JSON_LOG = os.getenv("METRICS_JSON_LOG", "0") == "1"
+# Metrikų pavadinimų priešdėlis /metrics išvestyje
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "docqa_")
+# Histogramų ribos: etapų trukmė (sekundėmis) ir raginimų dydis (žetonais)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+# Kiek vidutiniškai simbolių tenka vienam žetonui; lietuviškam tekstui llama3 žetonų būna daugiau,
+# todėl reikšmę verta pakoreguoti pagal Ollama grąžinamą prompt_eval_count (žr. /ask atsakymo 'usage')
+CHARS_PER_TOKEN = float(os.getenv("METRICS_CHARS_PER_TOKEN", "4"))
+
+HELP = {
+    "stage_duration_seconds": "Etapo trukmė (pdfplumber, Gemini, vektorizavimas, ChromaDB, Ollama ir kt.).",
+    "llm_first_token_seconds": "Laikas iki pirmojo srautinio atsakymo žetono.",
+    "prompt_tokens": "Į LLM siunčiamo raginimo dydis žetonais (įvertis, žr. CHARS_PER_TOKEN).",
+    "prompts_total": "Į LLM išsiųstų raginimų skaičius.",
+    "prompt_characters_total": "Į LLM išsiųstų raginimų simbolių suma.",
+    "prompt_tokens_total": "Į LLM išsiųstų raginimų žetonų suma (įvertis).",
+    "llm_prompt_eval_tokens_total": "Ollama apdorotų raginimo žetonų suma (prompt_eval_count).",
+    "llm_prompt_eval_seconds": "Ollama raginimo apdorojimo (prompt eval) trukmė.",
+    "metadata_filters_total": "Klausimai su datų ar įmonių filtru (applied) ir be rezultatų atšaukti filtrai (fallback).",
+    "context_documents_total": "Konteksto dokumentai pagal rezultatą (full, compact, duplicate, over_budget).",
+    "cache_lookups_total": "Podėlių paieškos pagal rezultatą (hit/miss).",
+    "retries_total": "Pakartoti kvietimai ir taisymo raginimai.",
+    "errors_total": "Išorinių kvietimų klaidos pagal rūšį.",
+    "answers_total": "/ask atsakymai pagal šaltinį (structured, cache, llm, no_documents).",
+    "embedded_texts_total": "Modeliu vektorizuotų tekstų skaičius.",
+    "preclassified_total": "Dokumentai, kurių tipas nustatytas pagal raktinius žodžius (be Gemini).",
+}
+
+
+def estimate_tokens(text):
+    """
+    Apytiksliai įvertina žetonų skaičių (~CHARS_PER_TOKEN simbolių vienam žetonui).
+    """
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+class Histogram:
+    """
+    Kaupiamoji histograma (Prometheus formatu): kiekvienos ribos stebėjimų skaičius, suma ir maksimumas.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    Gijoms saugūs proceso skaitikliai, matuokliai (gauges) ir histogramos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (pavadinimas, žymės) -> reikšmė
+        self._gauges = {}      # (pavadinimas, žymės) -> reikšmė
+        self._histograms = {}  # (pavadinimas, žymės) -> Histogram
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timed(self, stage, **labels):
+        """
+        Išmatuoja bloko (arba, naudojant kaip dekoratorių, funkcijos) trukmę etapo histogramoje.
+        Klaidos atveju trukmė užregistruojama su žyme outcome="error".
+        """
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe("stage_duration_seconds", elapsed, stage=stage, outcome=outcome, **labels)
+            log_event("stage", stage=stage, outcome=outcome, duration_ms=round(elapsed * 1000, 3), **labels)
+
+    def stage_summary(self):
+        """
+        Grąžina [(etapas, kvietimų skaičius, bendra trukmė s, vidurkis ms, maksimumas ms)], ilgiausi - pirmi.
+        """
+        stages = {}
+        with self._lock:
+            for (name, label_key), histogram in self._histograms.items():
+                if name != "stage_duration_seconds":
+                    continue
+                stage = dict(label_key)["stage"]
+                total = stages.setdefault(stage, [0, 0.0, 0.0])
+                total[0] += histogram.count
+                total[1] += histogram.sum
+                total[2] = max(total[2], histogram.max)
+        rows = [(stage, count, seconds, seconds / count * 1000 if count else 0.0, maximum * 1000)
+                for stage, (count, seconds, maximum) in stages.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def counters(self, name):
+        """
+        Grąžina {žymės: reikšmė} nurodytam skaitikliui.
+        """
+        with self._lock:
+            return {label_key: value for (counter_name, label_key), value in self._counters.items()
+                    if counter_name == name}
+
+    def render_prometheus(self, prefix=METRICS_PREFIX):
+        """
+        Visos metrikos Prometheus tekstiniu formatu (/metrics).
+        """
+        lines = []
+        with self._lock:
+            for metric_type, values in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({name for name, _ in values}):
+                    full_name = prefix + name
+                    if name in HELP:
+                        lines.append(f"# HELP {full_name} {HELP[name]}")
+                    lines.append(f"# TYPE {full_name} {metric_type}")
+                    for (metric_name, label_key), value in sorted(values.items()):
+                        if metric_name == name:
+                            lines.append(f"{full_name}{_format_labels(label_key)} {value}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                full_name = prefix + name
+                if name in HELP:
+                    lines.append(f"# HELP {full_name} {HELP[name]}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for (metric_name, label_key), histogram in sorted(self._histograms.items()):
+                    if metric_name != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{full_name}_bucket{_format_labels(label_key, [('le', bound)])} {count}")
+                    lines.append(f"{full_name}_bucket{_format_labels(label_key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{full_name}_sum{_format_labels(label_key)} {histogram.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(label_key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Bendras proceso registras
+REGISTRY = MetricsRegistry()
+increment = REGISTRY.increment
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+timed = REGISTRY.timed
+render_prometheus = REGISTRY.render_prometheus
+
+
+def log_event(event, **fields):
+    """
+    Struktūrizuoto žurnalo įrašas (tik įjungus METRICS_JSON_LOG).
+    """
+    if not METRICS_JSON_LOG:
+        return
+    record = {"ts": round(time.time(), 3), "event": event, **fields}
+    print(json.dumps(record, ensure_ascii=False, default=str), file=sys.stderr, flush=True)
+
+
+def record_prompt(target, prompt):
+    """
+    Užregistruoja į LLM (`target`: 'gemini' arba 'ollama') siunčiamo raginimo simbolius ir žetonus.
+    Grąžina žetonų įvertį.
+    """
+    tokens = estimate_tokens(prompt)
+    increment("prompts_total", target=target)
+    increment("prompt_characters_total", len(prompt), target=target)
+    increment("prompt_tokens_total", tokens, target=target)
+    observe("prompt_tokens", tokens, buckets=TOKEN_BUCKETS, target=target)
+    log_event("prompt", target=target, characters=len(prompt), tokens=tokens)
+    return tokens
+
+
+def record_cache_lookup(cache, hit, count=1):
+    """
+    Podėlio paieškos rezultatas ('extraction', 'embedding', 'answer').
+    """
+    if count:
+        increment("cache_lookups_total", count, cache=cache, result="hit" if hit else "miss")
+
+
+def print_summary(title="METRIKŲ SUVESTINĖ"):
+    """
+    Atspausdina paleidimo suvestinę: etapų trukmės, raginimų dydžiai, podėlių pataikymai ir pakartojimai.
+    """
+    rows = REGISTRY.stage_summary()
+    if not rows:
+        return
+    print("\n" + "=" * 72)
+    print(f"--- {title} ---")
+    print(f"{'etapas':<24} | {'kvietimai':>9} | {'viso s':>9} | {'vid. ms':>9} | {'maks. ms':>9}")
+    print("-" * 72)
+    for stage, count, seconds, mean_ms, max_ms in rows:
+        print(f"{stage:<24} | {count:>9} | {seconds:>9.2f} | {mean_ms:>9.1f} | {max_ms:>9.1f}")
+
+    prompts = REGISTRY.counters("prompts_total")
+    tokens = REGISTRY.counters("prompt_tokens_total")
+    for label_key, count in sorted(prompts.items()):
+        print(f"Raginimai ({dict(label_key)['target']}): {count}, ~{tokens.get(label_key, 0)} žetonų")
+
+    lookups = {}
+    for label_key, count in REGISTRY.counters("cache_lookups_total").items():
+        labels = dict(label_key)
+        lookups.setdefault(labels["cache"], {"hit": 0, "miss": 0})[labels["result"]] += count
+    for cache, result in sorted(lookups.items()):
+        total = result["hit"] + result["miss"]
+        print(f"Podėlis ({cache}): pataikymai {result['hit']} iš {total} ({result['hit'] / total:.0%})")
+
+    for name, label in (("retries_total", "Pakartojimai"), ("errors_total", "Klaidos")):
+        for label_key, count in sorted(REGISTRY.counters(name).items()):
+            print(f"{label} ({', '.join(f'{key}={value}' for key, value in label_key)}): {count}")
+    print("=" * 72)
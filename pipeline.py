@@ -0,0 +1,421 @@
+import os
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import ai_pdf_to_json
+import main as vectorizer
+from collection_version import bump_collection_version
+from extraction_cache import ExtractionCache, hash_pdf_file
+from job_queue import JobQueue, CLASSIFIED, EXTRACTED, EMBEDDED, FAILED
+
+# --- NUSTATYMAI ---
+
+# Kiek procesų ištraukia tekstą iš PDF (CPU darbas)
+PIPELINE_EXTRACT_WORKERS = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "2"))
+# Kiek Gemini užklausų vykdoma vienu metu
+PIPELINE_LLM_CONCURRENCY = int(os.getenv("PIPELINE_LLM_CONCURRENCY", "4"))
+# Kiek dokumentų vektorizuojama vienu paketu
+PIPELINE_EMBED_BATCH_SIZE = int(os.getenv("PIPELINE_EMBED_BATCH_SIZE", "32"))
+# Eilių tarp etapų dydis: pilna eilė sustabdo ankstesnį etapą (backpressure)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+# Kiek laukiama papildomų dokumentų prieš vektorizuojant nepilną paketą (sekundėmis)
+PIPELINE_BATCH_WAIT = float(os.getenv("PIPELINE_BATCH_WAIT", "0.5"))
+# Kiek ilgiausiai laukiama atidėtų pakartojimų prieš baigiant darbą (likę bus paimti kito paleidimo metu)
+PIPELINE_RETRY_WAIT = float(os.getenv("PIPELINE_RETRY_WAIT", "120"))
+
+# Eilės pabaigos žymė
+_DONE = object()
+
+
+class DocumentJob:
+    """
+    Vieno PDF dokumento būsena keliaujant per etapus.
+    """
+
+    def __init__(self, pdf_path, doc_type=None, data=None):
+        self.pdf_path = pdf_path
+        self.doc_id = os.path.splitext(os.path.basename(pdf_path))[0]
+        self.started_at = time.monotonic()
+        self.sample_text = ""
+        self.full_text = ""
+        # Atkuriami iš darbų eilės, jei ankstesnis paleidimas jau atliko šiuos etapus
+        self.doc_type = doc_type
+        self.data = data
+
+
+class Pipeline:
+    """
+    Vieno proceso dokumentų apdorojimo grandinė: PDF -> tekstas -> Gemini -> vektorius -> ChromaDB.
+    Etapai sujungti ribotomis eilėmis, todėl kiekvienas dokumentas keliauja toliau iškart, kai yra paruoštas,
+    o lėtas etapas natūraliai pristabdo ankstesnius.
+    Jei perduota `jobs` (JobQueue), kiekvieno dokumento būsena išsaugoma po kiekvieno etapo,
+    o nepavykę dokumentai kartojami vėliau (žr. job_queue.py).
+    """
+
+    def __init__(self, extract_workers=PIPELINE_EXTRACT_WORKERS, llm_concurrency=PIPELINE_LLM_CONCURRENCY,
+                 embed_batch_size=PIPELINE_EMBED_BATCH_SIZE, queue_size=PIPELINE_QUEUE_SIZE,
+                 batch_wait=PIPELINE_BATCH_WAIT, jobs=None):
+        self.jobs = jobs
+        self.extract_workers = extract_workers
+        self.llm_concurrency = llm_concurrency
+        self.embed_batch_size = embed_batch_size
+        self.batch_wait = batch_wait
+        self.input_queue = queue.Queue()
+        self.llm_queue = queue.Queue(maxsize=queue_size)
+        self.embed_queue = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self.stats = {"extracted": 0, "extracted_llm": 0, "embedded": 0, "saved_as_json": 0, "failed": 0,
+                      "retry_later": 0}
+        self.latencies = []
+        # Kiek dokumentų paimta paskutinio run() kvietimo metu
+        self.last_run_documents = 0
+        # Vektorizavimo gijos klaida: ją nustačius ankstesni etapai nebelaukia prie pilnos eilės
+        self._embed_error = None
+        self._embedder_stopped = threading.Event()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _advance(self, job, state):
+        if self.jobs:
+            self.jobs.advance(job.pdf_path, state, job.doc_type, job.data if state == EXTRACTED else None)
+
+    def _fail(self, job, error, kind):
+        """
+        Užregistruoja nesėkmę: be darbų eilės dokumentas tiesiog lieka aplanke kitam paleidimui.
+        """
+        metrics.log_event("job_failed", pdf_path=job.pdf_path, kind=kind, error=str(error))
+        if self.jobs and self.jobs.fail(job.pdf_path, error, kind) != FAILED:
+            self._count("retry_later")
+            metrics.increment("retries_total", stage="pipeline", kind=kind)
+        else:
+            self._count("failed")
+
+    def _put_embed(self, job):
+        """
+        Perduoda dokumentą vektorizavimui. Jei vektorizavimo gija nebeveikia, dokumentas pažymimas nepavykusiu,
+        užuot amžinai laukus vietos pilnoje eilėje.
+        """
+        while not self._embedder_stopped.is_set():
+            try:
+                self.embed_queue.put(job, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        if job is not _DONE:
+            self._fail(job, f"Vektorizavimo etapas sustojo: {self._embed_error!r}", "transient")
+
+    # --- 1 ETAPAS: TEKSTO IŠTRAUKIMAS ---
+
+    def _extract_worker(self, extract_pool):
+        while True:
+            job = self.input_queue.get()
+            if job is _DONE:
+                return
+            if job.data is not None or self._embedder_stopped.is_set():
+                # Duomenys jau ištraukti ankstesnio paleidimo metu - liko tik įkėlimas
+                # (sustojus vektorizavimui dokumentas iškart pažymimas kartoti vėliau)
+                self._put_embed(job)
+                continue
+            try:
+                # Puslapiai analizuojami kitame procese (jo metrikos čia nematomos), todėl matuojame visą laukimą
+                with metrics.timed("pdf_text"):
+                    job.sample_text, job.full_text = extract_pool.submit(
+                        ai_pdf_to_json.extract_texts_for_pipeline, job.pdf_path).result()
+            except Exception as e:
+                print(f"Klaida ištraukiant tekstą iš PDF '{job.pdf_path}': {e}")
+                self._fail(job, e, "transient")
+                continue
+            if not job.sample_text:
+                print(f"Tekstas iš '{os.path.basename(job.pdf_path)}' neišgautas. Praleidžiama.")
+                self._fail(job, "Tekstas neišgautas", "permanent")
+                continue
+            self._count("extracted")
+            self.llm_queue.put(job)
+
+    # --- 2 ETAPAS: KLASIFIKAVIMAS IR DUOMENŲ IŠTRAUKIMAS SU AI ---
+
+    def _llm_worker(self):
+        while True:
+            job = self.llm_queue.get()
+            if job is _DONE:
+                return
+            if self._embedder_stopped.is_set():
+                # Įkelti nebėra kur - Gemini nekviečiamas, dokumentas bus kartojamas vėliau
+                self._put_embed(job)
+                continue
+            try:
+                self._classify_and_extract(job)
+            except ai_pdf_to_json.AIRequestError as e:
+                self._fail(job, e, e.kind)
+                continue
+            except Exception as e:
+                print(f"Klaida apdorojant '{job.pdf_path}' su AI: {e}")
+                self._fail(job, e, "transient")
+                continue
+            finally:
+                # Tekstas toliau nereikalingas - atlaisviname atmintį
+                job.sample_text = job.full_text = None
+            if not job.data:
+                continue
+            self._count("extracted_llm")
+            self._put_embed(job)
+
+    def _classify_and_extract(self, job):
+        """
+        Klasifikuoja (jei tipas dar nežinomas) ir ištraukia duomenis, išsaugodama būseną po kiekvieno žingsnio.
+        Su darbų eile API klaidos iškeliamos (AIRequestError), kad būtų galima nuspręsti, ar kartoti.
+        """
+        raise_errors = self.jobs is not None
+        pdf_sha256 = hash_pdf_file(job.pdf_path) if ai_pdf_to_json.EXTRACTION_CACHE else None
+        if job.doc_type is None:
+            job.doc_type = ai_pdf_to_json.classify_pdf(job.pdf_path, job.sample_text, pdf_sha256, raise_errors,
+                                                       allow_single_call=ai_pdf_to_json.EXTRACTION_MODE == "single")
+            if job.doc_type is None:
+                # Tipas neaiškus - jis nustatomas tame pačiame kvietime kaip ir duomenys
+                job.doc_type, job.data = ai_pdf_to_json.extract_and_classify_pdf(
+                    job.pdf_path, job.full_text, pdf_sha256, raise_errors)
+            if job.doc_type == "unknown":
+                print(f"❌ Nepavyko nustatyti dokumento tipo: {os.path.basename(job.pdf_path)}.")
+                job.doc_type = None
+                self._fail(job, "Dokumento tipas nenustatytas", "permanent")
+                return
+            self._advance(job, CLASSIFIED)
+
+        if job.data is None:
+            job.data = ai_pdf_to_json.extract_pdf_data(job.pdf_path, job.doc_type, job.full_text, pdf_sha256,
+                                                       raise_errors)
+        if not job.data:
+            print(f"❌ Nepavyko išgauti struktūrizuotų duomenų iš: {os.path.basename(job.pdf_path)}.")
+            self._fail(job, "Duomenys neišgauti", "transient")
+            return
+        self._advance(job, EXTRACTED)
+
+    # --- 3 ETAPAS: VEKTORIZAVIMAS IR ĮKĖLIMAS Į CHROMADB ---
+
+    def _next_batch(self):
+        """
+        Surenka iki `embed_batch_size` dokumentų; nepilnas paketas siunčiamas po `batch_wait` sekundžių.
+        Grąžina (paketas, ar eilė baigėsi).
+        """
+        batch = []
+        job = self.embed_queue.get()
+        if job is _DONE:
+            return batch, True
+        batch.append(job)
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.embed_batch_size:
+            try:
+                job = self.embed_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is _DONE:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _embed_worker(self):
+        try:
+            collections = dict(zip(("invoice", "contract"), vectorizer.get_collections()))
+            finished = False
+            while not finished:
+                batch, finished = self._next_batch()
+                for doc_type, collection in collections.items():
+                    jobs = {job.doc_id: job for job in batch if job.doc_type == doc_type}
+                    if jobs:
+                        self._store_jobs(jobs, collection, doc_type)
+        except BaseException as e:
+            # get_collections() nepavykus kviečia exit(), todėl gaudomas ir SystemExit
+            print(f"❌ Vektorizavimo etapas sustojo: {e!r}")
+            self._embed_error = e
+            self._embedder_stopped.set()
+
+    def _store_jobs(self, jobs, collection, doc_type):
+        error = None
+        failures = {}
+        try:
+            added_ids = set(vectorizer.add_records(
+                {doc_id: job.data for doc_id, job in jobs.items()}, collection, doc_type,
+                vectorizer.TEXT_GENERATORS[doc_type], batch_size=self.embed_batch_size, failures=failures))
+        except Exception as e:
+            print(f"   ❌ Klaida vektorizuojant {len(jobs)} dokumentų paketą ({doc_type}): {e}")
+            added_ids = set()
+            error = e
+
+        for doc_id, job in jobs.items():
+            try:
+                if doc_id in added_ids:
+                    self._advance(job, EMBEDDED)
+                    os.remove(job.pdf_path)
+                    self._count("embedded")
+                elif self.jobs:
+                    # Ištraukti duomenys lieka eilėje: kartojant Gemini nekviečiamas
+                    if error is not None:
+                        self._fail(job, error, "transient")
+                    elif doc_id in failures:
+                        self._fail(job, *failures[doc_id])
+                    else:
+                        self._fail(job, f"Dokumentas {doc_id} jau yra kolekcijoje", "permanent")
+                else:
+                    # Neįkeltus dokumentus išsaugome JSON faile, kad juos vėliau paimtų main.py
+                    ai_pdf_to_json.save_document_json(job.pdf_path, doc_type, job.data)
+                    self._count("saved_as_json")
+            except Exception as e:
+                # Vieno dokumento klaida neturi sustabdyti vektorizavimo gijos
+                print(f"   ❌ Klaida baigiant dokumentą {doc_id}: {e}")
+                self._fail(job, e, "transient")
+            with self._stats_lock:
+                self.latencies.append(time.monotonic() - job.started_at)
+
+    # --- PALEIDIMAS ---
+
+    def run(self, pdf_input_folder):
+        """
+        Apdoroja visus aplanko PDF failus ir grąžina statistiką.
+        """
+        self.last_run_documents = 0
+        self._embed_error = None
+        self._embedder_stopped.clear()
+        if self.jobs:
+            # Ištrintų PDF darbai pamirštami net ir tada, kai aplanko ar PDF failų nebėra
+            self.jobs.forget_missing()
+        if not os.path.exists(pdf_input_folder):
+            print(f"Informacija: Aplankas '{pdf_input_folder}' nerastas. Praleidžiama.")
+            return self.stats
+        pdf_files = [f for f in os.listdir(pdf_input_folder) if f.endswith('.pdf')]
+        if not pdf_files:
+            print(f"Aplanke '{pdf_input_folder}' nerasta jokių PDF failų.")
+            return self.stats
+
+        pdf_paths = [os.path.join(pdf_input_folder, pdf_file) for pdf_file in pdf_files]
+        if self.jobs:
+            # Imamas tik nebaigtas darbas, kurio kito bandymo laikas jau atėjo
+            self.jobs.add(pdf_paths)
+            documents = [DocumentJob(path, doc_type, data) for path, state, doc_type, data in self.jobs.outstanding()]
+            if not documents:
+                print("Nebaigtų dokumentų, paruoštų apdoroti, nėra.")
+                return self.stats
+        else:
+            documents = [DocumentJob(path) for path in pdf_paths]
+
+        self.last_run_documents = len(documents)
+        print(f"Grandinė: {len(documents)} PDF, procesai={self.extract_workers}, AI užklausos={self.llm_concurrency}, "
+              f"vektorizavimo paketas={self.embed_batch_size}")
+        started = time.monotonic()
+
+        for document in documents:
+            self.input_queue.put(document)
+        for _ in range(self.extract_workers):
+            self.input_queue.put(_DONE)
+
+        with ProcessPoolExecutor(max_workers=self.extract_workers) as extract_pool:
+            extractors = [threading.Thread(target=self._extract_worker, args=(extract_pool,), daemon=True)
+                          for _ in range(self.extract_workers)]
+            llm_workers = [threading.Thread(target=self._llm_worker, daemon=True) for _ in range(self.llm_concurrency)]
+            embedder = threading.Thread(target=self._embed_worker, daemon=True)
+            for thread in extractors + llm_workers + [embedder]:
+                thread.start()
+
+            # Etapai baigiami paeiliui: kiekvienas gauna pabaigos žymę, kai ankstesnis etapas baigė darbą
+            for thread in extractors:
+                thread.join()
+            for _ in llm_workers:
+                self.llm_queue.put(_DONE)
+            for thread in llm_workers:
+                thread.join()
+            self._put_embed(_DONE)
+            embedder.join()
+
+        if self.stats["embedded"]:
+            bump_collection_version()
+        if self._embed_error is not None:
+            # Dokumentai, likę eilėje sustojus vektorizavimui, bus kartojami kito paleidimo metu
+            while True:
+                try:
+                    job = self.embed_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not _DONE:
+                    self._fail(job, f"Vektorizavimo etapas sustojo: {self._embed_error!r}", "transient")
+            raise RuntimeError(f"Vektorizavimo etapas sustojo: {self._embed_error!r}") from self._embed_error
+
+        self.stats["seconds"] = self.stats.get("seconds", 0.0) + time.monotonic() - started
+        return self.stats
+
+    def print_summary(self):
+        stats = self.stats
+        latencies = sorted(self.latencies)
+        print("\n" + "=" * 50)
+        print("--- GRANDINĖS SUVESTINĖ ---")
+        print(f"Ištraukta tekstų: {stats['extracted']}, apdorota su AI: {stats['extracted_llm']}")
+        print(f"Įkelta į ChromaDB: {stats['embedded']}, išsaugota JSON: {stats['saved_as_json']}, "
+              f"nepavyko: {stats['failed']}, bus kartojama: {stats['retry_later']}")
+        if self.jobs:
+            print(f"Darbų eilė: {self.jobs.stats()}")
+        if latencies:
+            print(f"Dokumento kelias nuo PDF iki ChromaDB: mediana {latencies[len(latencies) // 2]:.2f} s, "
+                  f"ilgiausias {latencies[-1]:.2f} s")
+        if "seconds" in stats:
+            print(f"Bendra trukmė: {stats['seconds']:.1f} s")
+        print("=" * 50)
+        metrics.print_summary("GRANDINĖS METRIKOS")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Vieno proceso dokumentų apdorojimo grandinė (PDF -> ChromaDB).")
+    parser.add_argument("--extract-workers", type=int, default=PIPELINE_EXTRACT_WORKERS)
+    parser.add_argument("--llm-concurrency", type=int, default=PIPELINE_LLM_CONCURRENCY)
+    parser.add_argument("--embed-batch-size", type=int, default=PIPELINE_EMBED_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE)
+    parser.add_argument("--rpm", type=int, default=ai_pdf_to_json.GEMINI_REQUESTS_PER_MINUTE,
+                        help="Gemini užklausų limitas per minutę (0 - neribojama).")
+    parser.add_argument("--no-cache", action="store_true", help="Nenaudoti AI rezultatų podėlio.")
+    parser.add_argument("--no-jobs", action="store_true",
+                        help="Nenaudoti pastovios darbų eilės (nepavykę dokumentai tiesiog lieka aplanke).")
+    parser.add_argument("--retry-wait", type=float, default=PIPELINE_RETRY_WAIT,
+                        help="Kiek sekundžių laukti atidėtų pakartojimų prieš baigiant darbą.")
+    parser.add_argument("--list-failed", action="store_true", help="Parodyti nepavykusių dokumentų sąrašą ir baigti.")
+    parser.add_argument("--requeue-failed", action="store_true",
+                        help="Grąžinti nepavykusius dokumentus į eilę prieš paleidžiant grandinę.")
+    return parser.parse_args(argv)
+
+
+def run_pipeline(args):
+    """
+    Paleidžia grandinę pagal komandinės eilutės parametrus ir grąžina statistiką.
+    """
+    ai_pdf_to_json.ensure_folders()
+    ai_pdf_to_json.RATE_LIMITER = ai_pdf_to_json.RateLimiter(args.rpm)
+    if not args.no_cache and ai_pdf_to_json.EXTRACTION_CACHE is None:
+        ai_pdf_to_json.EXTRACTION_CACHE = ExtractionCache()
+
+    jobs = None if args.no_jobs else JobQueue()
+    if jobs and args.list_failed:
+        for pdf_path, kind, error, attempts in jobs.dead_letters():
+            print(f"❌ {pdf_path} ({kind}, bandymų: {attempts}): {error}")
+        return jobs.stats()
+    if jobs and args.requeue_failed:
+        print(f"Į eilę grąžinta nepavykusių dokumentų: {jobs.requeue_failed()}")
+
+    pipeline = Pipeline(args.extract_workers, args.llm_concurrency, args.embed_batch_size, args.queue_size,
+                        jobs=jobs)
+    stats = pipeline.run(ai_pdf_to_json.PDF_FOLDER_DOCUMENTS)
+    # Atidėti pakartojimai, kurie sueina per --retry-wait, atliekami dar šio paleidimo metu
+    while jobs and (delay := jobs.next_attempt_in()) is not None and delay <= args.retry_wait:
+        print(f"⏳ Kitas pakartojimas po {delay:.0f} s...")
+        time.sleep(delay)
+        stats = pipeline.run(ai_pdf_to_json.PDF_FOLDER_DOCUMENTS)
+        if not pipeline.last_run_documents:
+            # Nieko neapdorota (pvz., eilėje likę dokumentai ne šiame aplanke) - kartoti nėra prasmės
+            break
+    pipeline.print_summary()
+    return stats
+
+
+if __name__ == "__main__":
+    run_pipeline(parse_args())
@@ -0,0 +1,275 @@
+import re
+import datetime
+
+# Lietuviškų mėnesių pavadinimų šaknys (tinka visiems linksniams: "spalio", "spalį", "spalis")
+MONTH_STEMS = [
+    ("saus", 1), ("vasar", 2), ("kov", 3), ("baland", 4), ("geguž", 5), ("biržel", 6),
+    ("liep", 7), ("rugpjū", 8), ("rugsėj", 9), ("spal", 10), ("lapkri", 11), ("gruod", 12),
+]
+# Metai prieš mėnesį ("2025 spalio", "2025 m. spalio", "2025 metų spalio") arba po jo ("spalio 2025")
+MONTH_PATTERN = re.compile(r'(?:\b(20\d{2})\s*(?:m\.|met\w*|m\b)?\s*)?\b('
+                           + '|'.join(stem for stem, _ in MONTH_STEMS) + r')\w*(?:\s+(20\d{2}))?')
+ISO_DATE_PATTERN = re.compile(r'\b(20\d{2})-(\d{1,2})-(\d{1,2})\b')
+YEAR_MONTH_PATTERN = re.compile(r'\b(20\d{2})-(\d{1,2})\b(?!-)')
+COMPANY_CODE_PATTERN = re.compile(r'\b\d{7,9}\b')
+# Dokumento numeris: žodis po "Nr." arba žodis su raidėmis ir skaitmenimis (pvz., "MAČ-1922", "BENCH-3")
+# ("2025m." - metai, ne numeris)
+DOCUMENT_NUMBER_PATTERN = re.compile(r'\bnr\.?\s*(\w+(?:[-/]\w+)*)'
+                                     r'|(?<![\w-])(?!20\d{2}m\b)((?=[\w-]*\d)(?=[\w-]*[^\W\d_])\w+(?:-\w+)*)',
+                                     re.IGNORECASE)
+# Žodžiai, kurie nenaudojami įmonės pavadinimui atpažinti
+COMPANY_NAME_STOPWORDS = {"uab", "mb", "ab", "iį", "všį", "ii", "ųab"}
+
+INVOICE_WORDS = re.compile(r'sąskait|saskait|\bsf\b')
+CONTRACT_WORDS = re.compile(r'sutar')
+SUM_WORDS = re.compile(r'\bsum[aąo]\w*|\biš viso\b|\bišlaid\w*|\bapyvart\w*')
+COUNT_WORDS = re.compile(r'\bkiek\b(\s+\w+){0,2}\s+(sąskait|saskait|sutar)|\bskaiči\w*\s+(sąskait|saskait|sutar)')
+DUE_WORDS = re.compile(r'apmokėti iki|apmokėjimo termin|mokėjimo termin|apmokėtin|mokėtin|termin\w* (baigiasi|suėjo)')
+GROUP_BY_COMPANY_WORDS = re.compile(r'pagal\s+(tiekėj|pardavėj|įmon)|kiekvien\w*\s+(tiekėj|pardavėj|įmon)')
+LIST_WORDS = re.compile(r'\b(išvardin\w*|išvardyk\w*|sąraš\w*|parodyk\w*)\b'
+                        r'|\b(kokios|kurios|kokias|kurias|visas|visos)\s+(\w+\s+)?(sąskait|saskait|sutart)')
+# Klausimai apie dokumentų turinį (prekes, kainas) paliekami LLM
+DETAIL_WORDS = re.compile(r'\bprek|\bton\w*\b|\bkain')
+WITHOUT_VAT_WORDS = re.compile(r'be\s+pvm')
+
+MAX_LISTED_DOCUMENTS = 20
+
+
+def _month_range(year, month):
+    start = datetime.date(year, month, 1)
+    end = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+    return start, end
+
+
+def _parse_iso(match):
+    try:
+        return datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+def parse_date_range(query, today=None):
+    """
+    Ištraukia datų intervalą iš klausimo. Grąžina (nuo, iki) kaip datetime.date arba None, jei nenurodyta.
+    Atpažįsta: YYYY-MM-DD, "nuo ... iki ...", YYYY-MM, mėnesių pavadinimus, "šį/praėjusį mėnesį", "šiais metais", "pernai".
+    """
+    today = today or datetime.date.today()
+    text = query.lower()
+
+    dates = [(m.start(), d) for m in ISO_DATE_PATTERN.finditer(text) if (d := _parse_iso(m))]
+    if len(dates) >= 2:
+        return min(dates[0][1], dates[1][1]), max(dates[0][1], dates[1][1])
+    if len(dates) == 1:
+        position, date = dates[0]
+        prefix = text[max(0, position - 12):position]
+        if re.search(r'\biki\b|\bprieš\b', prefix):
+            return None, date
+        if re.search(r'\bnuo\b|\bpo\b', prefix):
+            return date, None
+        return date, date
+
+    match = YEAR_MONTH_PATTERN.search(text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return _month_range(int(match.group(1)), int(match.group(2)))
+
+    if re.search(r'\bš(į|io|iame)\s+mėnes', text):
+        return _month_range(today.year, today.month)
+    if re.search(r'\b(praėjus|praeit)\w*\s+mėnes', text):
+        previous = today.replace(day=1) - datetime.timedelta(days=1)
+        return _month_range(previous.year, previous.month)
+
+    match = MONTH_PATTERN.search(text)
+    if match:
+        month = next(number for stem, number in MONTH_STEMS if match.group(2) == stem)
+        year_match = re.search(r'\b(20\d{2})\s*m', text)
+        if match.group(1) or match.group(3):
+            year = int(match.group(1) or match.group(3))
+        elif year_match:
+            year = int(year_match.group(1))
+        else:
+            year = today.year
+        return _month_range(year, month)
+
+    if re.search(r'\bš(iais|ių)\s+met', text):
+        return datetime.date(today.year, 1, 1), datetime.date(today.year, 12, 31)
+    if re.search(r'\bpernai\b|\b(praėjus|praeit)\w*\s+met', text):
+        return datetime.date(today.year - 1, 1, 1), datetime.date(today.year - 1, 12, 31)
+
+    match = re.search(r'\b(20\d{2})\s*m', text)
+    if match:
+        year = int(match.group(1))
+        return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+
+    return None, None
+
+
+def _name_tokens(name):
+    return [token for token in re.findall(r'\w+', name.lower())
+            if len(token) >= 4 and token not in COMPANY_NAME_STOPWORDS]
+
+
+def find_company_codes(query, known_companies):
+    """
+    Randa klausime minimas įmones. `known_companies` - {įmonės kodas: pavadinimas}.
+    Atpažįstami tiesiogiai nurodyti žinomų įmonių kodai ir pavadinimų žodžiai (pagal šaknį, pvz., "Algintros" -> "Algintra").
+    Grąžina [(kodas, pavadinimas)].
+    """
+    text = query.lower()
+    query_words = set(re.findall(r'\w+', text))
+    # Skaičius laikomas įmonės kodu tik tada, kai tokia įmonė yra saugykloje (kitaip tai gali būti numeris ar suma)
+    found = {code: known_companies[code] for code in COMPANY_CODE_PATTERN.findall(text) if code in known_companies}
+
+    # Tikslūs žodžių atitikmenys svarbesni už atitikmenis pagal šaknį ("karjerai" != "karjeras")
+    exact_matches, stem_matches = {}, {}
+    for code, name in known_companies.items():
+        for token in _name_tokens(name or ''):
+            if token in query_words:
+                exact_matches[code] = name
+                break
+            stem = token[:max(4, len(token) - 2)]
+            if any(word.startswith(stem) for word in query_words):
+                stem_matches[code] = name
+    found.update(exact_matches or stem_matches)
+    return list(found.items())
+
+
+def find_document_numbers(query):
+    """
+    Randa klausime nurodytus dokumentų numerius ("Nr. 15", "MAČ-1922"). Grąžina numerių sąrašą.
+    """
+    return list(dict.fromkeys(match.group(1) or match.group(2) for match in DOCUMENT_NUMBER_PATTERN.finditer(query)))
+
+
+def _number_clause(numbers):
+    # Numeriai lyginami be brūkšnelių ("MAČ-1922" = "MAČ1922"); SQLite UPPER() keičia tik ASCII raides
+    variants = sorted({variant.replace("-", "") for number in numbers for variant in (number, number.upper())})
+    return f"REPLACE(numeris, '-', '') IN ({', '.join('?' * len(variants))})", variants
+
+
+def _format_eur(value):
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",") + " EUR"
+
+
+def _describe_filters(date_from, date_to, companies, numbers=()):
+    parts = []
+    if numbers:
+        parts.append("Nr. " + ", ".join(numbers))
+    if date_from and date_to and date_from != date_to:
+        parts.append(f"laikotarpis {date_from.isoformat()} – {date_to.isoformat()}")
+    elif date_from and date_to:
+        parts.append(f"data {date_from.isoformat()}")
+    elif date_to:
+        parts.append(f"iki {date_to.isoformat()}")
+    elif date_from:
+        parts.append(f"nuo {date_from.isoformat()}")
+    if companies:
+        parts.append("įmonė: " + ", ".join(dict.fromkeys(name for _, name in companies)))
+    return f" ({'; '.join(parts)})" if parts else ""
+
+
+def _where(date_column, date_from, date_to, company_columns, companies, numbers=()):
+    clauses, params = [], []
+    if numbers:
+        clause, variants = _number_clause(numbers)
+        clauses.append(clause)
+        params.extend(variants)
+    if date_from:
+        clauses.append(f"{date_column} >= ?")
+        params.append(date_from.isoformat())
+    if date_to:
+        clauses.append(f"{date_column} <= ?")
+        params.append(date_to.isoformat())
+    if companies:
+        codes = [code for code, _ in companies]
+        placeholders = ", ".join("?" * len(codes))
+        clauses.append("(" + " OR ".join(f"{column} IN ({placeholders})" for column in company_columns) + ")")
+        for _ in company_columns:
+            params.extend(codes)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def answer_structured_query(query, store, today=None):
+    """
+    Bando atsakyti į agreguotą ar filtruojantį klausimą tiesiogiai iš SQLite saugyklos (be LLM).
+    Grąžina atsakymo tekstą arba None, jei klausimas laisvos formos ir turi būti perduotas LLM.
+    """
+    text = query.lower()
+    about_invoices = bool(INVOICE_WORDS.search(text))
+    about_contracts = bool(CONTRACT_WORDS.search(text))
+    wants_due = bool(DUE_WORDS.search(text))
+    wants_sum = bool(SUM_WORDS.search(text))
+    wants_count = bool(COUNT_WORDS.search(text))
+    wants_list = bool(LIST_WORDS.search(text))
+    wants_grouping = bool(GROUP_BY_COMPANY_WORDS.search(text))
+
+    if DETAIL_WORDS.search(text):
+        return None
+    if wants_due:
+        about_invoices = True
+    if not (about_invoices or about_contracts) or not (wants_due or wants_sum or wants_count or wants_list):
+        return None
+
+    date_from, date_to = parse_date_range(query, today)
+    known_companies = store.known_companies()
+    companies = find_company_codes(query, known_companies)
+    numbers = find_document_numbers(query)
+    # Nežinomas 7-9 skaitmenų skaičius nėra įmonės filtras - klausimą sprendžia paieška ir LLM
+    if any(code not in known_companies and code not in numbers for code in COMPANY_CODE_PATTERN.findall(text)):
+        return None
+    # Klausimas apie konkretų dokumentą: atsakoma tik tada, kai toks numeris yra saugykloje
+    if numbers:
+        clause, variants = _number_clause(numbers)
+        table = "invoices" if about_invoices else "contracts"
+        if not store.query(f"SELECT 1 FROM {table} WHERE {clause} LIMIT 1", variants):
+            return None
+    filters_text = _describe_filters(date_from, date_to, companies, numbers)
+
+    if about_invoices:
+        date_column = "apmoketi_iki" if wants_due else "data"
+        where, params = _where(date_column, date_from, date_to, ["pardavejas_kodas", "gavejas_kodas"], companies,
+                               numbers)
+        amount_column = "viso_be_pvm_eur" if WITHOUT_VAT_WORDS.search(text) else "viso_su_pvm_eur"
+        amount_label = "be PVM" if amount_column == "viso_be_pvm_eur" else "su PVM"
+
+        if wants_grouping:
+            rows = store.query(
+                f"SELECT pardavejas_pavadinimas, COUNT(*), SUM({amount_column}) FROM invoices{where} "
+                f"GROUP BY pardavejas_kodas ORDER BY SUM({amount_column}) DESC", params)
+            if not rows:
+                return f"Sąskaitų faktūrų nerasta{filters_text}."
+            lines = [f"- {name}: {count} sąsk., {_format_eur(total or 0)}" for name, count, total in rows]
+            return f"Sąskaitų faktūrų sumos {amount_label} pagal tiekėją{filters_text}:\n" + "\n".join(lines)
+
+        if wants_due or (wants_list and not (wants_sum or wants_count)):
+            order_column = "apmoketi_iki" if wants_due else "data"
+            rows = store.query(
+                f"SELECT numeris, data, apmoketi_iki, pardavejas_pavadinimas, {amount_column} FROM invoices{where} "
+                f"ORDER BY {order_column} LIMIT {MAX_LISTED_DOCUMENTS + 1}", params)
+            if not rows:
+                return f"Sąskaitų faktūrų nerasta{filters_text}."
+            lines = [f"- Nr. {number}, išrašyta {issued or '?'}, apmokėti iki {due or '?'}, {seller}, {_format_eur(amount)}"
+                     for number, issued, due, seller, amount in rows[:MAX_LISTED_DOCUMENTS]]
+            more = "\n(rodomos tik pirmosios " + str(MAX_LISTED_DOCUMENTS) + ")" if len(rows) > MAX_LISTED_DOCUMENTS else ""
+            return f"Sąskaitos faktūros{filters_text}:\n" + "\n".join(lines) + more
+
+        count, total = store.query(f"SELECT COUNT(*), SUM({amount_column}) FROM invoices{where}", params)[0]
+        if wants_sum:
+            return f"Rasta sąskaitų faktūrų: {count}{filters_text}. Bendra suma {amount_label}: {_format_eur(total or 0)}."
+        return f"Rasta sąskaitų faktūrų: {count}{filters_text}."
+
+    where, params = _where("sudarymo_data", date_from, date_to, ["salis_a_kodas", "salis_b_kodas"], companies,
+                           numbers)
+    if wants_list and not (wants_sum or wants_count):
+        rows = store.query(
+            f"SELECT numeris, sudarymo_data, sutarties_tipas, salis_a_pavadinimas, salis_b_pavadinimas FROM contracts{where} "
+            f"ORDER BY sudarymo_data LIMIT {MAX_LISTED_DOCUMENTS}", params)
+        if not rows:
+            return f"Sutarčių nerasta{filters_text}."
+        lines = [f"- Nr. {number or '?'}, sudaryta {signed or '?'}, {kind}, {party_a} – {party_b}"
+                 for number, signed, kind, party_a, party_b in rows]
+        return f"Sutartys{filters_text}:\n" + "\n".join(lines)
+
+    count, total = store.query(f"SELECT COUNT(*), SUM(bendra_suma_eur) FROM contracts{where}", params)[0]
+    if wants_sum:
+        return f"Rasta sutarčių: {count}{filters_text}. Bendra sutarčių vertė: {_format_eur(total or 0)}."
+    return f"Rasta sutarčių: {count}{filters_text}."
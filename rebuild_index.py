@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import argparse
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import main as vectorizer
+from collection_version import bump_collection_version, read_collection_names, write_collection_names
+
+# --- NUSTATYMAI ---
+
+# Kiek dokumentų vienu kartu nuskaitoma iš ChromaDB
+REBUILD_PAGE_SIZE = int(os.getenv("REBUILD_PAGE_SIZE", "2000"))
+# Kiek tekstų vektorizuoja vienas procesas vienu kartu
+REBUILD_ENCODE_BATCH_SIZE = int(os.getenv("REBUILD_ENCODE_BATCH_SIZE", "256"))
+# Vektorizavimo procesų skaičius (numatyta - visi branduoliai); 1 - vektorizuojama pagrindiniame procese
+REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", str(os.cpu_count() or 1)))
+# Kiek įrašų įrašoma vienu upsert kvietimu (ne daugiau nei leidžia ChromaDB, žr. client.get_max_batch_size())
+UPSERT_CHUNK_SIZE = vectorizer.UPSERT_CHUNK_SIZE
+
+
+# --- VEKTORIZAVIMO PROCESAI ---
+
+def _init_encode_worker():
+    """
+    Kiekvienas procesas įkelia savo modelio kopiją. torch gijų skaičius ribojamas iki 1,
+    kad procesai nekonkuruotų dėl tų pačių branduolių.
+    """
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    vectorizer.get_model()
+
+
+def _encode_batch(texts):
+    return vectorizer.get_model().encode(texts, batch_size=len(texts), show_progress_bar=False)
+
+
+class EncodePool:
+    """
+    Tekstų vektorizavimas keliais procesais. Podėlyje (embedding_cache.py) esantys vektoriai neperskaičiuojami.
+    """
+
+    def __init__(self, workers=REBUILD_WORKERS, batch_size=REBUILD_ENCODE_BATCH_SIZE, use_cache=True):
+        self.batch_size = batch_size
+        self.cache = vectorizer.get_embedding_cache() if use_cache else None
+        self.encoded = 0
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_encode_worker) if workers > 1 else None
+
+    def _encode_missing(self, texts):
+        self.encoded += len(texts)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if self._pool is None:
+            return np.concatenate([_encode_batch(batch) for batch in batches])
+        return np.concatenate(list(self._pool.map(_encode_batch, batches)))
+
+    def encode(self, texts):
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._encode_missing(texts).tolist()
+        return self.cache.encode(vectorizer.EMBEDDING_MODEL_NAME, texts, self._encode_missing).tolist()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+# --- PERSTATYMAS ---
+
+def _fresh_collection(client, name):
+    """
+    Sukuria tuščią kolekciją (likusi nuo nepavykusio perstatymo pašalinama).
+    """
+    _delete_collection(client, name)
+    return client.create_collection(name=name)
+
+
+def _delete_collection(client, name):
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass  # Kolekcijos nėra
+
+
+def _upsert_in_chunks(collection, chunk_size, ids, texts, embeddings, metadatas):
+    for start in range(0, len(ids), chunk_size):
+        collection.upsert(ids=ids[start:start + chunk_size], documents=texts[start:start + chunk_size],
+                          embeddings=embeddings[start:start + chunk_size], metadatas=metadatas[start:start + chunk_size])
+
+
+def rebuild_collection(source, target, parts_target, doc_type, encoder, page_size=REBUILD_PAGE_SIZE,
+                       chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Nuskaito `source` kolekcijos dokumentus puslapiais (iš 'json_data' metaduomenų), iš naujo sugeneruoja
+    tekstus ir vektorius ir įrašo juos į `target` (dalis - į `parts_target`, jei nurodyta) po `chunk_size` įrašų.
+    Grąžina perrašytų dokumentų skaičių.
+    """
+    total = source.count()
+    done = 0
+    offset = 0
+    started = time.perf_counter()
+    while True:
+        page = source.get(include=['metadatas'], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        offset += page_size
+
+        records = {}
+        for doc_id, meta in zip(page['ids'], page['metadatas']):
+            if meta and meta.get('json_data'):
+                records[doc_id] = json.loads(meta['json_data'])
+            else:
+                print(f"   ⚠️ Dokumentas {doc_id} neturi 'json_data' metaduomenų, praleidžiamas.")
+        if not records:
+            continue
+
+        ids = list(records)
+        texts = [vectorizer.TEXT_GENERATORS[doc_type](records[doc_id]) for doc_id in ids]
+        _upsert_in_chunks(target, chunk_size, ids, texts, encoder.encode(texts),
+                          [vectorizer.build_metadata(records[doc_id], doc_type) for doc_id in ids])
+        if parts_target is not None:
+            # Vienas dokumentas turi kelias dalis, todėl dalių puslapyje būna kelis kartus daugiau nei dokumentų
+            part_ids, part_texts, part_metadatas = vectorizer.build_document_parts(records, doc_type)
+            if part_ids:
+                _upsert_in_chunks(parts_target, chunk_size, part_ids, part_texts, encoder.encode(part_texts),
+                                  part_metadatas)
+
+        done += len(ids)
+        elapsed = time.perf_counter() - started
+        print(f"   🔁 {source.name}: {done}/{total} ({done / elapsed:.1f} dok./s)")
+    return done
+
+
+def switch_collections(client, new_names, keep_backup=True):
+    """
+    Įjungia perstatytas kolekcijas: visų kolekcijų pavadinimai pakeičiami vienu atominiu
+    collection_names.json įrašu, todėl skaitytojai niekada nemato mišinio ar trūkstamos kolekcijos.
+    Ankstesnės kolekcijos lieka atsarginės (arba pašalinamos), dar senesnės atsarginės pašalinamos.
+    Šį kartą neperstatytos kolekcijos (pvz., dalių kolekcija išjungus MULTI_VECTOR_INDEX) lieka tokios pat.
+    app_local.py naujas kolekcijas pasiima pasikeitus kolekcijų versijai.
+    """
+    names = read_collection_names()
+    old_names = {name: names["active"].get(name, name) for name in new_names}
+    active = {**names["active"], **new_names}
+    backup = {}
+    if keep_backup:
+        backup = {name: collection for name, collection in names["backup"].items() if name not in new_names}
+        backup.update(old_names)
+    write_collection_names(active, backup)
+    bump_collection_version()
+
+    kept = set(active.values()) | set(backup.values())
+    for name in (set(names["backup"].values()) | set(old_names.values())) - kept:
+        _delete_collection(client, name)
+    return old_names
+
+
+def rebuild(args):
+    """
+    Perstato visas kolekcijas: naujos kuriamos naujais pavadinimais šalia veikiančių ir tik visoms pavykus
+    įjungiamos (žr. switch_collections). Nepavykus perstatyti, veikiančios kolekcijos lieka nepaliestos.
+    Perstatymo metu naujų dokumentų įkėlimas (pipeline.py, watcher.py, main.py) turėtų būti sustabdytas.
+    """
+    invoice_collection, contract_collection = vectorizer.get_collections()
+    client = vectorizer.client
+    chunk_size = min(UPSERT_CHUNK_SIZE, client.get_max_batch_size())
+    generation = uuid.uuid4().hex[:12]
+    sources = [(invoice_collection, "invoice", vectorizer.INVOICE_COLLECTION_NAME),
+               (contract_collection, "contract", vectorizer.CONTRACT_COLLECTION_NAME)]
+    new_names = {name: f"{name}_{generation}" for _, _, name in sources}
+
+    parts_target = None
+    if vectorizer.MULTI_VECTOR_INDEX:
+        new_names[vectorizer.PARTS_COLLECTION_NAME] = f"{vectorizer.PARTS_COLLECTION_NAME}_{generation}"
+        parts_target = _fresh_collection(client, new_names[vectorizer.PARTS_COLLECTION_NAME])
+
+    encoder = EncodePool(args.workers, args.batch_size, use_cache=not args.no_cache)
+    print(f"\n--- KOLEKCIJŲ PERSTATYMAS ({args.workers} proc., paketas {args.batch_size}) ---")
+    started = time.perf_counter()
+    rebuilt = 0
+    try:
+        for source, doc_type, name in sources:
+            target = _fresh_collection(client, new_names[name])
+            rebuilt += rebuild_collection(source, target, parts_target, doc_type, encoder, args.page_size, chunk_size)
+    except BaseException:
+        # Dar neįjungtos kolekcijos pašalinamos, veikiančios lieka kaip buvusios
+        for name in new_names.values():
+            _delete_collection(client, name)
+        raise
+    finally:
+        encoder.close()
+
+    old_names = switch_collections(client, new_names, keep_backup=not args.drop_backup)
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ Perstatyta dokumentų: {rebuilt} per {elapsed:.1f} s ({rebuilt / elapsed if elapsed else 0:.1f} dok./s), "
+          f"vektorizuota tekstų: {encoder.encoded}")
+    if not args.drop_backup:
+        print(f"   Ankstesnės kolekcijos išsaugotos: {', '.join(old_names.values())} (žr. collection_names.json).")
+    return rebuilt
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Perstato ChromaDB kolekcijas iš 'json_data' metaduomenų (pakeitus modelį ar teksto šablonus).")
+    parser.add_argument("--page-size", type=int, default=REBUILD_PAGE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=REBUILD_ENCODE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS)
+    parser.add_argument("--no-cache", action="store_true", help="Nenaudoti vektorių podėlio.")
+    parser.add_argument("--drop-backup", action="store_true",
+                        help="Įjungus naujas kolekcijas pašalinti ankstesniąsias (numatyta - išsaugoti kaip atsargines).")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    rebuild(parse_args())
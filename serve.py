@@ -0,0 +1,258 @@
+import os
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import app_local
+
+# --- NUSTATYMAI ---
+
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "5000"))
+# Serverio procesų skaičius; kiekvienas procesas turi savo įdėjimo modelį, ChromaDB klientą ir atsakymų podėlį
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+# 'wsgi' režimu - užklausas aptarnaujančių gijų skaičius procese;
+# 'async' režimu - gijos konteksto paieškai (vektorizavimas, ChromaDB), LLM laukiama be gijos
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "8"))
+# 'async' - aiohttp serveris: LLM atsakymo laukianti užklausa neužima OS gijos;
+# 'wsgi'  - Flask programa per gunicorn (arba waitress / daugiagijį Werkzeug serverį)
+SERVER_MODE = os.getenv("SERVER_MODE", "async")
+
+
+# --- WSGI REŽIMAS ---
+
+def serve_wsgi(host, port, workers, threads):
+    """
+    Paleidžia Flask programą gamybiniu WSGI serveriu. Programa kuriama kiekviename procese atskirai
+    (app factory), todėl ChromaDB klientas ir modelis neperduodami tarp procesų.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class GunicornApp(BaseApplication):
+            def load_config(self):
+                for key, value in {"bind": f"{host}:{port}", "workers": workers, "threads": threads,
+                                   "worker_class": "gthread"}.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return app_local.create_app()
+
+        print(f"🚀 gunicorn: http://{host}:{port} ({workers} proc. x {threads} gijų)")
+        GunicornApp().run()
+        return
+
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+
+    if workers > 1:
+        print("Informacija: keli procesai WSGI režimu palaikomi tik su 'gunicorn', naudojamas vienas procesas.")
+    if waitress is not None:
+        print(f"🚀 waitress: http://{host}:{port} ({threads} gijų)")
+        waitress.serve(app_local.create_app(), host=host, port=port, threads=threads)
+        return
+
+    from werkzeug.serving import run_simple
+    print("Informacija: nei 'gunicorn', nei 'waitress' neįdiegti - naudojamas daugiagijis Werkzeug serveris.")
+    print(f"🚀 Werkzeug: http://{host}:{port}")
+    run_simple(host, port, app_local.create_app(), threaded=True)
+
+
+# --- ASINCHRONINIS (aiohttp) REŽIMAS ---
+
+def llm_error(error):
+    """
+    Paverčia LLM kvietimo klaidą (HTTP būsena, pranešimas vartotojui) - kaip app_local.py maršrutuose.
+    """
+    import aiohttp
+
+    # aiohttp.ServerTimeoutError yra ir ClientConnectionError, todėl laiko limitas tikrinamas pirmas
+    if isinstance(error, asyncio.TimeoutError):
+        print(f"KLAIDA: Ollama neatsakė per {app_local.OLLAMA_READ_TIMEOUT} s.")
+        return 504, 'Klaida: Vietinis LLM serveris neatsakė laiku.'
+    if isinstance(error, aiohttp.ClientConnectionError):
+        print(f"KLAIDA: Nepavyko prisijungti prie Ollama serverio. Patikrinkite, ar Ollama veikia ir ar modelis "
+              f"({app_local.LOCAL_LLM_MODEL}) yra įkeltas.")
+        return 503, 'Klaida: Nepavyko prisijungti prie vietinio LLM serverio. Ar veikia Ollama?'
+    if isinstance(error, aiohttp.ClientError):
+        print(f"Klaida siunčiant užklausą į Ollama: {error}")
+        return 500, f'Ollama API klaida: {error}'
+    print(f"Įvyko klaida apdorojant užklausą: {error}")
+    return 500, f'Serverio klaida: {error}'
+
+
+def create_async_app(threads=SERVER_THREADS):
+    """
+    aiohttp programos gamykla: tie patys maršrutai kaip app_local.py, tačiau LLM laukiama asinchroniškai
+    (OllamaClient.agenerate / astream), o sinchroninė konteksto paieška vykdoma ribotame gijų telkinyje.
+    """
+    from aiohttp import web
+    from flask import render_template
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    # Šablonai generuojami ta pačia Flask (Jinja) aplinka kaip ir WSGI režime
+    flask_app = app_local.create_app()
+
+    async def read_query(request):
+        try:
+            data = await request.json()
+        except ValueError:
+            return None
+        return data.get('query') if isinstance(data, dict) else None
+
+    async def prepare(query):
+        return await asyncio.get_running_loop().run_in_executor(executor, app_local.prepare_answer, query)
+
+    async def index(request):
+        with flask_app.app_context():
+            html = render_template('index.html')
+        return web.Response(text=html, content_type='text/html')
+
+    async def ask(request):
+        query = await read_query(request)
+        if not query:
+            return web.json_response({'error': 'Užklausa nerasta.'}, status=400)
+        try:
+            with metrics.timed("ask"):
+                answer, llm_request = await prepare(query)
+                if answer is not None:
+                    return web.json_response(answer)
+                full_prompt, version, query_embedding = llm_request
+                usage = {}
+                response_text = await app_local.llm_client.agenerate(full_prompt, usage)
+                app_local.answer_cache.put(query, version, response_text, query_embedding)
+                app_local.report_usage(usage)
+                return web.json_response({'response': response_text, 'usage': usage})
+        except Exception as e:
+            status, message = llm_error(e)
+            return web.json_response({'error': message}, status=status)
+
+    async def ask_stream(request):
+        query = await read_query(request)
+        if not query:
+            return web.json_response({'error': 'Užklausa nerasta.'}, status=400)
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        await response.prepare(request)
+
+        async def send(payload):
+            await response.write(app_local.sse_event(payload).encode('utf-8'))
+
+        try:
+            answer, llm_request = await prepare(query)
+            done = {'done': True}
+            if answer is not None:
+                token = answer.pop('response')
+                await send({'token': token, **answer})
+            else:
+                full_prompt, version, query_embedding = llm_request
+                tokens = []
+                usage = {}
+                async for token in app_local.llm_client.astream(full_prompt, usage):
+                    tokens.append(token)
+                    await send({'token': token})
+                # Į podėlį dedame tik pilnai sugeneruotą atsakymą
+                app_local.answer_cache.put(query, version, "".join(tokens), query_embedding)
+                app_local.report_usage(usage)
+                done['usage'] = usage
+            await send(done)
+        except Exception as e:
+            _, message = llm_error(e)
+            await send({'error': message})
+        return response
+
+    async def cache_stats(request):
+        return web.json_response(app_local.answer_cache.stats())
+
+    async def prometheus_metrics(request):
+        return web.Response(text=app_local.render_metrics(), content_type='text/plain')
+
+    @web.middleware
+    async def refresh_collections(request, handler):
+        # Kaip Flask before_request: po rebuild_index.py kolekcijos gaunamos iš naujo
+        app_local.refresh_collections()
+        return await handler(request)
+
+    async def on_cleanup(_):
+        await app_local.llm_client.aclose()
+        executor.shutdown(wait=False)
+
+    async_app = web.Application(middlewares=[refresh_collections])
+    async_app.router.add_get('/', index)
+    async_app.router.add_post('/ask', ask)
+    async_app.router.add_post('/ask_stream', ask_stream)
+    async_app.router.add_get('/cache_stats', cache_stats)
+    async_app.router.add_get('/metrics', prometheus_metrics)
+    async_app.on_cleanup.append(on_cleanup)
+    return async_app
+
+
+def _run_async_worker(host, port, threads, reuse_port):
+    from aiohttp import web
+    web.run_app(create_async_app(threads), host=host, port=port, reuse_port=reuse_port, print=None)
+
+
+def serve_async(host, port, workers, threads):
+    """
+    Paleidžia aiohttp serverį. Keli procesai klausosi to paties prievado (SO_REUSEPORT, Linux),
+    kiekvienas jų savo ChromaDB klientą ir modelį įkelia pirmos užklausos metu.
+    """
+    print(f"🚀 aiohttp: http://{host}:{port} ({workers} proc., konteksto paieškos gijų: {threads})")
+    if workers <= 1:
+        _run_async_worker(host, port, threads, False)
+        return
+
+    processes = [multiprocessing.Process(target=_run_async_worker, args=(host, port, threads, True))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+# --- PALEIDIMAS ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gamybinis app_local.py serverio režimas.")
+    parser.add_argument("--mode", choices=["async", "wsgi"], default=SERVER_MODE)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Patikrina kolekcijas ir paleidžia serverį. Grąžina False, jei kolekcijų nėra.
+    """
+    args = parse_args(argv)
+    try:
+        app_local.get_collections()
+    except RuntimeError as e:
+        print(f"KLAIDA: {e}")
+        return False
+    # Patikrinimo metu atidarytos jungtys neturi būti paveldėtos serverio procesų
+    app_local.reset_backend()
+
+    if args.mode == "wsgi":
+        serve_wsgi(args.host, args.port, args.workers, args.threads)
+    else:
+        serve_async(args.host, args.port, args.workers, args.threads)
+    return True
+
+
+if __name__ == "__main__":
+    if not main():
+        exit()
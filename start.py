@@ -1,3 +1,4 @@
+import argparse
 import subprocess
 import sys
 from typing import List
@@ -40,9 +41,10 @@ def paleisti_ir_transliuoti(failo_vardas: str) -> bool:
         return False
 
 
-# Pagrindinė vykdymo funkcija
-if __name__ == "__main__":
-
+def paleisti_subprocesais() -> bool:
+    """
+    Senasis režimas: kiekvienas žingsnis paleidžiamas atskiru Python procesu.
+    """
     # Apibrėžiame vykdytinų failų seką
     vykdomu_failu_sarasas: List[str] = [
         "ai_pdf_to_json.py",
@@ -50,32 +52,75 @@ if __name__ == "__main__":
         "app_local.py"
     ]
 
-    viskas_sekminga: bool = True
-
     for i, failo_vardas in enumerate(vykdomu_failu_sarasas):
-
-        if not viskas_sekminga:
-            print("\n" * 2)
-            print("*" * 60)
-            print(f"SEKA NUTRAUKTA: Ankstesnis žingsnis nepavyko. Failas {failo_vardas} nebus paleistas.")
-            print("*" * 60)
-            break
-
         # Paleidžiame dabartinį failą ir tikriname sėkmę
-        sekme = paleisti_ir_transliuoti(failo_vardas)
-
-        if not sekme:
-            viskas_sekminga = False
-            # Paliekame `for` ciklą, kad būtų galima atspausdinti nutraukimo žinutę
+        if not paleisti_ir_transliuoti(failo_vardas):
+            if i < len(vykdomu_failu_sarasas) - 1:
+                print("\n" * 2)
+                print("*" * 60)
+                print(f"SEKA NUTRAUKTA: Ankstesnis žingsnis nepavyko. Failas {vykdomu_failu_sarasas[i + 1]} nebus paleistas.")
+                print("*" * 60)
+            return False
 
         # Tarp žingsnių pridedame tarpą
-        if viskas_sekminga and i < len(vykdomu_failu_sarasas) - 1:
+        if i < len(vykdomu_failu_sarasas) - 1:
             print("\n" * 3)
             print("--- Sekantis žingsnis ---")
             print("\n" * 3)
 
+    return True
+
+
+def paleisti_viename_procese(pipeline_argv: List[str], stebeti: bool = False) -> bool:
+    """
+    Visa seka viename procese: PDF -> ChromaDB grandinė, likusių JSON failų įkėlimas ir Flask serveris.
+    Modeliai ir ChromaDB klientas įkeliami vieną kartą ir nebeperkraunami kiekviename žingsnyje.
+    Jei `stebeti`, serveriui veikiant nauji failai aplankuose įkeliami nuolat (watcher.py).
+    """
+    import pipeline
+    import main as vektorizavimas
+    import app_local
+
+    print("=" * 60)
+    print("[PIPELINE] PDF -> JSON -> CHROMADB GRANDINĖ PRADEDAMA...")
+    print("=" * 60)
+    try:
+        pipeline.run_pipeline(pipeline.parse_args(pipeline_argv))
+        # JSON failai, likę iš ankstesnių paleidimų ar nepavykusių įkėlimų
+        vektorizavimas.main([])
+    except Exception as e:
+        print(f"\n❌ [PIPELINE] UŽBAIGTAS SU KLAIDA: {e}")
+        return False
+    print("\n✅ [PIPELINE] SĖKMINGAI UŽBAIGTAS.")
+
+    print("\n" * 3)
+    print("--- Sekantis žingsnis ---")
+    print("\n" * 3)
+
+    if stebeti:
+        import watcher
+        watcher.create_watcher(watcher.parse_args([])).start()
+
+    # Perkrovimo režimas paleistų antrą procesą ir iš naujo įkeltų modelius, todėl jis išjungiamas
+    return app_local.run_server(debug=True, use_reloader=False)
+
+
+# Pagrindinė vykdymo funkcija
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Visos sistemos paleidimas: PDF apdorojimas, ChromaDB ir Flask serveris.")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Paleisti kiekvieną žingsnį atskiru procesu (senasis režimas).")
+    parser.add_argument("--watch", action="store_true",
+                        help="Serveriui veikiant nuolat stebėti aplankus ir įkelti naujus dokumentus.")
+    args, pipeline_argv = parser.parse_known_args()
+
+    if args.subprocess:
+        viskas_sekminga = paleisti_subprocesais()
+    else:
+        viskas_sekminga = paleisti_viename_procese(pipeline_argv, args.watch)
+
     if viskas_sekminga:
         print("\n" * 3)
         print("**************************************************")
         print("🥳 VISA PROGRAMOS VYKDYMO SEKA SĖKMINGAI BAIGTA.")
-        print("**************************************************")
\ No newline at end of file
+        print("**************************************************")
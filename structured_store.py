@@ -0,0 +1,310 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+
+from extraction_schema import coerce_number
+
+# --- NUSTATYMAI ---
+
+# Tipizuota SQLite saugykla šalia ChromaDB: sąskaitos, jų prekės ir sutartys su indeksais
+STRUCTURED_DB_PATH = os.getenv("STRUCTURED_DB_PATH", "./my_documents_db/structured.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    doc_id TEXT PRIMARY KEY,
+    numeris TEXT,
+    data TEXT,
+    apmoketi_iki TEXT,
+    pardavejas_pavadinimas TEXT,
+    pardavejas_kodas TEXT,
+    pardavejas_pvm_kodas TEXT,
+    gavejas_pavadinimas TEXT,
+    gavejas_kodas TEXT,
+    gavejas_pvm_kodas TEXT,
+    viso_be_pvm_eur REAL,
+    pvm_suma_eur REAL,
+    viso_su_pvm_eur REAL
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_pardavejas_kodas ON invoices(pardavejas_kodas);
+CREATE INDEX IF NOT EXISTS idx_invoices_gavejas_kodas ON invoices(gavejas_kodas);
+CREATE INDEX IF NOT EXISTS idx_invoices_data ON invoices(data);
+CREATE INDEX IF NOT EXISTS idx_invoices_apmoketi_iki ON invoices(apmoketi_iki);
+
+CREATE TABLE IF NOT EXISTS invoice_items (
+    doc_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    pavadinimas TEXT,
+    vezimas TEXT,
+    kiekis_t REAL,
+    vieneto_kaina_eur REAL,
+    viso_eur REAL,
+    PRIMARY KEY (doc_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_invoice_items_pavadinimas ON invoice_items(pavadinimas);
+
+CREATE TABLE IF NOT EXISTS contracts (
+    doc_id TEXT PRIMARY KEY,
+    numeris TEXT,
+    sudarymo_data TEXT,
+    sutarties_tipas TEXT,
+    salis_a_pavadinimas TEXT,
+    salis_a_kodas TEXT,
+    salis_b_pavadinimas TEXT,
+    salis_b_kodas TEXT,
+    galiojimo_terminas TEXT,
+    bendra_suma_eur REAL,
+    mokestis_uz_paslaugas TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_contracts_salis_a_kodas ON contracts(salis_a_kodas);
+CREATE INDEX IF NOT EXISTS idx_contracts_salis_b_kodas ON contracts(salis_b_kodas);
+CREATE INDEX IF NOT EXISTS idx_contracts_sudarymo_data ON contracts(sudarymo_data);
+
+-- Leksinis (BM25) indeksas tiksliems identifikatoriams: numeriams, įmonių ir PVM kodams, važtaraščiams.
+-- 'remove_diacritics' leidžia rasti "MAČ-1922" ir pagal "MAC-1922".
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    doc_id UNINDEXED,
+    doc_type UNINDEXED,
+    identifiers,
+    content,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Laukai, kurie patenka į 'identifiers' stulpelį (BM25 svoris didesnis nei likusiam tekstui)
+IDENTIFIER_FIELDS = {"numeris", "imones_kodas", "pvm_kodas", "vezimas", "saskaitos_numeris"}
+# BM25 svoriai: (identifiers, content)
+FTS_WEIGHTS = (5.0, 1.0)
+# Mažesnis BM25 įvertis reiškia, kad sutapo tik beveik visuose dokumentuose esantys žodžiai ("sąskaita", "PVM")
+LEXICAL_MIN_SCORE = 1e-3
+# Užklausos žodis, panašus į identifikatorių: bent 4 simboliai ir bent vienas skaitmuo (pvz., "MAČ-1922", "305654042"),
+# bet ne metai ar data ("2025", "2025-10", "2025-10-20")
+IDENTIFIER_TOKEN = re.compile(r'^(?!(?:19|20)\d{2}(?:-\d{1,2}){0,2}$)(?=.*\d)[\w-]{4,}$')
+
+# ChromaDB filtravimo laukai (main.filter_metadata) sutampa su lentelių stulpeliais; datos metaduomenyse - YYYYMMDD
+FILTER_TABLES = {"invoice": "invoices", "contract": "contracts"}
+FILTER_COLUMNS = {"pardavejas_kodas", "gavejas_kodas", "data", "apmoketi_iki", "viso_su_pvm_eur",
+                  "salis_a_kodas", "salis_b_kodas", "sudarymo_data"}
+DATE_COLUMNS = {"data", "apmoketi_iki", "sudarymo_data"}
+SQL_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def to_number(value):
+    """
+    Paverčia AI grąžintą reikšmę skaičiumi ("1 234,56", "599.71 EUR", 12 -> float). Nepavykus - 0.0.
+    """
+    number = coerce_number(value)
+    return 0.0 if number is None else number
+
+
+def to_iso_date(value):
+    """
+    Grąžina datą YYYY-MM-DD formatu (rikiuojamą kaip tekstą) arba None.
+    """
+    match = re.search(r'(\d{4})[-./](\d{1,2})[-./](\d{1,2})', str(value or ''))
+    if not match:
+        return None
+    year, month, day = match.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+def to_date_number(value):
+    """
+    Grąžina datą kaip rikiuojamą sveikąjį skaičių YYYYMMDD (ChromaDB metaduomenų filtrams $gte / $lte) arba None.
+    """
+    iso_date = to_iso_date(value)
+    return int(iso_date.replace("-", "")) if iso_date else None
+
+
+def _date_number_to_iso(value):
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+def where_to_sql(where):
+    """
+    Paverčia ChromaDB `where` filtrą ($and, $or, $in, palyginimai ir lygybė) SQL sąlyga.
+    Grąžina (sąlyga, parametrai). Leidžiami tik FILTER_COLUMNS laukai.
+    """
+    for operator, joiner in (("$and", " AND "), ("$or", " OR ")):
+        if operator in where:
+            clauses = [where_to_sql(clause) for clause in where[operator]]
+            return ("(" + joiner.join(sql for sql, _ in clauses) + ")",
+                    [param for _, params in clauses for param in params])
+
+    (column, condition), = where.items()
+    if column not in FILTER_COLUMNS:
+        raise ValueError(f"Nežinomas filtro laukas: {column}")
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    (operator, value), = condition.items()
+    convert = _date_number_to_iso if column in DATE_COLUMNS else (lambda item: item)
+    if operator == "$in":
+        return f"{column} IN ({', '.join('?' * len(value))})", [convert(item) for item in value]
+    return f"{column} {SQL_OPERATORS[operator]} ?", [convert(value)]
+
+
+def _leaf_values(value, key=None):
+    """
+    Grąžina (lauko pavadinimas, reikšmė) porų sąrašą visiems JSON lapams.
+    """
+    if isinstance(value, dict):
+        return [leaf for child_key, child in value.items() for leaf in _leaf_values(child, child_key)]
+    if isinstance(value, list):
+        return [leaf for child in value for leaf in _leaf_values(child, key)]
+    if value in (None, ""):
+        return []
+    return [(key, str(value))]
+
+
+def fts_query_terms(query):
+    """
+    Išskaido klausimą į FTS5 užklausos terminus. Kiekvienas žodis cituojamas, todėl "MAČ-1922"
+    ieškomas kaip frazė, o specialieji FTS5 simboliai (", *, :, -) nelaikomi operatoriais.
+    """
+    words = re.findall(r'\w+(?:[-/.]\w+)*', query or '')
+    return ['"' + word.replace('"', '""') + '"' for word in words]
+
+
+class StructuredStore:
+    """
+    Tipizuota, indeksuota dokumentų saugykla agreguotoms užklausoms (sumos, filtrai pagal datą ar įmonę).
+    """
+
+    def __init__(self, path=STRUCTURED_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Flask aptarnauja užklausas keliose gijose
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _upsert_invoice(self, doc_id, data):
+        seller = data.get('pardavejas') or {}
+        buyer = data.get('gavejas') or {}
+        sums = data.get('sumos') or {}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO invoices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, data.get('numeris', ''), to_iso_date(data.get('data')), to_iso_date(data.get('apmoketi_iki')),
+             seller.get('pavadinimas', ''), seller.get('imones_kodas', ''), seller.get('pvm_kodas', ''),
+             buyer.get('pavadinimas', ''), buyer.get('imones_kodas', ''), buyer.get('pvm_kodas', ''),
+             to_number(sums.get('viso_be_pvm_eur')), to_number(sums.get('pvm_suma_eur')),
+             to_number(sums.get('viso_su_pvm_eur')))
+        )
+        self._conn.execute("DELETE FROM invoice_items WHERE doc_id=?", (doc_id,))
+        self._conn.executemany(
+            "INSERT INTO invoice_items VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(doc_id, position, item.get('pavadinimas', ''), str(item.get('vezimas', '') or ''),
+              to_number(item.get('kiekis_t')), to_number(item.get('vieneto_kaina_eur')), to_number(item.get('viso_eur')))
+             for position, item in enumerate(data.get('prekes') or [])]
+        )
+
+    def _upsert_contract(self, doc_id, data):
+        party_a = data.get('salis_a') or {}
+        party_b = data.get('salis_b') or {}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO contracts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, data.get('numeris', ''), to_iso_date(data.get('sudarymo_data')), data.get('sutarties_tipas', ''),
+             party_a.get('pavadinimas', ''), party_a.get('imones_kodas', ''),
+             party_b.get('pavadinimas', ''), party_b.get('imones_kodas', ''),
+             data.get('galiojimo_terminas', ''), to_number(data.get('bendra_suma_eur')),
+             data.get('mokestis_uz_paslaugas', ''))
+        )
+
+    def _upsert_fts(self, doc_id, doc_type, data):
+        leaves = _leaf_values(data)
+        self._conn.execute("DELETE FROM documents_fts WHERE doc_id=? AND doc_type=?", (doc_id, doc_type))
+        self._conn.execute(
+            "INSERT INTO documents_fts (doc_id, doc_type, identifiers, content) VALUES (?, ?, ?, ?)",
+            (doc_id, doc_type, " ".join(value for key, value in leaves if key in IDENTIFIER_FIELDS),
+             " ".join(value for key, value in leaves if key not in IDENTIFIER_FIELDS))
+        )
+
+    def upsert_documents(self, documents):
+        """
+        Įrašo (arba atnaujina) dokumentus viena transakcija. `documents` - (doc_id, doc_type, data) sąrašas.
+        """
+        with self._lock:
+            for doc_id, doc_type, data in documents:
+                if doc_type == "invoice":
+                    self._upsert_invoice(doc_id, data)
+                elif doc_type == "contract":
+                    self._upsert_contract(doc_id, data)
+                else:
+                    continue
+                self._upsert_fts(doc_id, doc_type, data)
+            self._conn.commit()
+
+    def lexical_search(self, query, limit=10, identifiers_only=False):
+        """
+        BM25 paieška leksiniame indekse. Grąžina (doc_id, doc_type, BM25 įvertis) sąrašą, geriausi - pirmi.
+        `identifiers_only` - ieškoti tik identifikatorių stulpelyje ir tik identifikatorių formos žodžių.
+        """
+        terms = fts_query_terms(query)
+        if identifiers_only:
+            terms = [term for term in terms if IDENTIFIER_TOKEN.match(term.strip('"'))]
+            if not terms:
+                return []
+            match = "identifiers : (" + " OR ".join(terms) + ")"
+        else:
+            if not terms:
+                return []
+            match = " OR ".join(terms)
+        rows = self.query(
+            f"SELECT doc_id, doc_type, bm25(documents_fts, 0, 0, {FTS_WEIGHTS[0]}, {FTS_WEIGHTS[1]}) AS score "
+            f"FROM documents_fts WHERE documents_fts MATCH ? ORDER BY score LIMIT ?",
+            (match, limit)
+        )
+        # SQLite bm25() grąžina neigiamą įvertį (mažesnis - geresnis)
+        return [(doc_id, doc_type, -score) for doc_id, doc_type, score in rows if -score > LEXICAL_MIN_SCORE]
+
+    def filter_document_ids(self, doc_type, where, limit):
+        """
+        Dokumentų ID, atitinkantys ChromaDB `where` filtrą (indeksuota paieška tose pačiose reikšmėse).
+        Grąžina None, jei jų daugiau nei `limit`.
+        """
+        sql, params = where_to_sql(where)
+        rows = self.query(f"SELECT doc_id FROM {FILTER_TABLES[doc_type]} WHERE {sql} LIMIT ?", params + [limit + 1])
+        if len(rows) > limit:
+            return None
+        return [doc_id for doc_id, in rows]
+
+    def sync_from_collection(self, collection, doc_type, page_size=1000):
+        """
+        Užpildo saugyklą iš ChromaDB kolekcijos 'json_data' metaduomenų (jau įkeltiems dokumentams).
+        """
+        synced = 0
+        offset = 0
+        while True:
+            page = collection.get(include=['metadatas'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            self.upsert_documents([(doc_id, doc_type, json.loads(meta['json_data']))
+                                   for doc_id, meta in zip(page['ids'], page['metadatas'])
+                                   if meta and meta.get('json_data')])
+            synced += len(page['ids'])
+            offset += page_size
+        return synced
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def known_companies(self):
+        """
+        Grąžina visas saugykloje esančias įmones: {įmonės kodas: pavadinimas}.
+        """
+        rows = self.query("""
+            SELECT pardavejas_kodas, pardavejas_pavadinimas FROM invoices
+            UNION SELECT gavejas_kodas, gavejas_pavadinimas FROM invoices
+            UNION SELECT salis_a_kodas, salis_a_pavadinimas FROM contracts
+            UNION SELECT salis_b_kodas, salis_b_pavadinimas FROM contracts
+        """)
+        return {code: name for code, name in rows if code}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
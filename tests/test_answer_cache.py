@@ -0,0 +1,38 @@
+import answer_cache
+from answer_cache import AnswerCache
+
+
+def test_hit_is_normalized_and_bound_to_collection_version():
+    cache = AnswerCache(max_entries=4)
+    cache.put("Kiek sąskaitų  išrašė Algintra?", 1, "5")
+
+    assert cache.get("kiek sąskaitų išrašė algintra", 1) == "5"
+    # Įkėlus naujų dokumentų kolekcijų versija pasikeičia - senas atsakymas nebenaudojamas
+    assert cache.get("Kiek sąskaitų išrašė Algintra?", 2) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1, "A")
+    cache.put("b", 1, "B")
+    cache.get("a", 1)
+    cache.put("c", 1, "C")
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == "A"
+    now[0] += 61
+    assert cache.get("c", 1) is None
+    assert (cache.stats()["evictions"], cache.stats()["expirations"]) == (1, 1)
+
+
+def test_semantic_lookup_uses_threshold():
+    cache = AnswerCache(max_entries=4, similarity_threshold=0.95)
+    cache.put("Kokia bendra sąskaitų suma?", 1, "100 EUR", [1.0, 0.0, 0.0])
+
+    assert cache.get("Kiek iš viso sumokėta?", 1, [0.99, 0.05, 0.0]) == "100 EUR"
+    assert cache.get("Kas tiekė žvyrą?", 1, [0.0, 1.0, 0.0]) is None
+    assert cache.get("Kiek iš viso sumokėta?", 2, [0.99, 0.05, 0.0]) is None
+    assert cache.stats()["semantic_hits"] == 1
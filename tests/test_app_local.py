@@ -0,0 +1,34 @@
+import pytest
+
+import app_local
+from benchmarks.fakes import synthetic_invoice
+from structured_store import StructuredStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = StructuredStore(str(tmp_path / "structured.sqlite3"))
+    documents = [(f"invoice-{index}", "invoice", synthetic_invoice(index, 2)) for index in range(5)]
+    documents[0][2]["numeris"] = "MAČ1922"
+    store.upsert_documents(documents)
+    monkeypatch.setattr(app_local, "structured_store", store)
+    monkeypatch.setattr(app_local, "RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setattr(app_local, "IDENTIFIER_SHORTCUT", True)
+    yield store
+    store.close()
+
+
+def test_document_number_question_is_answered_by_structured_router(store):
+    answer, llm_request = app_local.prepare_answer("Kokia sąskaitos MAČ-1922 suma?")
+    assert llm_request is None
+    assert answer["structured"]
+    assert answer["response"].startswith("Rasta sąskaitų faktūrų: 1 (Nr. MAČ-1922)")
+
+
+def test_unknown_document_number_falls_through_to_retrieval(store, monkeypatch):
+    monkeypatch.setattr(app_local, "lookup_cached_answer", lambda query: (None, None, None))
+    monkeypatch.setattr(app_local, "build_llm_prompt", lambda query, query_embedding: f"PROMPT {query}")
+
+    answer, llm_request = app_local.prepare_answer("Kokia sąskaitos BENCH-999 suma?")
+    assert answer is None
+    assert llm_request[0] == "PROMPT Kokia sąskaitos BENCH-999 suma?"
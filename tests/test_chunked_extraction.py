@@ -0,0 +1,46 @@
+import contextlib
+import io
+
+import ai_pdf_to_json
+from extraction_schema import merge_partial_results
+
+
+def test_split_text_keeps_lines_and_respects_limit(monkeypatch):
+    monkeypatch.setattr(ai_pdf_to_json, "EXTRACTION_CHARS_PER_TOKEN", 4)
+    text = "\n".join(f"{index}. punktas " + "x" * 20 for index in range(40))
+
+    chunks = ai_pdf_to_json.split_text_into_chunks(text, max_tokens=50)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert "\n".join(chunks) == text
+    assert ai_pdf_to_json.split_text_into_chunks(text, max_tokens=0) == [text]
+    # Per ilga eilutė karpoma
+    assert [len(chunk) for chunk in ai_pdf_to_json.split_text_into_chunks("y" * 450, max_tokens=50)] == [200, 200, 50]
+
+
+def test_merge_partial_results_fills_gaps_and_deduplicates_items():
+    line = {"pavadinimas": "Žvyras 0/32", "kiekis_t": 25.0}
+    merged = merge_partial_results([
+        {"numeris": "MAČ1922", "data": "", "prekes": [line]},
+        {"numeris": "", "data": "2025-10-20", "prekes": [line, {"pavadinimas": "Smėlis", "kiekis_t": 5.0}]},
+    ])
+    assert merged["numeris"] == "MAČ1922"
+    assert merged["data"] == "2025-10-20"
+    assert merged["prekes"] == [line, {"pavadinimas": "Smėlis", "kiekis_t": 5.0}]
+
+
+def test_chunks_are_extracted_separately_and_merged(monkeypatch):
+    calls = []
+
+    def fake_chunk(chunk_text, doc_type, raise_errors=False):
+        calls.append(chunk_text)
+        first = "pirma dalis" in chunk_text
+        return {"numeris": "S-7" if first else "", "bendra_suma_eur": 0 if first else "1.234,56"}
+
+    monkeypatch.setattr(ai_pdf_to_json, "process_chunk_with_ai", fake_chunk)
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = ai_pdf_to_json.process_chunks_with_ai(["pirma dalis", "antra dalis"], "contract")
+
+    assert sorted(text.split(".")[0] for text in calls) == ["(Dokumento dalis 1 iš 2", "(Dokumento dalis 2 iš 2"]
+    assert data["numeris"] == "S-7"
+    assert data["bendra_suma_eur"] == 1234.56
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import app_local
+from benchmarks.fakes import synthetic_invoice
+from metrics import estimate_tokens
+
+
+def invoice_hit(index, text=None):
+    data = synthetic_invoice(index, 2)
+    doc = text or f"PVM sąskaita faktūra Nr. {data['numeris']}. Pardavėjas: {data['pardavejas']['pavadinimas']}."
+    return "invoice", [0.1, doc, [], {"json_data": json.dumps(data, ensure_ascii=False)}]
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(app_local, "CONTEXT_DEDUP_THRESHOLD", 0.9)
+    monkeypatch.setattr(app_local, "COMPACT_CONTEXT", False)
+    monkeypatch.setattr(app_local, "OLLAMA_NUM_CTX", 4096)
+    monkeypatch.setattr(app_local, "ANSWER_TOKEN_RESERVE", 512)
+
+
+def test_oversized_document_is_skipped_but_smaller_ones_still_fit():
+    long_hit = ("contract", [0.1, "Sutartis " + "ilgas tekstas " * 200, [], None])
+    context = app_local.pack_context([invoice_hit(1), long_hit, invoice_hit(2, "Trumpa sąskaita Nr. 2")], 100)
+
+    assert "ilgas tekstas" not in context
+    assert "Trumpa sąskaita Nr. 2" in context
+    assert estimate_tokens(context) <= 100
+
+
+def test_first_document_is_truncated_to_budget():
+    context = app_local.pack_context([("contract", [0.1, "žodis " * 1000, [], None])], 50)
+    assert estimate_tokens(context) <= 50
+
+
+def test_near_duplicates_are_rendered_compactly():
+    template = "Mėnesinė sąskaita už žvyrą Nr. {} iš UAB Žvyrynas, suma {} EUR, apmokėti iki 2025-10-{}."
+    hits = [invoice_hit(index, template.format(index, 100 + index, 10 + index)) for index in range(3)]
+    context = app_local.pack_context(hits, 3000)
+
+    parts = context.split("\n\n---\n\n")
+    assert parts[0].startswith("[SĄSKAITA FAKTŪRA]: Mėnesinė sąskaita")
+    # Kitos dvi skiriasi tik skaičiais: pateikiamos glausta laukų eilute
+    assert all(part.startswith("[SĄSKAITA FAKTŪRA]: Nr. ") for part in parts[1:])
+
+    # Be JSON duomenų glausto pateikimo nėra - dublikatas praleidžiamas
+    plain = [("invoice", [0.1, template.format(index, 100 + index, 10 + index), [], None]) for index in range(3)]
+    assert app_local.pack_context(plain, 3000).count("Mėnesinė sąskaita") == 1
+
+
+def test_context_budget_respects_ollama_window(monkeypatch):
+    assert app_local.context_token_budget("Kiek?") == app_local.CONTEXT_TOKEN_BUDGET
+    monkeypatch.setattr(app_local, "OLLAMA_NUM_CTX", 1024)
+    budget = app_local.context_token_budget("Kiek?")
+    assert budget < 1024 - 512
+    assert app_local.pack_context([], budget) is None
@@ -0,0 +1,77 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache, hash_text
+
+MODEL = "paraphrase-multilingual-mpnet-base-v2"
+
+
+def vector_for(text, dim=8):
+    return np.random.default_rng(int(hash_text(text)[:8], 16)).random(dim, dtype=np.float32)
+
+
+def fake_encode(texts):
+    return np.stack([vector_for(text) for text in texts])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache"), initial_rows=4)
+    yield cache
+    cache.close()
+
+
+def test_encode_only_computes_missing_texts(cache):
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return fake_encode(texts)
+
+    first = cache.encode(MODEL, ["a", "b"], encode)
+    second = cache.encode(MODEL, ["b", "c", "a"], encode)
+
+    assert calls == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(second, fake_encode(["b", "c", "a"]))
+    np.testing.assert_array_equal(first[0], second[2])
+    assert (cache.stats()["hits"], cache.stats()["entries"]) == (2, 3)
+
+
+def test_file_grows_and_survives_reopening(tmp_path):
+    texts = [f"tekstas {index}" for index in range(50)]
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache"), initial_rows=4)
+    cache.put_many(MODEL, texts, fake_encode(texts))
+    cache.put_many("kitas-modelis", texts[:2], np.ones((2, 3), dtype=np.float32))
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path / "embedding_cache"))
+    np.testing.assert_array_equal(np.stack(reopened.get_many(MODEL, texts)), fake_encode(texts))
+    assert reopened.get_many("kitas-modelis", texts[:3])[2] is None
+    with pytest.raises(ValueError):
+        reopened.put_many(MODEL, ["naujas"], np.ones((1, 3), dtype=np.float32))
+    reopened.close()
+
+
+def _write_from_process(directory, worker):
+    cache = EmbeddingCache(directory, initial_rows=4)
+    texts = [f"procesas {worker} tekstas {index}" for index in range(100)]
+    for start in range(0, len(texts), 10):
+        cache.put_many(MODEL, texts[start:start + 10], fake_encode(texts[start:start + 10]))
+    cache.close()
+
+
+def test_concurrent_processes_do_not_overwrite_rows(tmp_path):
+    directory = str(tmp_path / "embedding_cache")
+    processes = [multiprocessing.Process(target=_write_from_process, args=(directory, worker)) for worker in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+
+    cache = EmbeddingCache(directory)
+    texts = [f"procesas {worker} tekstas {index}" for worker in range(3) for index in range(100)]
+    np.testing.assert_array_equal(np.stack(cache.get_many(MODEL, texts)), fake_encode(texts))
+    cache.close()
@@ -0,0 +1,70 @@
+import contextlib
+import io
+import types
+
+import pytest
+
+import ai_pdf_to_json
+import extraction_cache
+from extraction_cache import ExtractionCache, hash_pdf_file
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "extraction_cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def test_key_includes_prompt_version_and_model(cache):
+    cache.put("abc", "invoice", "2", "gemini-2.5-flash", {"numeris": "A-1"})
+
+    assert cache.get("abc", "invoice", "2", "gemini-2.5-flash") == {"numeris": "A-1"}
+    assert cache.get("abc", "invoice", "3", "gemini-2.5-flash") is None
+    assert cache.get("abc", "invoice", "2", "gemini-2.5-pro") is None
+    assert cache.get("abc", "contract", "2", "gemini-2.5-flash") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 3)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "extraction_cache.sqlite3"), max_mb=60 / 1024 / 1024)
+    now = [1000.0]
+    monkeypatch.setattr(extraction_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    # Kiekvienas įrašas užima 25 baitus: telpa du
+    for name in ("a", "b"):
+        now[0] += 1
+        cache.put(name, "invoice", "2", "m", {"tekstas": "x" * 10})
+    now[0] += 1
+    cache.get("a", "invoice", "2", "m")
+    now[0] += 1
+    cache.put("c", "invoice", "2", "m", {"tekstas": "x" * 10})
+
+    assert [name for name in "abc" if cache.get(name, "invoice", "2", "m")] == ["a", "c"]
+    assert cache.stats()["size_bytes"] <= 60
+    cache.close()
+
+
+def test_hash_ignores_file_name(tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 turinys")
+    (tmp_path / "b.pdf").write_bytes(b"%PDF-1.4 turinys")
+    assert hash_pdf_file(str(tmp_path / "a.pdf")) == hash_pdf_file(str(tmp_path / "b.pdf"))
+
+
+def test_cached_extraction_skips_gemini(cache, tmp_path, monkeypatch):
+    pdf_path = tmp_path / "a.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    calls = []
+
+    def fake_ai(text, doc_type, raise_errors=False):
+        calls.append(text)
+        return {"numeris": "A-1"}
+
+    monkeypatch.setattr(ai_pdf_to_json, "EXTRACTION_CACHE", cache)
+    monkeypatch.setattr(ai_pdf_to_json, "process_pdf_with_ai", fake_ai)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = ai_pdf_to_json.extract_pdf_data(str(pdf_path), "invoice", "tekstas")
+        # Teksto funkcija nekviečiama, kai duomenys rasti podėlyje
+        second = ai_pdf_to_json.extract_pdf_data(str(pdf_path), "invoice", lambda: pytest.fail("tekstas ištrauktas"))
+
+    assert first == second == {"numeris": "A-1"}
+    assert calls == ["tekstas"]
@@ -0,0 +1,49 @@
+import pytest
+
+from extraction_schema import INVOICE_SCHEMA, coerce_number, parse_and_validate, validate_and_coerce
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("1 234,56", 1234.56),
+    ("1.234.567,89", 1234567.89),
+    ("1.234.567", 1234567.0),
+    ("599.71 EUR", 599.71),
+    ("12,5", 12.5),
+    ("-5,20", -5.2),
+    (12, 12.0),
+    ("nėra", None),
+    (True, None),
+])
+def test_coerce_number(value, expected):
+    assert coerce_number(value) == expected
+
+
+def test_validate_and_coerce_fills_defaults_and_reports_errors():
+    data, errors = validate_and_coerce({
+        "numeris": 1922,
+        "pardavejas": "UAB Žvyras",
+        "prekes": [{"pavadinimas": "Žvyras 0/32", "kiekis_t": "25,5", "viso_eur": "1.234,56"}],
+        "sumos": {"viso_su_pvm_eur": "daug"},
+        "nereikalingas": "x",
+    }, INVOICE_SCHEMA)
+
+    assert data["numeris"] == "1922"
+    assert data["pardavejas"]["pavadinimas"] == ""
+    assert data["prekes"][0]["kiekis_t"] == 25.5
+    assert data["prekes"][0]["viso_eur"] == 1234.56
+    assert data["sumos"] == {"viso_be_pvm_eur": 0.0, "pvm_suma_eur": 0.0, "viso_su_pvm_eur": 0.0}
+    assert "nereikalingas" not in data
+    assert "$.pardavejas: tikėtasi objekto, gauta str" in errors
+    assert "$.sumos.viso_su_pvm_eur: 'daug' nėra skaičius" in errors
+    assert "$.data: trūksta lauko" in errors
+
+
+def test_parse_and_validate_handles_markdown_and_broken_json():
+    data, errors = parse_and_validate('```json\n{"numeris": "A-1"}\n```', INVOICE_SCHEMA)
+    assert data["numeris"] == "A-1"
+
+    data, errors = parse_and_validate('{"numeris": "A-1"', INVOICE_SCHEMA)
+    assert data is None
+    assert errors[0].startswith("$: netinkamas JSON")
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+import ai_pdf_to_json
+import pipeline
+from job_queue import EXTRACTED, FAILED, JOB_RETRY_MAX_SECONDS, PENDING, JobQueue
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=3)
+    yield jobs
+    jobs.close()
+
+
+def make_pdf(path):
+    path.write_bytes(b"%PDF-1.4")
+    return str(path)
+
+
+def test_transient_failure_is_retried_later(jobs, tmp_path):
+    pdf_path = make_pdf(tmp_path / "a.pdf")
+    jobs.add([pdf_path])
+
+    assert jobs.fail(pdf_path, "laikina klaida") == PENDING
+    assert jobs.outstanding() == []
+    assert jobs.next_attempt_in() > 0
+    # Atėjus kito bandymo laikui dokumentas vėl paimamas
+    assert [path for path, *_ in jobs.outstanding(now=time.time() + 2 * JOB_RETRY_MAX_SECONDS)] == [pdf_path]
+
+
+def test_failures_end_in_dead_letters_and_can_be_requeued(jobs, tmp_path):
+    transient, permanent = make_pdf(tmp_path / "a.pdf"), make_pdf(tmp_path / "b.pdf")
+    jobs.add([transient, permanent])
+    jobs.advance(transient, EXTRACTED, "invoice", {"numeris": "A-1"})
+
+    assert jobs.fail(permanent, "netinkamas PDF", "permanent") == FAILED
+    states = [jobs.fail(transient, "laikina klaida") for _ in range(3)]
+    assert states == [EXTRACTED, EXTRACTED, FAILED]
+    assert {path for path, *_ in jobs.dead_letters()} == {transient, permanent}
+
+    assert jobs.requeue_failed() == 2
+    outstanding = {path: (state, data) for path, state, _, data in jobs.outstanding()}
+    # Ištraukti duomenys išlieka: kartojant Gemini nekviečiamas
+    assert outstanding == {transient: (EXTRACTED, {"numeris": "A-1"}), permanent: (PENDING, None)}
+
+
+def test_forget_missing(jobs, tmp_path):
+    kept, deleted = make_pdf(tmp_path / "a.pdf"), make_pdf(tmp_path / "b.pdf")
+    jobs.add([kept, deleted])
+    (tmp_path / "b.pdf").unlink()
+
+    assert jobs.forget_missing() == 1
+    assert [path for path, *_ in jobs.outstanding()] == [kept]
+
+
+def test_pipeline_forgets_deleted_pdfs_when_folder_is_missing(jobs, tmp_path):
+    deleted = make_pdf(tmp_path / "a.pdf")
+    jobs.add([deleted])
+    (tmp_path / "a.pdf").unlink()
+
+    pipeline.Pipeline(1, 1, 4, 4, jobs=jobs).run(str(tmp_path / "nera"))
+    assert jobs.next_attempt_in() is None
+
+
+def test_retry_loop_stops_when_nothing_is_processed(jobs, tmp_path, monkeypatch):
+    # Nebaigtas darbas, kurio PDF yra kitame aplanke: grandinė jo nepaima, todėl laukti nėra ko
+    other_folder = tmp_path / "kitas"
+    other_folder.mkdir()
+    jobs.add([make_pdf(other_folder / "a.pdf")])
+
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) > 3:
+            raise AssertionError("pakartojimų ciklas nesibaigia")
+
+    monkeypatch.setattr(pipeline, "JobQueue", lambda: jobs)
+    monkeypatch.setattr(pipeline.time, "sleep", fake_sleep)
+    monkeypatch.setattr(ai_pdf_to_json, "PDF_FOLDER_DOCUMENTS", str(tmp_path / "pdf"))
+    monkeypatch.setattr(ai_pdf_to_json, "ensure_folders", lambda: None)
+    monkeypatch.setattr(ai_pdf_to_json, "RATE_LIMITER", ai_pdf_to_json.RATE_LIMITER)
+
+    pipeline.run_pipeline(pipeline.parse_args(["--no-cache", "--retry-wait", "60"]))
+    assert len(sleeps) <= 1
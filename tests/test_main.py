@@ -0,0 +1,69 @@
+import contextlib
+import io
+import json
+
+import chromadb
+import pytest
+
+import main as vectorizer
+from benchmarks.fakes import HashingSentenceModel, synthetic_invoice
+from structured_store import StructuredStore
+
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    client = chromadb.PersistentClient(path=str(tmp_path / "my_documents_db"))
+    store = StructuredStore(str(tmp_path / "structured.sqlite3"))
+    monkeypatch.setattr(vectorizer, "model", HashingSentenceModel())
+    monkeypatch.setattr(vectorizer, "structured_store", store)
+    monkeypatch.setattr(vectorizer, "MULTI_VECTOR_INDEX", False)
+    monkeypatch.setattr(vectorizer, "EMBEDDING_CACHE", False)
+    yield client.create_collection("invoices")
+    store.close()
+
+
+def add_invoices(collection, records, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return vectorizer.add_records(records, collection, "invoice", vectorizer.TEXT_GENERATORS["invoice"], **kwargs)
+
+
+def broken_upsert(documents):
+    raise RuntimeError("database is locked")
+
+
+def test_side_store_failure_rolls_back_only_that_chunk(collection, monkeypatch):
+    records = {f"invoice-{index}": synthetic_invoice(index, 2) for index in range(4)}
+    real_upsert = vectorizer.structured_store.upsert_documents
+    calls = []
+
+    def flaky_upsert(documents):
+        calls.append(documents)
+        if len(calls) == 1:
+            broken_upsert(documents)
+        real_upsert(documents)
+
+    monkeypatch.setattr(vectorizer.structured_store, "upsert_documents", flaky_upsert)
+    failures = {}
+    added_ids = add_invoices(collection, records, upsert_chunk_size=2, failures=failures)
+
+    assert added_ids == ["invoice-2", "invoice-3"]
+    assert set(failures) == {"invoice-0", "invoice-1"}
+    assert {kind for _, kind in failures.values()} == {"transient"}
+    # Nepavykusi dalis pašalinta iš ChromaDB, todėl kartojant ji nebus praleista kaip jau esanti
+    assert sorted(collection.get(include=[])["ids"]) == ["invoice-2", "invoice-3"]
+
+    monkeypatch.setattr(vectorizer.structured_store, "upsert_documents", real_upsert)
+    assert add_invoices(collection, records) == ["invoice-0", "invoice-1"]
+    assert vectorizer.structured_store.query("SELECT COUNT(*) FROM invoices")[0][0] == 4
+
+
+def test_single_document_side_store_failure_keeps_json(collection, tmp_path, monkeypatch):
+    json_path = tmp_path / "invoice-1.json"
+    json_path.write_text(json.dumps(synthetic_invoice(1, 2)), encoding="utf-8")
+    monkeypatch.setattr(vectorizer.structured_store, "upsert_documents", broken_upsert)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not vectorizer.process_and_add_document(str(json_path), collection, "invoice",
+                                                       vectorizer.TEXT_GENERATORS["invoice"])
+    assert json_path.exists()
+    assert collection.count() == 0
@@ -0,0 +1,66 @@
+import chromadb
+import pytest
+
+import app_local
+import main as vectorizer
+from benchmarks.fakes import synthetic_contract, synthetic_invoice
+from structured_store import StructuredStore
+
+SUPPLIER = synthetic_invoice(0)["pardavejas"]
+
+
+def test_filter_metadata_is_flat_and_skips_empty_values():
+    invoice = synthetic_invoice(9)
+    invoice["apmoketi_iki"] = ""
+    assert vectorizer.filter_metadata(invoice, "invoice") == {
+        "pardavejas_kodas": invoice["pardavejas"]["imones_kodas"], "gavejas_kodas": "307055970",
+        "data": 20251010, "viso_su_pvm_eur": invoice["sumos"]["viso_su_pvm_eur"]}
+    assert vectorizer.filter_metadata(synthetic_contract(2), "contract") == {
+        "salis_a_kodas": synthetic_contract(2)["salis_a"]["imones_kodas"], "salis_b_kodas": "307055970",
+        "sudarymo_data": 20250301}
+
+
+@pytest.fixture
+def known_companies(monkeypatch):
+    monkeypatch.setattr(app_local, "METADATA_FILTERS", True)
+    monkeypatch.setattr(app_local, "get_known_companies",
+                        lambda: {SUPPLIER["imones_kodas"]: SUPPLIER["pavadinimas"]})
+
+
+def test_short_ranges_use_day_lists_and_long_ranges_use_bounds(known_companies):
+    filters = app_local.parse_metadata_filters("Sąskaitos 2025 m. vasario mėn.")
+    assert filters["invoice"] == {"data": {"$in": list(range(20250201, 20250229))}}
+
+    filters = app_local.parse_metadata_filters(f"Sutartys su {SUPPLIER['imones_kodas']} 2024 m.")
+    assert filters["contract"] == {"$and": [
+        {"sudarymo_data": {"$gte": 20240101}},
+        {"sudarymo_data": {"$lte": 20241231}},
+        {"$or": [{"salis_a_kodas": {"$in": [SUPPLIER["imones_kodas"]]}},
+                 {"salis_b_kodas": {"$in": [SUPPLIER["imones_kodas"]]}}]},
+    ]}
+
+    assert app_local.parse_metadata_filters("Kokios sąlygos sutartyje su 999888777?") == {}
+
+
+def test_sqlite_ids_match_chroma_where(known_companies, tmp_path, monkeypatch):
+    records = {f"invoice-{index}": synthetic_invoice(index, 1) for index in range(60)}
+    collection = chromadb.PersistentClient(path=str(tmp_path / "my_documents_db")).create_collection("invoices")
+    collection.add(ids=list(records), documents=[data["numeris"] for data in records.values()],
+                   embeddings=[[float(index), 1.0] for index in range(len(records))],
+                   metadatas=[vectorizer.build_metadata(data, "invoice") for data in records.values()])
+    store = StructuredStore(str(tmp_path / "structured.sqlite3"))
+    store.upsert_documents([(doc_id, "invoice", data) for doc_id, data in records.items()])
+    monkeypatch.setattr(app_local, "structured_store", store)
+
+    for query in ("Sąskaitos 2025 m. kovo mėn.", f"Sąskaitos iš {SUPPLIER['imones_kodas']} nuo 2025-02-01 iki 2025-08-31"):
+        where = app_local.parse_metadata_filters(query)["invoice"]
+        scope = app_local.resolve_metadata_filters({"invoice": where})["invoice"]
+        expected = collection.get(where=where, include=[])["ids"]
+        assert expected
+        assert sorted(scope["ids"]) == sorted(expected)
+
+    # Per daug atitikmenų - filtras paliekamas ChromaDB
+    monkeypatch.setattr(app_local, "METADATA_FILTER_MAX_IDS", 1)
+    where = app_local.parse_metadata_filters("Sąskaitos 2025 m. kovo mėn.")["invoice"]
+    assert app_local.resolve_metadata_filters({"invoice": where}) == {"invoice": {"where": where}}
+    store.close()
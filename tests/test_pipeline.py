@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import main as vectorizer
+import pipeline
+from job_queue import EMBEDDED, EXTRACTED, JOB_RETRY_MAX_SECONDS, JobQueue
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=3)
+    yield jobs
+    jobs.close()
+
+
+def add_extracted(jobs, folder, count):
+    """
+    Sukuria `count` PDF failų, kurių duomenys jau ištraukti: grandinėje liko tik vektorizavimas.
+    """
+    folder.mkdir()
+    for index in range(count):
+        path = folder / f"doc-{index}.pdf"
+        path.write_bytes(b"%PDF-1.4")
+        jobs.add([str(path)])
+        jobs.advance(str(path), EXTRACTED, "invoice", {"numeris": f"A-{index}"})
+    return str(folder)
+
+
+def test_failed_finish_marks_only_that_document(jobs, tmp_path, monkeypatch):
+    folder = add_extracted(jobs, tmp_path / "pdf", 3)
+    real_remove = os.remove
+
+    def remove(path):
+        if path.endswith("doc-1.pdf"):
+            raise PermissionError("failas užrakintas")
+        real_remove(path)
+
+    monkeypatch.setattr(vectorizer, "get_collections", lambda: (None, None))
+    monkeypatch.setattr(vectorizer, "add_records", lambda records, *args, **kwargs: list(records))
+    monkeypatch.setattr(pipeline.os, "remove", remove)
+    monkeypatch.setattr(pipeline, "bump_collection_version", lambda: None)
+
+    stats = pipeline.Pipeline(1, 1, 4, 4, batch_wait=0.01, jobs=jobs).run(folder)
+    assert stats["embedded"] == 2
+    assert stats["retry_later"] == 1
+    assert sorted(os.listdir(folder)) == ["doc-1.pdf"]
+    assert jobs.stats()[EMBEDDED] == 3
+
+
+def test_dead_embedder_stops_pipeline_instead_of_blocking(jobs, tmp_path, monkeypatch):
+    # Daugiau dokumentų nei telpa į eilę: be apsaugos gamintojai amžinai lauktų prie pilnos eilės
+    folder = add_extracted(jobs, tmp_path / "pdf", 10)
+
+    def broken_collections():
+        exit(1)
+
+    monkeypatch.setattr(vectorizer, "get_collections", broken_collections)
+    with pytest.raises(RuntimeError, match="Vektorizavimo etapas sustojo"):
+        pipeline.Pipeline(1, 1, 2, 2, batch_wait=0.01, jobs=jobs).run(folder)
+
+    # Visi dokumentai lieka eilėje su išsaugotais duomenimis ir bus kartojami vėliau
+    outstanding = jobs.outstanding(now=pipeline.time.time() + 2 * JOB_RETRY_MAX_SECONDS)
+    assert len(outstanding) == 10
+    assert {state for _, state, _, _ in outstanding} == {EXTRACTED}
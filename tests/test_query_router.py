@@ -0,0 +1,63 @@
+import datetime
+
+import pytest
+
+from benchmarks.fakes import synthetic_invoice
+from query_router import answer_structured_query, find_company_codes, find_document_numbers, parse_date_range
+from structured_store import StructuredStore
+
+TODAY = datetime.date(2026, 10, 18)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Kokios sąskaitos 2025 spalio mėn.?", (datetime.date(2025, 10, 1), datetime.date(2025, 10, 31))),
+    ("Kokios sąskaitos 2025 m. rugsėjį?", (datetime.date(2025, 9, 1), datetime.date(2025, 9, 30))),
+    ("Sąskaitos 2025 metų gegužę", (datetime.date(2025, 5, 1), datetime.date(2025, 5, 31))),
+    ("Sąskaitos rugsėjo 2025", (datetime.date(2025, 9, 1), datetime.date(2025, 9, 30))),
+    ("Sąskaitos rugsėjo mėn.", (datetime.date(2026, 9, 1), datetime.date(2026, 9, 30))),
+    ("2024 m. sąskaitos už kovą", (datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))),
+    ("Sąskaitos 2025-03", (datetime.date(2025, 3, 1), datetime.date(2025, 3, 31))),
+    ("Sąskaitos nuo 2025-01-01 iki 2025-02-15", (datetime.date(2025, 1, 1), datetime.date(2025, 2, 15))),
+    ("Sąskaitos 2024 m.", (datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))),
+    ("Kiek sąskaitų iš viso?", (None, None)),
+])
+def test_parse_date_range(query, expected):
+    assert parse_date_range(query, TODAY) == expected
+
+
+def test_find_company_codes_ignores_unknown_numbers():
+    known = {"305654042": "UAB Žvyro tiekimas", "111222333": "Algintra MB"}
+    assert find_company_codes("Sąskaitos įmonei 305654042", known) == [("305654042", "UAB Žvyro tiekimas")]
+    assert find_company_codes("Sąskaitos įmonei 999888777", known) == []
+    assert find_company_codes("Kiek sąskaitų išrašė Algintros?", known) == [("111222333", "Algintra MB")]
+
+
+def test_find_document_numbers():
+    assert find_document_numbers("Kokia sąskaitos MAČ-1922 suma?") == ["MAČ-1922"]
+    assert find_document_numbers("Sutartis Nr. 15 ir BENCH-3") == ["15", "BENCH-3"]
+    assert find_document_numbers("Sąskaitos 2025 m. spalio mėn., 2025-10, 0/5 žvyras") == []
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StructuredStore(str(tmp_path / "structured.sqlite3"))
+    documents = [(f"invoice-{index}", "invoice", synthetic_invoice(index, 2)) for index in range(11)]
+    documents[0][2]["numeris"] = "MAČ1922"
+    store.upsert_documents(documents)
+    yield store
+    store.close()
+
+
+def test_structured_answer_filters_by_document_number(store):
+    total = store.query("SELECT viso_su_pvm_eur FROM invoices WHERE numeris='MAČ1922'")[0][0]
+    answer = answer_structured_query("Kokia sąskaitos MAČ-1922 suma?", store, TODAY)
+    assert answer.startswith("Rasta sąskaitų faktūrų: 1 (Nr. MAČ-1922)")
+    assert f"{total:.2f}".replace(".", ",") in answer
+    assert answer_structured_query("Kokia sąskaitos BENCH-3 suma?", store, TODAY).startswith(
+        "Rasta sąskaitų faktūrų: 1 (Nr. BENCH-3)")
+
+
+def test_structured_answer_leaves_unknown_numbers_to_llm(store):
+    assert answer_structured_query("Kokia sąskaitos BENCH-999 suma?", store, TODAY) is None
+    assert answer_structured_query("Kiek sąskaitų išrašė 999888777?", store, TODAY) is None
+    assert answer_structured_query("Kokia sąskaitų suma?", store, TODAY).startswith("Rasta sąskaitų faktūrų: 11.")
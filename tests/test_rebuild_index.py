@@ -0,0 +1,100 @@
+import contextlib
+import io
+
+import chromadb
+import pytest
+
+import main as vectorizer
+import rebuild_index
+from benchmarks.fakes import HashingSentenceModel, synthetic_contract
+from collection_version import read_collection_names, resolve_collection_name
+from structured_store import StructuredStore
+
+# Kiekviena sutartis turi 3 dalis: 1900 sutarčių -> 5700 dalių, daugiau nei ChromaDB leidžia vienu kvietimu (5461)
+CONTRACTS = 1900
+
+
+@pytest.fixture
+def populate(tmp_path, monkeypatch):
+    """
+    Grąžina funkciją, kuri įkelia `count` sintetinių sutarčių (kartu ir jų dalis) ir grąžina ChromaDB klientą.
+    """
+    monkeypatch.chdir(tmp_path)
+    client = chromadb.PersistentClient(path=str(tmp_path / "my_documents_db"))
+    monkeypatch.setattr(vectorizer, "model", HashingSentenceModel())
+    monkeypatch.setattr(vectorizer, "client", client)
+    monkeypatch.setattr(vectorizer, "invoice_collection", client.create_collection("invoices"))
+    monkeypatch.setattr(vectorizer, "contract_collection", client.create_collection("contracts"))
+    monkeypatch.setattr(vectorizer, "parts_collection", client.create_collection("document_parts"))
+    monkeypatch.setattr(vectorizer, "structured_store", StructuredStore("./my_documents_db/structured.sqlite3"))
+    monkeypatch.setattr(vectorizer, "MULTI_VECTOR_INDEX", True)
+    monkeypatch.setattr(vectorizer, "EMBEDDING_CACHE", False)
+
+    def load(count):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vectorizer.add_records({f"contract-{index}": synthetic_contract(index) for index in range(count)},
+                                   vectorizer.contract_collection, "contract", vectorizer.TEXT_GENERATORS["contract"])
+        return client
+
+    yield load
+    vectorizer.structured_store.close()
+
+
+def test_rebuild_more_parts_than_max_batch(populate):
+    client = populate(CONTRACTS)
+    assert vectorizer.parts_collection.count() > client.get_max_batch_size()
+
+    args = rebuild_index.parse_args(["--workers", "1", "--no-cache", "--page-size", str(CONTRACTS)])
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert rebuild_index.rebuild(args) == CONTRACTS
+
+    names = read_collection_names()
+    assert set(names["active"]) == {"invoices", "contracts", "document_parts"}
+    assert names["backup"] == {"invoices": "invoices", "contracts": "contracts", "document_parts": "document_parts"}
+    assert client.get_collection(resolve_collection_name("contracts")).count() == CONTRACTS
+    assert client.get_collection(resolve_collection_name("document_parts")).count() == 3 * CONTRACTS
+    # Senosios kolekcijos lieka nepakeistos kaip atsarginės
+    assert client.get_collection("contracts").count() == CONTRACTS
+
+
+def test_rebuild_switch_drops_older_backups(populate):
+    client = populate(20)
+    args = rebuild_index.parse_args(["--workers", "1", "--no-cache"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        rebuild_index.rebuild(args)
+        first = read_collection_names()["active"]
+        rebuild_index.rebuild(args)
+
+    names = read_collection_names()
+    assert names["backup"] == first
+    existing = {collection.name for collection in client.list_collections()}
+    assert existing == set(names["active"].values()) | set(first.values())
+
+
+def test_failed_rebuild_keeps_live_collections(populate, monkeypatch):
+    client = populate(20)
+
+    def broken_rebuild(*args, **kwargs):
+        raise RuntimeError("nutrūko")
+
+    monkeypatch.setattr(rebuild_index, "rebuild_collection", broken_rebuild)
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(RuntimeError):
+        rebuild_index.rebuild(rebuild_index.parse_args(["--workers", "1", "--no-cache"]))
+
+    assert read_collection_names()["active"] == {}
+    assert {collection.name for collection in client.list_collections()} == {"invoices", "contracts", "document_parts"}
+
+
+def test_rebuild_without_parts_keeps_active_parts_collection(populate, monkeypatch):
+    client = populate(20)
+    args = rebuild_index.parse_args(["--workers", "1", "--no-cache"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        rebuild_index.rebuild(args)
+        parts_name = resolve_collection_name("document_parts")
+        monkeypatch.setattr(vectorizer, "MULTI_VECTOR_INDEX", False)
+        rebuild_index.rebuild(args)
+
+    names = read_collection_names()
+    assert names["active"]["document_parts"] == parts_name
+    assert "document_parts" in names["backup"]
+    assert client.get_collection(parts_name).count() == 3 * 20
@@ -0,0 +1,19 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+import app_local
+import serve
+
+
+def test_async_index_matches_flask_rendering():
+    expected = app_local.create_app().test_client().get("/").get_data(as_text=True)
+
+    async def fetch_index():
+        async with TestClient(TestServer(serve.create_async_app(threads=1))) as client:
+            response = await client.get("/")
+            return response.status, response.content_type, await response.text()
+
+    status, content_type, body = asyncio.run(fetch_index())
+    assert (status, content_type) == (200, "text/html")
+    assert body == expected
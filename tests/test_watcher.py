@@ -0,0 +1,79 @@
+import contextlib
+import io
+import types
+
+import pytest
+
+import watcher
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(watcher, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def folder_watcher(tmp_path, clock):
+    folder_watcher = watcher.FolderWatcher(workers=1, settle_seconds=2.0, backend="poll")
+    folder_watcher.folders = {str(tmp_path): ('.json', 'invoice')}
+    return folder_watcher
+
+
+def queued(folder_watcher):
+    items = []
+    while not folder_watcher.queue.empty():
+        items.append(folder_watcher.queue.get_nowait()[0])
+    return items
+
+
+def test_file_is_queued_only_after_it_settles(folder_watcher, tmp_path, clock):
+    path = tmp_path / "a.json"
+    path.write_text("{")
+    (tmp_path / "b.txt").write_text("ne JSON")
+
+    assert folder_watcher._scan()
+    clock[0] += 1.5
+    # Failas dar rašomas: dydis pasikeitė, laukiama iš naujo
+    path.write_text('{"numeris": "A-1"}')
+    folder_watcher._scan()
+    clock[0] += 1.5
+    folder_watcher._scan()
+    assert queued(folder_watcher) == []
+
+    clock[0] += 1.0
+    assert not folder_watcher._scan()
+    assert queued(folder_watcher) == [str(path)]
+    # Apdorojamas failas antrą kartą į eilę nededamas
+    clock[0] += 5
+    folder_watcher._scan()
+    folder_watcher._scan()
+    assert queued(folder_watcher) == []
+
+
+def test_failed_file_is_retried_only_after_it_changes(folder_watcher, tmp_path, clock, monkeypatch):
+    path = tmp_path / "a.json"
+    path.write_text('{"numeris": "A-1"}')
+    results = iter([False, True])
+    monkeypatch.setattr(folder_watcher, "_process_json", lambda path, doc_type: next(results))
+    monkeypatch.setattr(watcher, "bump_collection_version", lambda: None)
+
+    def settle_and_process():
+        for _ in range(2):
+            folder_watcher._scan()
+            clock[0] += 3
+        items = [(path, 0.0) for path in queued(folder_watcher)]
+        for item in items + [None]:
+            folder_watcher.queue.put(item)
+        with contextlib.redirect_stdout(io.StringIO()):
+            folder_watcher._worker()
+        return [path for path, _ in items]
+
+    assert settle_and_process() == [str(path)]
+    assert folder_watcher.stats == {"processed": 0, "failed": 1}
+    assert settle_and_process() == []
+
+    path.write_text('{"numeris": "A-1", "data": "2025-10-20"}')
+    assert settle_and_process() == [str(path)]
+    assert folder_watcher.stats == {"processed": 1, "failed": 1}
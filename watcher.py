@@ -0,0 +1,298 @@
+import os
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import ai_pdf_to_json
+import main as vectorizer
+from collection_version import bump_collection_version
+from extraction_cache import ExtractionCache
+
+# --- NUSTATYMAI ---
+
+# Kas kiek sekundžių peržiūrimi aplankai, kai failų sistemos pranešimai nepasiekiami
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "1.0"))
+# Kiek sekundžių failo dydis ir keitimo laikas turi nekisti, kad jis būtų laikomas įrašytu iki galo
+WATCH_SETTLE_SECONDS = float(os.getenv("WATCH_SETTLE_SECONDS", "2.0"))
+# Kiek dokumentų apdorojama vienu metu
+WATCH_WORKERS = int(os.getenv("WATCH_WORKERS", "4"))
+# Kas kiek sekundžių spausdinama eilės būsena
+WATCH_REPORT_INTERVAL = float(os.getenv("WATCH_REPORT_INTERVAL", "60"))
+# 'auto' - watchdog (inotify/FSEvents/ReadDirectoryChangesW), jei įdiegtas; 'poll' - tik periodinė peržiūra
+WATCH_BACKEND = os.getenv("WATCH_BACKEND", "auto")
+
+
+def _file_signature(path):
+    """
+    Grąžina (dydis, keitimo laikas) arba None, jei failo nebėra.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class FolderWatcher:
+    """
+    Ilgai veikiantis režimas: stebi PDF ir JSON aplankus ir kiekvieną naują failą apdoroja per kelias sekundes.
+    - PDF: tekstas -> Gemini -> vektorius -> ChromaDB (kaip pipeline.py),
+    - JSON (invoices/, contracts/): įkeliami kaip main.py.
+    Failas imamas tik tada, kai jo dydis ir keitimo laikas nekinta `settle_seconds`,
+    o tas pats failas niekada neapdorojamas dviejose gijose vienu metu.
+    """
+
+    def __init__(self, workers=WATCH_WORKERS, poll_interval=WATCH_POLL_INTERVAL,
+                 settle_seconds=WATCH_SETTLE_SECONDS, report_interval=WATCH_REPORT_INTERVAL, backend=WATCH_BACKEND):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.report_interval = report_interval
+        self.backend = backend
+        # Aplankas -> (failo plėtinys, dokumento tipas arba None PDF atveju)
+        self.folders = {
+            ai_pdf_to_json.PDF_FOLDER_DOCUMENTS: ('.pdf', None),
+            vectorizer.INVOICES_FOLDER: ('.json', 'invoice'),
+            vectorizer.CONTRACTS_FOLDER: ('.json', 'contract'),
+        }
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # Kelias -> [parašas, kada parašas paskutinį kartą pasikeitė, kada failas pirmą kartą pastebėtas]
+        self._pending = {}
+        # Failai eilėje arba apdorojami šiuo metu
+        self._in_flight = set()
+        # Nepavykę failai: kelias -> parašas (bandoma iš naujo tik failui pasikeitus)
+        self._failed = {}
+        self._observer = None
+        self._threads = []
+        self._extract_pool = None
+        self.stats = {"processed": 0, "failed": 0}
+        self.latencies = []
+
+    # --- FAILŲ PASTEBĖJIMAS ---
+
+    def _start_observer(self):
+        """
+        Įjungia failų sistemos pranešimus (watchdog), jei biblioteka įdiegta. Kitu atveju lieka periodinė peržiūra.
+        """
+        if self.backend == "poll":
+            return False
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print("Informacija: 'watchdog' neįdiegtas, naudojama periodinė aplankų peržiūra.")
+            return False
+
+        wake = self._wake
+
+        class _WakeHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        self._observer = Observer()
+        for folder in self.folders:
+            self._observer.schedule(_WakeHandler(), folder, recursive=False)
+        self._observer.start()
+        return True
+
+    def _scan(self):
+        """
+        Peržiūri aplankus ir į eilę įdeda failus, kurie nusistovėjo. Grąžina, ar dar yra laukiančių failų.
+        """
+        now = time.monotonic()
+        seen = set()
+        for folder, (extension, _) in self.folders.items():
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith(extension) or not entry.is_file():
+                    continue
+                path = entry.path
+                seen.add(path)
+                signature = _file_signature(path)
+                with self._lock:
+                    if signature is None or path in self._in_flight or self._failed.get(path) == signature:
+                        continue
+
+                state = self._pending.get(path)
+                if state is None:
+                    self._pending[path] = [signature, now, now]
+                elif state[0] != signature:
+                    # Failas dar rašomas - laukiame iš naujo
+                    state[0], state[1] = signature, now
+                elif now - state[1] >= self.settle_seconds:
+                    del self._pending[path]
+                    with self._lock:
+                        self._failed.pop(path, None)
+                        self._in_flight.add(path)
+                    self.queue.put((path, state[2]))
+
+        # Pamirštame pašalintus failus
+        for path in list(self._pending):
+            if path not in seen:
+                del self._pending[path]
+        with self._lock:
+            for path in list(self._failed):
+                if path not in seen:
+                    del self._failed[path]
+        return bool(self._pending)
+
+    def _scan_loop(self):
+        idle_interval = 30.0 if self._observer else self.poll_interval
+        last_report = time.monotonic()
+        while not self._stop.is_set():
+            has_pending = self._scan()
+            # Kol yra nenusistovėjusių failų, tikriname dažnai; kitaip laukiame pranešimo arba peržiūros laiko
+            timeout = min(self.poll_interval, self.settle_seconds / 2) if has_pending else idle_interval
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self.report_interval and time.monotonic() - last_report >= self.report_interval:
+                self.print_status()
+                last_report = time.monotonic()
+
+    # --- APDOROJIMAS ---
+
+    def _process_pdf(self, path):
+        pdf_sample_text, full_pdf_text = self._extract_pool.submit(
+            ai_pdf_to_json.extract_texts_for_pipeline, path).result()
+        if not pdf_sample_text:
+            print(f"Tekstas iš '{os.path.basename(path)}' neišgautas. Praleidžiama.")
+            return False
+
+        doc_type, data = ai_pdf_to_json.classify_and_extract(path, pdf_sample_text, full_pdf_text)
+        if not data:
+            return False
+
+        collections = dict(zip(("invoice", "contract"), vectorizer.get_collections()))
+        doc_id = os.path.splitext(os.path.basename(path))[0]
+        try:
+            added_ids = vectorizer.add_records({doc_id: data}, collections[doc_type], doc_type,
+                                               vectorizer.TEXT_GENERATORS[doc_type])
+        except Exception as e:
+            print(f"   ❌ Klaida vektorizuojant {doc_id} ({doc_type}): {e}")
+            added_ids = []
+        if added_ids:
+            os.remove(path)
+            return True
+        # Neįkeltą dokumentą išsaugome JSON faile, kad jo nereikėtų vėl siųsti į Gemini
+        ai_pdf_to_json.save_document_json(path, doc_type, data)
+        return False
+
+    def _process_json(self, path, doc_type):
+        collections = dict(zip(("invoice", "contract"), vectorizer.get_collections()))
+        return vectorizer.process_documents_batch([path], collections[doc_type], doc_type,
+                                                  vectorizer.TEXT_GENERATORS[doc_type]) > 0
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, first_seen = item
+            _, doc_type = self.folders[os.path.dirname(path)]
+            try:
+                if doc_type is None:
+                    success = self._process_pdf(path)
+                else:
+                    success = self._process_json(path, doc_type)
+            except Exception as e:
+                print(f"❌ Klaida apdorojant '{path}': {e}")
+                success = False
+
+            if success:
+                bump_collection_version()
+            latency = time.monotonic() - first_seen
+            with self._lock:
+                self._in_flight.discard(path)
+                self.stats["processed" if success else "failed"] += 1
+                self.latencies.append(latency)
+                if not success:
+                    signature = _file_signature(path)
+                    if signature:
+                        self._failed[path] = signature
+            status = "✅ įkeltas" if success else "❌ neįkeltas"
+            print(f"[STEBĖJIMAS] {os.path.basename(path)} {status} per {latency:.1f} s "
+                  f"(eilėje: {self.queue.qsize()})")
+            self._wake.set()
+
+    # --- PALEIDIMAS ---
+
+    def start(self):
+        ai_pdf_to_json.ensure_folders()
+        for folder in self.folders:
+            os.makedirs(folder, exist_ok=True)
+        self._extract_pool = ProcessPoolExecutor(max_workers=self.workers)
+        uses_events = self._start_observer()
+        print(f"👀 Stebimi aplankai: {', '.join(self.folders)} "
+              f"({'failų sistemos pranešimai' if uses_events else f'peržiūra kas {self.poll_interval} s'}, "
+              f"apdorojimo gijos: {self.workers})")
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._scan_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+        for _ in range(self.workers):
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._extract_pool.shutdown()
+        self.print_status()
+
+    def print_status(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            in_flight = len(self._in_flight)
+            stats = dict(self.stats)
+        line = (f"[STEBĖJIMAS] Eilėje/apdorojama: {in_flight}, laukia nusistovėjimo: {len(self._pending)}, "
+                f"įkelta: {stats['processed']}, nepavyko: {stats['failed']}")
+        if latencies:
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            line += f", trukmė nuo pastebėjimo: mediana {latencies[len(latencies) // 2]:.1f} s, p95 {p95:.1f} s"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Aplankų stebėjimo režimas: nuolatinis naujų dokumentų įkėlimas.")
+    parser.add_argument("--workers", type=int, default=WATCH_WORKERS)
+    parser.add_argument("--poll-interval", type=float, default=WATCH_POLL_INTERVAL)
+    parser.add_argument("--settle-seconds", type=float, default=WATCH_SETTLE_SECONDS)
+    parser.add_argument("--report-interval", type=float, default=WATCH_REPORT_INTERVAL)
+    parser.add_argument("--backend", choices=["auto", "poll"], default=WATCH_BACKEND)
+    parser.add_argument("--rpm", type=int, default=ai_pdf_to_json.GEMINI_REQUESTS_PER_MINUTE,
+                        help="Gemini užklausų limitas per minutę (0 - neribojama).")
+    parser.add_argument("--no-cache", action="store_true", help="Nenaudoti AI rezultatų podėlio.")
+    return parser.parse_args(argv)
+
+
+def create_watcher(args):
+    """
+    Paruošia AI ribotuvą bei podėlį ir sukuria stebėtoją pagal komandinės eilutės parametrus.
+    """
+    ai_pdf_to_json.RATE_LIMITER = ai_pdf_to_json.RateLimiter(args.rpm)
+    if not args.no_cache and ai_pdf_to_json.EXTRACTION_CACHE is None:
+        ai_pdf_to_json.EXTRACTION_CACHE = ExtractionCache()
+    return FolderWatcher(args.workers, args.poll_interval, args.settle_seconds, args.report_interval, args.backend)
+
+
+if __name__ == "__main__":
+    watcher = create_watcher(parse_args())
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nStabdoma...")
+        watcher.stop()